@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,17 +42,19 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'rest_framework_simplejwt',
     'accounts',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Compresses what every middleware below it produces
+    'accounts.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.audit.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -59,7 +62,8 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Imports simplejwt on the first JWT request instead of at startup
+        'accounts.authentication.LazyJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -69,6 +73,36 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Broker used to fan out live balance/transaction updates (see accounts/events.py).
+# Settlement and approvals run in other processes than the streams, so streams
+# read changes from the database
+ACCOUNT_EVENTS_BROKER = 'accounts.events.DatabaseBroker'
+ACCOUNT_EVENTS_POLL_SECONDS = 2
+
+# Settled transactions older than this move to the archive table
+TRANSACTION_ARCHIVE_AFTER_DAYS = 365
+
+# How often each process checks whether exchange rates were reloaded
+FX_VERSION_CHECK_SECONDS = 30
+
+# Daily accruals by account type (see accounts/accruals.py); rates are annual,
+# daily_fee is in minor units
+ACCRUAL_RULES = {
+    'savings': {'interest_rate': '0.02'},
+    'checking': {'overdraft_rate': '0.15'},
+    'credit': {'overdraft_rate': '0.22'},
+}
+
+# Velocity rules checked in memory before a transaction is created (see accounts/risk.py).
+# Windows are in seconds, amount limits in USD (DEFAULT_CURRENCY) minor units.
+RISK_ENGINE = 'accounts.risk.RiskEngine'
+RISK_RULES = [
+    {'name': 'hourly_count', 'metric': 'count', 'window': 3600, 'limit': 20},
+    {'name': 'hourly_amount', 'metric': 'amount', 'window': 3600, 'limit': 500000},
+    {'name': 'daily_new_recipients', 'metric': 'new_recipients', 'window': 86400, 'limit': 3},
+    {'name': 'hourly_recipient_inflow', 'metric': 'recipient_amount', 'window': 3600, 'limit': 1000000},
+]
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
@@ -98,13 +132,97 @@ WSGI_APPLICATION = 'Mani_banking.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Persistent connections; on PostgreSQL add OPTIONS={'pool': True} for a pool
+CONN_MAX_AGE = int(os.environ.get('MANI_DB_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # Take the write lock up front so parallel batch workers queue instead of
+        # failing with "database is locked" when a read upgrades to a write
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+    }
+}
+
+# Optional read replica. Locally, point MANI_REPLICA_DB at a second SQLite file
+# (e.g. a copy of db.sqlite3) to exercise the routing.
+if os.environ.get('MANI_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['MANI_REPLICA_DB'],
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Account shards (accounts/sharding.py). 'default' is shard 0; entries may only be
+# appended, since users keep the shard index they signed up with. Locally,
+# MANI_SHARDS=3 adds shard_1 and shard_2 as SQLite files next to db.sqlite3 (or in
+# MANI_SHARD_DIR); create them with `manage.py migrate --database shard_1` etc.
+ACCOUNT_SHARDS = ['default']
+for _index in range(1, int(os.environ.get('MANI_SHARDS', 1))):
+    ACCOUNT_SHARDS.append(f'shard_{_index}')
+    DATABASES[f'shard_{_index}'] = {
+        **DATABASES['default'],
+        'NAME': Path(os.environ.get('MANI_SHARD_DIR', BASE_DIR)) / f'shard_{_index}.sqlite3',
+    }
+
+DATABASE_ROUTERS = ['accounts.sharding.ShardRouter', 'accounts.routers.PrimaryReplicaRouter']
+
+# Seconds before settlement workers retry the credit of a cross-shard transfer
+CROSS_SHARD_RETRY_SECONDS = 30
+
+# Cache shared by every worker process: replica read pins (accounts/routers.py)
+# and recipient lookups and their invalidation (accounts/resolver.py) must be
+# seen by all of them. Files are enough on one host; point MANI_REDIS_URL at a
+# Redis server (needs the redis package) when workers run on several hosts.
+if os.environ.get('MANI_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['MANI_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('MANI_CACHE_DIR', str(BASE_DIR / 'cache')),
+        }
     }
+
+# Seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = 5
+
+# Directory for rendered statements (content-addressed, never modified once written)
+STATEMENTS_ROOT = os.environ.get('MANI_STATEMENTS_ROOT', str(BASE_DIR / 'statements'))
+
+# Seconds a recipient lookup by account number stays cached (dropped early on status changes)
+ACCOUNT_RESOLVER_TTL = 300
+
+# Smallest response body worth compressing (accounts/compression.py)
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+
+# Part of every API ETag (accounts/conditional.py); bump when a release changes response bodies
+RESPONSE_ETAG_EPOCH = 1
+
+# Seconds an emailed verification link stays valid (`manage.py sweep_verifications` handles expired ones)
+EMAIL_VERIFICATION_TTL = 24 * 60 * 60
+
+# Downstream consumers of the transactional outbox, relayed by `manage.py relay_outbox`
+OUTBOX_CONSUMERS = {
+    'analytics': {
+        'BACKEND': 'accounts.outbox.FileSink',
+        'OPTIONS': {'path': os.environ.get('MANI_OUTBOX_ANALYTICS_PATH', str(BASE_DIR / 'outbox' / 'analytics.jsonl'))},
+    },
 }
 
+# How long the relay waits for an outbox id gap to be filled by a still-open transaction
+OUTBOX_GAP_GRACE_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -1,28 +1,53 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Account, Transaction
+from .models import User, UserProfile, Account, Transaction, FxRate, RecurringTransfer, Statement, AuditLogEntry
+from . import audit, conditional, fx, outbox, resolver, verification
+from django.db import transaction as db_transaction
+from .money import format_minor
 from django.utils.timezone import now
 from django.contrib import messages
+from .pagination import LargeTablePaginator
+from .settlement import lock_accounts, rejection_reason
 
 # Inline for Account in UserAdmin
 class AccountInline(admin.StackedInline):
     model = Account
     can_delete = False
     verbose_name_plural = 'Account'
-    fields = ('account_number', 'account_type', 'balance', 'status', 'created_at', 'updated_at')
-    readonly_fields = ('account_number', 'balance', 'created_at', 'updated_at')
+    fields = ('account_number', 'account_type', 'display_balance', 'currency', 'status', 'created_at', 'updated_at')
+    readonly_fields = ('account_number', 'display_balance', 'created_at', 'updated_at')
     extra = 0
 
+    @admin.display(description='Balance')
+    def display_balance(self, obj):
+        return obj.formatted_balance
+
+# Inline for UserProfile in UserAdmin; only loaded on the change page
+class UserProfileInline(admin.StackedInline):
+    model = UserProfile
+    can_delete = False
+    verbose_name_plural = 'Personal details'
+    fields = ('phone_number', 'date_of_birth', 'address')
+
 # Inline for Transactions in AccountAdmin
 class TransactionInline(admin.TabularInline):
     model = Transaction
     fk_name = 'account'  # Specify the ForeignKey to use for the inline
-    fields = ('transaction_type', 'amount', 'recipient_account', 'status', 'date', 'created_by', 'description')
-    readonly_fields = ('amount', 'recipient_account', 'status', 'date', 'created_by', 'description')
+    fields = ('transaction_type', 'display_amount', 'recipient_account', 'status', 'date', 'created_by', 'description')
+    readonly_fields = ('display_amount', 'recipient_account', 'status', 'date', 'created_by', 'description')
     extra = 0
     max_num = 10  # Limit to 10 transactions for performance
     can_delete = False
 
+    @admin.display(description='Amount')
+    def display_amount(self, obj):
+        # The inline's empty template form has no amount yet
+        return obj.formatted_amount if obj.amount is not None else '-'
+
+    def get_queryset(self, request):
+        # recipient_account and created_by render via __str__, which reaches user
+        return super().get_queryset(request).select_related('recipient_account__user', 'created_by')
+
 # Customize User admin
 class UserAdmin(BaseUserAdmin):
     model = User
@@ -30,32 +55,46 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ('is_staff', 'is_superuser', 'is_email_verified', 'is_active')
     search_fields = ('email', 'username', 'first_name', 'last_name')
     ordering = ('email',)
-    inlines = [AccountInline]
+    list_select_related = ('verification_token',)
+    inlines = [UserProfileInline, AccountInline]
+    actions = ['resend_verification_email']
 
     fieldsets = (
         (None, {'fields': ('email', 'username', 'password')}),
-        ('Personal Info', {'fields': ('first_name', 'last_name', 'phone_number', 'date_of_birth', 'address')}),
+        ('Personal Info', {'fields': ('first_name', 'last_name')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
-        ('Verification', {'fields': ('is_email_verified', 'email_verification_token', 'email_verification_token_expires')}),
+        ('Verification', {'fields': ('is_email_verified', 'verification_token_expires')}),
     )
 
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
-            'fields': ('email', 'username', 'first_name', 'last_name', 'phone_number', 'date_of_birth', 'address', 'password1', 'password2'),
+            'fields': ('email', 'username', 'first_name', 'last_name', 'password1', 'password2'),
         }),
     )
 
-    readonly_fields = ('email_verification_token', 'email_verification_token_expires')
+    readonly_fields = ('verification_token_expires',)
 
     def email_verification_status(self, obj):
         if obj.is_email_verified:
             return "Verified"
-        elif obj.email_verification_token_expires and obj.email_verification_token_expires < now():
+        token = getattr(obj, 'verification_token', None)
+        if token is None or token.expires_at < now():
             return "Expired"
         return "Pending"
     email_verification_status.short_description = "Verification Status"
 
+    @admin.display(description='Verification link expires')
+    def verification_token_expires(self, obj):
+        token = getattr(obj, 'verification_token', None)
+        return token.expires_at if token else None
+
+    def resend_verification_email(self, request, queryset):
+        # One token upsert and one mail connection for the whole selection
+        sent = verification.issue_and_send(queryset.select_related(None).filter(is_email_verified=False).only('pk', 'email'))
+        self.message_user(request, f"Verification email re-sent to {sent} user(s).", messages.SUCCESS)
+    resend_verification_email.short_description = "Re-send verification email to selected unverified users"
+
     def get_readonly_fields(self, request, obj=None):
         # Prevent editing email for existing users to avoid verification bypass
         if obj:  # Editing an existing user
@@ -65,56 +104,195 @@ class UserAdmin(BaseUserAdmin):
 # Account admin with inline transactions
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
-    list_display = ('user', 'account_number', 'account_type', 'balance', 'status', 'created_at', 'updated_at')
+    list_display = ('user', 'account_number', 'account_type', 'display_balance', 'currency', 'status', 'created_at', 'updated_at')
     search_fields = ('user__email', 'account_number')
     list_filter = ('account_type', 'status', 'created_at')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    show_full_result_count = False
+    paginator = LargeTablePaginator
     inlines = [TransactionInline]
-    readonly_fields = ('account_number', 'balance', 'created_at', 'updated_at')
+    readonly_fields = ('account_number', 'display_balance', 'created_at', 'updated_at')
+    exclude = ('balance',)
 
     actions = ['freeze_account', 'unfreeze_account']
 
     def freeze_account(self, request, queryset):
-        updated = queryset.update(status='frozen')
+        updated = self._set_status(request, queryset, 'frozen')
         self.message_user(request, f"{updated} account(s) frozen successfully.", messages.SUCCESS)
     freeze_account.short_description = "Freeze selected accounts"
 
     def unfreeze_account(self, request, queryset):
-        updated = queryset.update(status='active')
+        updated = self._set_status(request, queryset, 'active')
         self.message_user(request, f"{updated} account(s) unfrozen successfully.", messages.SUCCESS)
     unfreeze_account.short_description = "Unfreeze selected accounts"
 
+    def _set_status(self, request, queryset, new_status):
+        with db_transaction.atomic():
+            accounts = list(
+                queryset.select_related(None).select_for_update()
+                .exclude(status=new_status).only('pk', 'account_number', 'status')
+            )
+            updated = Account.objects.filter(pk__in=[a.pk for a in accounts]).update(status=new_status)
+            status_events = []
+            for account in accounts:
+                audit.record('account.status', account, request.user, old=account.status, new=new_status)
+                previous, account.status = account.status, new_status
+                status_events.append(outbox.account_status_event(account, previous))
+            outbox.emit(status_events)
+        # update() skips the post_save signal, so drop cached recipient lookups here
+        resolver.invalidate(*(a.account_number for a in accounts))
+        return updated
+
+    @admin.display(description='Balance', ordering='balance')
+    def display_balance(self, obj):
+        return obj.formatted_balance
+
     def get_readonly_fields(self, request, obj=None):
-        # Prevent editing balance for existing accounts
+        # Prevent editing balance (and its currency) for existing accounts
+        if obj:
+            return self.readonly_fields + ('currency',)
         return self.readonly_fields
 
 # Transaction admin
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ('account', 'transaction_type', 'amount', 'recipient_account', 'status', 'date', 'created_by', 'description')
-    list_filter = ('transaction_type', 'status', 'date', 'created_by')
+    list_display = ('account', 'transaction_type', 'display_amount', 'currency', 'recipient_account', 'status', 'risk_flags', 'date', 'created_by', 'description')
+    # No created_by filter: its sidebar would load every user. Search by creator email instead.
+    list_filter = ('transaction_type', 'status', 'date')
     search_fields = ('description', 'account__account_number', 'created_by__email', 'recipient_account__account_number')
-    readonly_fields = ('amount', 'account', 'recipient_account', 'transaction_type', 'date', 'created_by', 'description')
+    list_select_related = ('account__user', 'recipient_account__user', 'created_by')
+    autocomplete_fields = ('account', 'recipient_account', 'created_by')
+    show_full_result_count = False
+    paginator = LargeTablePaginator
+    readonly_fields = ('display_amount', 'currency', 'account', 'recipient_account', 'transaction_type', 'date', 'created_by', 'description',
+                       'fx_rate', 'credit_amount', 'credit_currency', 'risk_flags')
 
     actions = ['approve_transaction', 'reject_transaction']
 
     def approve_transaction(self, request, queryset):
         updated = 0
-        for transaction in queryset.filter(status='pending'):
-            transaction.status = 'completed'
-            transaction.save()  # Triggers balance updates in model
-            updated += 1
+        refused = []
+        with db_transaction.atomic():
+            transactions = list(queryset.select_related(None).select_for_update().filter(status='pending'))
+            # Post against shared, locked account rows so several approvals for one account add up
+            ids = {tx.account_id for tx in transactions} | {tx.recipient_account_id for tx in transactions}
+            accounts = lock_accounts(ids - {None})
+            for transaction in transactions:
+                # Same rules as the settlement worker; refused rows stay pending
+                reason = rejection_reason(transaction, accounts)
+                if reason:
+                    refused.append(f"#{transaction.pk}: {reason}")
+                    continue
+                transaction.account = accounts[transaction.account_id]
+                if transaction.recipient_account_id:
+                    transaction.recipient_account = accounts[transaction.recipient_account_id]
+                transaction.status = 'completed'
+                transaction.save()  # Triggers balance updates in model
+                audit.record('transaction.approve', transaction, request.user, amount=transaction.amount,
+                             currency=transaction.currency)
+                updated += 1
         self.message_user(request, f"{updated} transaction(s) approved successfully.", messages.SUCCESS)
+        if refused:
+            self.message_user(request, f"{len(refused)} transaction(s) not approved: {'; '.join(refused)}",
+                              messages.WARNING)
     approve_transaction.short_description = "Approve selected pending transactions"
 
     def reject_transaction(self, request, queryset):
-        updated = queryset.filter(status='pending').update(status='failed')
+        with db_transaction.atomic():
+            transactions = list(queryset.select_related(None).select_for_update().filter(status='pending'))
+            updated = Transaction.objects.filter(pk__in=[tx.pk for tx in transactions]).update(status='failed')
+            for transaction in transactions:
+                transaction.status = 'failed'
+                audit.record('transaction.reject', transaction, request.user)
+            outbox.emit_transactions(transactions)
         self.message_user(request, f"{updated} transaction(s) rejected successfully.", messages.SUCCESS)
     reject_transaction.short_description = "Reject selected pending transactions"
 
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip Transaction.delete(); move the owners' response ETags here
+        with db_transaction.atomic():
+            account_ids = set(queryset.values_list('account_id', flat=True))
+            super().delete_queryset(request, queryset)
+            conditional.bump_accounts(account_ids)
+
+    @admin.display(description='Amount', ordering='amount')
+    def display_amount(self, obj):
+        return obj.formatted_amount
+
+    def get_exclude(self, request, obj=None):
+        # Existing amounts are shown formatted via display_amount instead
+        return ('amount',) if obj else ()
+
     def get_readonly_fields(self, request, obj=None):
         # All fields readonly when editing to prevent inconsistencies
         if obj:
             return self.readonly_fields
-        return ('date', 'created_by')  # Only these are readonly when adding
+        return ('date', 'created_by', 'currency', 'fx_rate', 'credit_amount', 'credit_currency', 'risk_flags')  # Set on save
+
+@admin.register(RecurringTransfer)
+class RecurringTransferAdmin(admin.ModelAdmin):
+    list_display = ('account', 'recipient_account', 'display_amount', 'schedule', 'next_run_at', 'last_run_at', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('account__account_number', 'recipient_account__account_number', 'description')
+    list_select_related = ('account__user', 'recipient_account__user')
+    autocomplete_fields = ('account', 'recipient_account', 'created_by')
+    show_full_result_count = False
+    paginator = LargeTablePaginator
+
+    @admin.display(description='Amount', ordering='amount')
+    def display_amount(self, obj):
+        return format_minor(obj.amount, obj.currency)
+
+@admin.register(FxRate)
+class FxRateAdmin(admin.ModelAdmin):
+    list_display = ('base_currency', 'quote_currency', 'rate', 'updated_at')
+    list_filter = ('base_currency', 'quote_currency')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        fx.invalidate()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        fx.invalidate()
+
+@admin.register(Statement)
+class StatementAdmin(admin.ModelAdmin):
+    # Statements are written by `manage.py generate_statements` only
+    list_display = ('account', 'period', 'transaction_count', 'display_closing_balance', 'generated_at')
+    list_filter = ('period',)
+    search_fields = ('account__account_number',)
+    list_select_related = ('account__user',)
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Closing balance', ordering='closing_balance')
+    def display_closing_balance(self, obj):
+        return format_minor(obj.closing_balance, obj.currency)
+
+@admin.register(AuditLogEntry)
+class AuditLogEntryAdmin(admin.ModelAdmin):
+    # Read-only: rows are hash chained and only ever appended by accounts.audit
+    list_display = ('timestamp', 'actor_id', 'action', 'object_type', 'object_id')
+    list_filter = ('action', 'object_type')
+    search_fields = ('object_id',)
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 admin.site.register(User, UserAdmin)
\ No newline at end of file
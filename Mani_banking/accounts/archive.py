@@ -0,0 +1,111 @@
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import conditional, sharding
+from .models import ArchivedTransaction, Transaction
+
+# HOT/COLD TRANSACTION STORAGE
+# Settled transactions past the archive age live in ArchivedTransaction. Lists
+# without a date_from show hot rows only; the archive is read only when
+# date_from reaches back to its newest row. That boundary comes from the
+# archive itself, not from settings: archive_transactions --older-than-days
+# may have moved newer rows.
+
+ARCHIVED_STATUSES = ('completed', 'failed')
+ARCHIVE_FIELDS = ('id', 'account_id', 'recipient_account_id', 'amount', 'currency', 'description',
+                  'transaction_type', 'status', 'date', 'completed_at', 'created_by_id',
+                  'fx_rate', 'credit_amount', 'credit_currency')
+
+
+def archive_cutoff(now=None):
+    days = getattr(settings, 'TRANSACTION_ARCHIVE_AFTER_DAYS', 365)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archive_batch(cutoff, batch_size=1000):
+    """Move one batch of the current shard's settled transactions older than cutoff. Returns rows moved."""
+    with db_transaction.atomic(using=sharding.current_shard()):
+        rows = list(
+            Transaction.objects
+            .filter(status__in=ARCHIVED_STATUSES, date__lt=cutoff)
+            .order_by('id')
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedTransaction.objects.bulk_create(ArchivedTransaction(**row) for row in rows)
+        Transaction.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        # Default transaction lists only show hot rows, so they change too
+        conditional.bump_accounts({row['account_id'] for row in rows})
+    return len(rows)
+
+
+def needs_archive(date_from, archived):
+    """True if a list from date_from may include rows of archived.
+
+    archived is the reader's ArchivedTransaction queryset; its newest date
+    comes from the (account, date) index and is only read for a date_from.
+    """
+    if not date_from:
+        return False
+    value = parse_datetime(date_from)
+    if value is None:
+        day = parse_date(date_from)
+        if day is None:
+            return True
+        value = timezone.make_aware(datetime.combine(day, time.min))
+    elif timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    newest = archived.aggregate(newest=Max('date'))['newest']
+    return newest is not None and value <= newest
+
+
+def newest_first(tx):
+    return tx.date, tx.pk
+
+
+class TieredTransactions:
+    """Read-only sequence merging hot and archived transactions, newest first.
+
+    Supports count() and slicing, which is all list pagination needs. Both
+    querysets must be ordered by descending date and id. Pending rows stay hot
+    however old they are, so the two tiers overlap in time and are merged
+    rather than concatenated; a slice reads at most its stop rows from each.
+    """
+
+    def __init__(self, hot, archived):
+        self.hot = hot
+        self.archived = archived
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return heapq.merge(self.hot, self.archived, key=newest_first, reverse=True)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        if stop <= start:
+            return []
+        # Any of the first stop rows may come from either tier
+        merged = heapq.merge(self.hot[:stop], self.archived[:stop], key=newest_first, reverse=True)
+        return list(islice(merged, start, stop))
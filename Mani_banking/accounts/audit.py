@@ -0,0 +1,107 @@
+import hashlib
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import IntegrityError
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .models import AuditLogEntry
+
+# AUDIT LOG
+# record() never writes on its own. An event joins the current batch only
+# once the database transaction it describes commits (transaction.on_commit),
+# so rolled back work leaves no trail, and the batch is written with a single
+# bulk_create when it closes. AuditMiddleware opens one batch per request;
+# outside a batch each committed event is written on its own.
+#
+# Rows are hash chained: hash = SHA-256(prev_hash + canonical JSON of the row).
+# Appending reads the newest hash and inserts the batch in one transaction; a
+# concurrent writer that chained onto the same row hits the unique prev_hash
+# constraint and retries on top of the new head.
+
+GENESIS_HASH = '0' * 64
+APPEND_ATTEMPTS = 5
+
+_batch = ContextVar('audit_batch', default=None)
+
+
+def chain_hash(prev_hash, timestamp, actor_id, action, object_type, object_id, data):
+    payload = json.dumps(
+        [timestamp.isoformat(), actor_id, action, object_type, object_id, data],
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256((prev_hash + payload).encode()).hexdigest()
+
+
+def append(entries):
+    """Chain entries onto the log and insert them with one bulk_create."""
+    if not entries:
+        return
+    for attempt in range(APPEND_ATTEMPTS):
+        try:
+            with db_transaction.atomic():
+                prev_hash = AuditLogEntry.objects.order_by('-id').values_list('hash', flat=True).first() or GENESIS_HASH
+                for entry in entries:
+                    entry.prev_hash = prev_hash
+                    entry.hash = prev_hash = chain_hash(
+                        entry.prev_hash, entry.timestamp, entry.actor_id, entry.action,
+                        entry.object_type, entry.object_id, entry.data,
+                    )
+                AuditLogEntry.objects.bulk_create(entries)
+            return
+        except IntegrityError:
+            # Another writer extended the chain first
+            if attempt == APPEND_ATTEMPTS - 1:
+                raise
+
+
+def record(action, target, actor=None, using=None, **data):
+    """Log `action` on the model instance `target` once the current transaction commits.
+
+    using names the database of that transaction when it is not 'default'.
+    """
+    entry = AuditLogEntry(
+        timestamp=timezone.now(),
+        actor_id=getattr(actor, 'pk', None),
+        action=action,
+        object_type=target._meta.model_name,
+        object_id=str(target.pk),
+        data=data,
+    )
+    batch = _batch.get()
+    if batch is None:
+        db_transaction.on_commit(partial(append, [entry]), using=using)
+    else:
+        db_transaction.on_commit(partial(batch.append, entry), using=using)
+
+
+@contextmanager
+def batch():
+    """Collect committed events and write them together when the block exits."""
+    if _batch.get() is not None:
+        yield
+        return
+    entries = []
+    token = _batch.set(entries)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+        # Runs now in autocommit mode; inside an atomic block it runs after the
+        # commit, behind the callbacks that fill `entries`
+        db_transaction.on_commit(partial(append, entries))
+
+
+class AuditMiddleware:
+    """Writes each request's audit events in one batch."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with batch():
+            return self.get_response(request)
@@ -0,0 +1,36 @@
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+# LAZY JWT AUTHENTICATION
+# simplejwt pulls in PyJWT, its settings module and django.test at import
+# time, and DRF imports every DEFAULT_AUTHENTICATION_CLASSES entry as soon as
+# the first view module loads. Clients mostly send "Token ..." headers, so
+# JWTAuthentication is only imported once a request actually carries a JWT.
+
+
+class LazyJWTAuthentication(BaseAuthentication):
+    """Defers to simplejwt's JWTAuthentication for requests with a JWT header type."""
+    _backend = None
+
+    @classmethod
+    def backend(cls):
+        if cls._backend is None:
+            from rest_framework_simplejwt.authentication import JWTAuthentication
+            cls._backend = JWTAuthentication()
+        return cls._backend
+
+    @staticmethod
+    def header_types():
+        header_types = getattr(settings, 'SIMPLE_JWT', {}).get('AUTH_HEADER_TYPES', ('Bearer',))
+        if isinstance(header_types, str):
+            header_types = (header_types,)
+        return {header_type.encode() for header_type in header_types}
+
+    def authenticate(self, request):
+        parts = get_authorization_header(request).split()
+        if not parts or parts[0] not in self.header_types():
+            return None
+        return self.backend().authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.backend().authenticate_header(request)
@@ -0,0 +1,52 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+from django.db.models import Max, Min
+
+from . import sharding
+
+# HELPERS FOR BATCH COMMANDS
+# Batch jobs split the primary key space into contiguous ranges and hand each
+# range to a worker process. Ranges keep every worker on its own index segment
+# and make progress easy to checkpoint (last processed id per range). With
+# sharding, each shard's rows are split separately, so no range spans two.
+
+
+def id_ranges(queryset, parts):
+    """Split the queryset's pk span into at most `parts` inclusive (start, end) ranges."""
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    low, high = bounds['low'], bounds['high']
+    if low is None:
+        return []
+    parts = max(1, min(parts, high - low + 1))
+    size = -(-(high - low + 1) // parts)  # ceiling division
+    return [(start, min(start + size - 1, high)) for start in range(low, high + 1, size)]
+
+
+def shard_id_ranges(model, parts):
+    """id_ranges of the model's rows on every shard, up to `parts` per shard."""
+    return [
+        bounds
+        for alias in sharding.shard_aliases()
+        for bounds in id_ranges(model.objects.using(alias), parts)
+    ]
+
+
+def _call_in_worker(func, args):
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    return func(*args)
+
+
+def run_parallel(func, args_list, workers):
+    """Run func(*args) for each args tuple, in a process pool when workers > 1.
+
+    func must be a module-level function. Results come back in input order.
+    """
+    if workers <= 1 or len(args_list) <= 1:
+        return [func(*args) for args in args_list]
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return list(pool.map(_call_in_worker, [func] * len(args_list), args_list))
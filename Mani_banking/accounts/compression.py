@@ -0,0 +1,125 @@
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip covers every client
+    brotli = None
+
+# RESPONSE COMPRESSION
+# Bodies of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed with brotli
+# (when installed and accepted) or gzip. Streaming responses are compressed
+# chunk by chunk with a flush after each, so nothing is buffered; server-sent
+# events are left alone since every event must reach the client as written.
+# A strong ETag becomes weak once the body is re-encoded.
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+SKIPPED_CONTENT_TYPES = ('text/event-stream',)
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def choose_encoder(accept_encoding):
+    """The encoder class for an Accept-Encoding header, or None for identity."""
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    if brotli is not None and 'br' in accepted:
+        return BrotliEncoder
+    if 'gzip' in accepted:
+        return GzipEncoder
+    return None
+
+
+def compress_stream(encoder, chunks):
+    for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+class CompressionMiddleware:
+    """Compresses API and admin responses; see the module comment."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.status_code < 200 or response.status_code in (204, 304)
+            or response.has_header('Content-Encoding')
+            or response.get('Content-Type', '').startswith(SKIPPED_CONTENT_TYPES)
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        min_bytes = getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024)
+        if response.streaming:
+            length = response.get('Content-Length')
+            if response.is_async or (length is not None and int(length) < min_bytes):
+                return response
+        elif len(response.content) < min_bytes:
+            return response
+        encoder_class = choose_encoder(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoder_class is None:
+            return response
+
+        encoder = encoder_class()
+        if response.streaming:
+            response.streaming_content = compress_stream(encoder, response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = encoder.name
+        return response
@@ -0,0 +1,106 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+
+from . import sharding
+
+# CONDITIONAL API RESPONSES
+# Each user row carries data_version, bumped in the same database transaction
+# as any change to the user's accounts or transactions (outbox.emit calls
+# bump_accounts, so everything downstream consumers hear about counts; account
+# saves and deletes bump through signals, transaction deletes explicitly). A
+# response's weak ETag is derived from that counter, the user's own displayed
+# fields and the request, so no body is ever rendered or hashed to compare.
+#
+# The version is read before the view builds the body and from the same
+# database, so a tag can only be older than its body, never newer: a stale tag
+# costs one full response, it never pins stale data. RESPONSE_ETAG_EPOCH is
+# part of every tag; bump it when a release changes response bodies.
+#
+# When accounts are sharded, users live on 'default', apart from the shard that
+# changed, and bumping them there would make every posting on every shard
+# write to one database. The changed accounts' own data_version is bumped
+# instead, in the shard's transaction, and the tag adds the count and sum of
+# the user's account versions, read from the user's shard.
+
+
+def bump_accounts(account_ids, using=None):
+    """Invalidate cached responses of the owners of these accounts.
+
+    using is the database of the change, when the router cannot tell it.
+    """
+    from .models import Account, User
+    account_ids = {pk for pk in account_ids if pk is not None}
+    if not account_ids:
+        return
+    if sharding.is_enabled():
+        alias = using or sharding.current_shard()
+        # Accounts on other shards are bumped where they are credited (postings.credit)
+        Account.objects.using(alias).filter(
+            pk__in=[pk for pk in account_ids if sharding.is_local(pk, alias)]
+        ).update(data_version=F('data_version') + 1)
+        return
+    User.objects.filter(
+        pk__in=Account.objects.filter(pk__in=account_ids).values('user_id')
+    ).update(data_version=F('data_version') + 1)
+
+
+def response_etag(request):
+    from .models import Account, User
+    user = request.user
+    # Read through the router: on replica reads this is the replica the body comes from
+    version = User.objects.filter(pk=user.pk).values_list('data_version', flat=True).first()
+    if sharding.is_enabled():
+        accounts = Account.objects.using(sharding.alias_for_user(user)).filter(user_id=user.pk).aggregate(
+            count=Count('pk'), version=Sum('data_version'),
+        )
+        version = f"{version}.{accounts['count']}.{accounts['version'] or 0}"
+    key = '\n'.join(str(part) for part in (
+        getattr(settings, 'RESPONSE_ETAG_EPOCH', 1), version,
+        user.email, user.first_name, user.last_name, user.is_email_verified,
+        request.build_absolute_uri(), request.accepted_media_type,
+    ))
+    return f'W/"{user.pk}-{version}-{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+
+
+def etag_matches(etag, if_none_match):
+    # If-None-Match uses weak comparison: only the opaque tags are compared
+    opaque = etag.removeprefix('W/')
+    return any(tag == '*' or tag.removeprefix('W/') == opaque for tag in parse_etags(if_none_match))
+
+
+class NotModified(Exception):
+    pass
+
+
+class ConditionalResponseMixin:
+    """Tag GET responses with a weak ETag and answer a matching If-None-Match with 304."""
+    etag = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and request.user.is_authenticated:
+            self.etag = response_etag(request)
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+            if if_none_match and etag_matches(self.etag, if_none_match):
+                # Raised before the handler runs, so a 304 costs no view queries
+                raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            from rest_framework.response import Response  # Kept out of the models import chain
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.etag
+            # Private to the user and always revalidated, which is a cheap 304
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Authorization',))
+        return response
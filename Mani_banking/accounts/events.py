@@ -0,0 +1,201 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import sharding
+from .money import format_minor
+
+# REAL-TIME ACCOUNT EVENTS
+# Balance and transaction deltas are published per user once the database
+# transaction that produced them commits. Subscribers (the SSE stream view)
+# receive them from a broker set by ACCOUNT_EVENTS_BROKER:
+#
+# - InProcessBroker hands published events to streams of the same process only.
+#   Enough for a single process that also settles, as in tests.
+# - DatabaseBroker derives each stream's events from the database instead:
+#   balances of the user's accounts and transaction rows of the outbox
+#   (accounts/outbox.py), polled every ACCOUNT_EVENTS_POLL_SECONDS. Changes
+#   committed anywhere (run_settlement, admin approvals, other web workers,
+#   credits from other shards) reach every stream, at the price of two small
+#   queries per open stream and poll.
+
+class BaseBroker:
+    def publish(self, user_id, event):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Return a queue.Queue receiving the user's events."""
+        raise NotImplementedError
+
+    def unsubscribe(self, user_id, subscription):
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    max_queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                # Slow consumer, drop the event; the client re-syncs on reconnect
+                pass
+
+    def subscribe(self, user_id):
+        subscription = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[user_id]
+
+
+class DatabaseSubscription:
+    """Queue-like view of one user's changes, read from the user's shard."""
+
+    def __init__(self, user_id, poll_seconds):
+        from .models import OutboxEvent, User
+        self.user_id = user_id
+        self.poll_seconds = poll_seconds
+        self.alias = sharding.alias_for_user(User.objects.only('shard').get(pk=user_id))
+        self.pending = deque()
+        last = OutboxEvent.objects.using(self.alias).order_by('-pk').values_list('pk', flat=True).first()
+        self.last_event_id = last or 0
+        self.balances = None
+        self.poll()
+
+    def poll(self):
+        from .models import Account, OutboxEvent
+        accounts = list(
+            Account.objects.using(self.alias).filter(user_id=self.user_id)
+            .only('pk', 'account_number', 'balance', 'currency')
+        )
+        # Only the source account's owner gets a transaction, as with publish_transaction
+        rows = list(
+            OutboxEvent.objects.using(self.alias)
+            .filter(pk__gt=self.last_event_id, topic__startswith='transaction.', key__in=[str(a.pk) for a in accounts])
+            .order_by('pk')
+            .values_list('pk', 'payload')
+        )
+        if rows:
+            self.last_event_id = rows[-1][0]
+        balances = {account.account_number: account.formatted_balance for account in accounts}
+        if self.balances is not None:
+            self.pending.extend(outbox_transaction_event(payload) for _, payload in rows)
+            self.pending.extend(
+                balance_event(account) for account in accounts
+                if self.balances.get(account.account_number) != balances[account.account_number]
+            )
+        self.balances = balances
+
+    def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise queue.Empty
+            time.sleep(min(self.poll_seconds, remaining))
+            self.poll()
+        return self.pending.popleft()
+
+
+class DatabaseBroker(BaseBroker):
+    """Streams what committed, whichever process committed it; publish() has nothing to do."""
+
+    def __init__(self):
+        self.poll_seconds = getattr(settings, 'ACCOUNT_EVENTS_POLL_SECONDS', 2)
+
+    def publish(self, user_id, event):
+        pass
+
+    def subscribe(self, user_id):
+        return DatabaseSubscription(user_id, self.poll_seconds)
+
+    def unsubscribe(self, user_id, subscription):
+        pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'ACCOUNT_EVENTS_BROKER', 'accounts.events.InProcessBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def balance_event(account):
+    return {
+        'type': 'balance',
+        'account_number': account.account_number,
+        'balance': account.formatted_balance,
+    }
+
+def transaction_event(tx):
+    return {
+        'type': 'transaction',
+        'id': tx.pk,
+        'account': tx.account_id,
+        'recipient_account': tx.recipient_account_id,
+        'amount': tx.formatted_amount,
+        'currency': tx.currency,
+        'transaction_type': tx.transaction_type,
+        'status': tx.status,
+    }
+
+def outbox_transaction_event(payload):
+    """transaction_event() for an outbox payload, which holds minor units."""
+    return {
+        'type': 'transaction',
+        'id': payload['id'],
+        'account': payload['account'],
+        'recipient_account': payload['recipient_account'],
+        'amount': format_minor(payload['amount'], payload['currency']),
+        'currency': payload['currency'],
+        'transaction_type': payload['type'],
+        'status': payload['status'],
+    }
+
+def publish_transaction(tx, accounts=()):
+    """Publish a transaction to its owner and the balances it touched to theirs.
+
+    Only the source account's owner gets the transaction: it is listed for them
+    alone, recipients see the credit as a balance change.
+    Call from transaction.on_commit so subscribers never see rolled back data.
+    """
+    broker = get_broker()
+    broker.publish(tx.account.user_id, transaction_event(tx))
+    for account in accounts:
+        broker.publish(account.user_id, balance_event(account))
+
+def publish_balances(accounts):
+    """Publish balances changed without a local transaction, e.g. cross-shard credits."""
+    broker = get_broker()
+    for account in accounts:
+        broker.publish(account.user_id, balance_event(account))
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
@@ -0,0 +1,93 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .money import exponent
+
+# FOREIGN EXCHANGE
+# All FxRate rows are held in memory as integers scaled by RATE_SCALE. Each
+# process polls the table's version, its row count and newest updated_at, at
+# most every FX_VERSION_CHECK_SECONDS and reloads the rates only when it moved,
+# so converting a transfer never queries the database. The version lives in
+# the database, which every worker process sees, rather than in a cache.
+
+RATE_SCALE = 10 ** 10
+
+
+class FxRateUnavailable(Exception):
+    pass
+
+
+def scale_rate(rate):
+    return int(Decimal(rate).scaleb(10).to_integral_value())
+
+def unscale_rate(scaled):
+    return Decimal(scaled).scaleb(-10)
+
+
+class RateCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates = {}
+        self._version = None
+        self._checked_at = None
+
+    def _refresh(self):
+        interval = getattr(settings, 'FX_VERSION_CHECK_SECONDS', 30)
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < interval:
+            return
+        with self._lock:
+            from .models import FxRate
+            version = FxRate.objects.aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+            if version != self._version:
+                self._rates = {
+                    (base, quote): scale_rate(rate)
+                    for base, quote, rate in FxRate.objects.values_list('base_currency', 'quote_currency', 'rate')
+                }
+                self._version = version
+            self._checked_at = now
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+
+    def scaled_rate(self, base, quote):
+        """Rate for base -> quote scaled by RATE_SCALE, using the inverse pair if needed."""
+        if base == quote:
+            return RATE_SCALE
+        self._refresh()
+        rate = self._rates.get((base, quote))
+        if rate is not None:
+            return rate
+        inverse = self._rates.get((quote, base))
+        if inverse:
+            return (RATE_SCALE * RATE_SCALE + inverse // 2) // inverse
+        raise FxRateUnavailable(f"No exchange rate from {base} to {quote}.")
+
+
+rates = RateCache()
+
+
+def invalidate():
+    """Reload rates in this process on next use; others notice the change on their next version check."""
+    rates.clear()
+
+
+def convert(amount, base, quote, scaled_rate):
+    """Convert minor units of base into minor units of quote, rounding half up."""
+    numerator = amount * scaled_rate * 10 ** exponent(quote)
+    denominator = RATE_SCALE * 10 ** exponent(base)
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def lock_rate(tx, base, quote):
+    """Fix the rate and credited amount of a cross-currency transfer on tx."""
+    scaled = rates.scaled_rate(base, quote)
+    tx.fx_rate = unscale_rate(scaled)
+    tx.credit_currency = quote
+    tx.credit_amount = convert(tx.amount, base, quote, scaled)
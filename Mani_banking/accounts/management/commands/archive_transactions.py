@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import sharding
+from accounts.archive import archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move settled transactions older than TRANSACTION_ARCHIVE_AFTER_DAYS into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Transactions moved per database transaction.")
+        parser.add_argument('--older-than-days', type=int, default=None, help="Override TRANSACTION_ARCHIVE_AFTER_DAYS.")
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        else:
+            cutoff = archive_cutoff()
+
+        total = 0
+        for alias in sharding.shard_aliases():
+            with sharding.using_shard(alias):
+                while True:
+                    moved = archive_batch(cutoff, options['batch_size'])
+                    if not moved:
+                        break
+                    total += moved
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"Archived {total} transaction(s)...")
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} transaction(s) older than {cutoff:%Y-%m-%d}."))
@@ -0,0 +1,44 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.batching import run_parallel, shard_id_ranges
+from accounts.models import Account
+from accounts.statements import generate_range, previous_period
+
+
+class Command(BaseCommand):
+    help = "Render monthly HTML and PDF statements for every account (re-running a month overwrites it)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Statement month as YYYY-MM (default: last month).")
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes, one account id range each.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Accounts rendered per batch of queries.")
+
+    def handle(self, *args, **options):
+        this_month = timezone.localdate().replace(day=1)
+        if options['month']:
+            try:
+                period = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--month must be YYYY-MM.")
+        else:
+            period = previous_period(this_month)
+        # Next month's opening balance carries over from this closing balance, so only finished months
+        if period >= this_month:
+            raise CommandError("Statements can only be generated for months that have ended.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        started = time.perf_counter()
+        results = run_parallel(
+            generate_range,
+            [(period, start, end, options['chunk_size']) for start, end in shard_id_ranges(Account, options['workers'])],
+            options['workers'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {sum(results)} statement(s) for {period:%Y-%m} in {elapsed:.2f}s."
+        ))
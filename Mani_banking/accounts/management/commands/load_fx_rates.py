@@ -0,0 +1,46 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+
+from accounts import fx
+from accounts.models import FxRate
+from accounts.money import CURRENCY_EXPONENTS
+
+
+class Command(BaseCommand):
+    help = "Load exchange rates from a CSV file with columns base,quote,rate and invalidate cached rates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, e.g. 'USD,EUR,0.9213'. A header row is optional.")
+
+    def handle(self, *args, **options):
+        rates = []
+        try:
+            with open(options['path'], newline='') as f:
+                for line_number, row in enumerate(csv.reader(f), start=1):
+                    if not row or row[0].strip().lower() == 'base':
+                        continue
+                    try:
+                        base, quote, rate = (value.strip() for value in row[:3])
+                        rate = Decimal(rate)
+                    except (ValueError, InvalidOperation):
+                        raise CommandError(f"Line {line_number}: expected base,quote,rate.")
+                    if base not in CURRENCY_EXPONENTS or quote not in CURRENCY_EXPONENTS:
+                        raise CommandError(f"Line {line_number}: unsupported currency pair {base}/{quote}.")
+                    if rate <= 0:
+                        raise CommandError(f"Line {line_number}: rate must be positive.")
+                    rates.append(FxRate(base_currency=base, quote_currency=quote, rate=rate))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with db_transaction.atomic():
+            FxRate.objects.bulk_create(
+                rates,
+                update_conflicts=True,
+                unique_fields=['base_currency', 'quote_currency'],
+                update_fields=['rate', 'updated_at'],
+            )
+            db_transaction.on_commit(fx.invalidate)
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(rates)} exchange rate(s)."))
@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under `python -X importtime`, so every import is
+# cold exactly as in a new gunicorn worker. Each app's ready() is wrapped to
+# time it, and the URLconf is imported because the first request does that.
+BOOT_SCRIPT = r'''
+import json, sys, time
+from django.apps.config import AppConfig
+
+timings = {'ready': {}}
+create = AppConfig.create.__func__
+
+def timed_create(cls, entry):
+    config = create(cls, entry)
+    ready = config.ready
+    def timed_ready():
+        started = time.perf_counter()
+        ready()
+        timings['ready'][config.label] = time.perf_counter() - started
+    config.ready = timed_ready
+    return config
+
+AppConfig.create = classmethod(timed_create)
+
+started = time.perf_counter()
+import django
+django.setup()
+timings['setup'] = time.perf_counter() - started
+
+from django.conf import settings
+from django.urls import get_resolver
+started = time.perf_counter()
+get_resolver(settings.ROOT_URLCONF).url_patterns
+timings['urlconf'] = time.perf_counter() - started
+timings['modules'] = len(sys.modules)
+sys.stdout.write(json.dumps(timings))
+'''
+
+
+def parse_importtime(stderr):
+    """Yield (module, self_us, cumulative_us) from `-X importtime` output."""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        yield name.strip(), int(self_us), int(cumulative_us)
+
+
+class Command(BaseCommand):
+    help = "Profile a cold worker start: import cost per module and package, app ready() cost and URLconf load."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help="Rows shown per table.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'Mani_banking.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Worker boot failed:\n{result.stderr[-2000:]}")
+        timings = json.loads(result.stdout)
+        imports = list(parse_importtime(result.stderr))
+
+        packages = defaultdict(int)
+        for name, self_us, _ in imports:
+            packages[name.split('.')[0]] += self_us
+        top = options['top']
+
+        self.stdout.write(f"django.setup(): {timings['setup'] * 1000:.1f} ms, URLconf: {timings['urlconf'] * 1000:.1f} ms, "
+                          f"{timings['modules']} modules loaded")
+
+        self.stdout.write("\nSlowest modules (cumulative, includes their imports):")
+        for name, _, cumulative_us in sorted(imports, key=lambda row: row[2], reverse=True)[:top]:
+            self.stdout.write(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+        self.stdout.write("\nImport time by top-level package (self time):")
+        for name, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            self.stdout.write(f"  {self_us / 1000:>8.1f} ms  {name}")
+
+        self.stdout.write("\nAppConfig.ready():")
+        for label, seconds in sorted(timings['ready'].items(), key=lambda item: item[1], reverse=True)[:top]:
+            self.stdout.write(f"  {seconds * 1000:>8.1f} ms  {label}")
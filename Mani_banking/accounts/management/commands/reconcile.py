@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.batching import run_parallel, shard_id_ranges
+from accounts.models import Account
+from accounts.money import format_minor
+from accounts.reconcile import reconcile_range
+
+
+class Command(BaseCommand):
+    help = "Check every account balance against the sum of its completed transactions and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes, one account id range each.")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Accounts aggregated per query.")
+        parser.add_argument('--fix', action='store_true', help="Set drifted balances to the expected amount.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        started = time.perf_counter()
+        results = run_parallel(
+            reconcile_range,
+            [(start, end, options['chunk_size'], options['fix']) for start, end in shard_id_ranges(Account, options['workers'])],
+            options['workers'],
+        )
+        elapsed = time.perf_counter() - started
+
+        drift = [row for rows in results for row in rows]
+        for row in drift:
+            difference = row.balance - row.expected
+            line = (
+                f"{row.account_number}: balance {format_minor(row.balance, row.currency)} {row.currency}, "
+                f"expected {format_minor(row.expected, row.currency)} (drift {format_minor(difference, row.currency)})"
+            )
+            if options['fix']:
+                line += " - fixed" if row.fixed else " - changed during the run, not fixed"
+            self.stdout.write(line)
+
+        summary = f"{len(drift)} drifted account(s) found in {elapsed:.2f}s."
+        if options['fix']:
+            summary += f" {sum(row.fixed for row in drift)} corrected."
+        self.stdout.write(self.style.SUCCESS(summary) if not drift else self.style.WARNING(summary))
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import sharding
+from accounts.outbox import get_sink, prune, relay_batch
+
+
+class Command(BaseCommand):
+    help = "Publish outbox events to consumer sinks in batches (at-least-once, resumable per consumer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', dest='consumers',
+                            help="Consumer from OUTBOX_CONSUMERS; repeat for several (default: all).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Events per published batch.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new events.")
+        parser.add_argument('--idle-sleep', type=float, default=1.0, help="Seconds to wait when no consumer has new events (with --loop).")
+        parser.add_argument('--prune', action='store_true', help="Afterwards, delete events every configured consumer has received.")
+
+    def handle(self, *args, **options):
+        configured = list(getattr(settings, 'OUTBOX_CONSUMERS', {}))
+        consumers = options['consumers'] or configured
+        unknown = set(consumers) - set(configured)
+        if unknown:
+            raise CommandError(f"Unknown consumer(s): {', '.join(sorted(unknown))}.")
+
+        sinks = {consumer: get_sink(consumer) for consumer in consumers}
+        sent = dict.fromkeys(consumers, 0)
+        started = time.perf_counter()
+        try:
+            while True:
+                progress = 0
+                for alias in sharding.shard_aliases():
+                    with sharding.using_shard(alias):
+                        for consumer, sink in sinks.items():
+                            count = relay_batch(consumer, sink, options['batch_size'])
+                            sent[consumer] += count
+                            progress += count
+                if not progress:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['idle_sleep'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for sink in sinks.values():
+                sink.close()
+
+        elapsed = time.perf_counter() - started
+        for consumer, count in sent.items():
+            self.stdout.write(f"{consumer}: {count} event(s) published.")
+        if options['prune']:
+            pruned = 0
+            for alias in sharding.shard_aliases():
+                with sharding.using_shard(alias):
+                    pruned += prune(configured)
+            self.stdout.write(f"Pruned {pruned} delivered event(s).")
+        self.stdout.write(self.style.SUCCESS(f"Outbox relay finished in {elapsed:.2f}s."))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import sharding
+from accounts.recurring import run_due_batch
+
+
+class Command(BaseCommand):
+    help = "Post due recurring transfers in batches. Safe to run several schedulers in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Schedules claimed per batch.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for due schedules.")
+        parser.add_argument('--idle-sleep', type=float, default=5.0, help="Seconds to wait when nothing is due (with --loop).")
+
+    def handle(self, *args, **options):
+        completed = failed = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                progress = 0
+                for alias in sharding.shard_aliases():
+                    with sharding.using_shard(alias):
+                        result = run_due_batch(batch_size=options['batch_size'])
+                    progress += result.completed + result.failed
+                    completed += result.completed
+                    failed += result.failed
+                if not progress:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['idle_sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {completed + failed} recurring transfer(s): {completed} completed, {failed} failed ({elapsed:.2f}s)."
+        ))
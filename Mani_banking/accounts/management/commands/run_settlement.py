@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import sharding
+from accounts.postings import deliver_prepared
+from accounts.settlement import settle_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle pending transfers in batches, shard by shard, and retry stalled cross-shard credits. "
+        "Safe to run several workers in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Transactions claimed per batch.")
+        parser.add_argument('--max-batches', type=int, default=None, help="Stop after this many batches.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new pending transactions.")
+        parser.add_argument('--idle-sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty (with --loop).")
+
+    def handle(self, *args, **options):
+        batches = completed = failed = delivered = 0
+        started = time.perf_counter()
+        try:
+            while options['max_batches'] is None or batches < options['max_batches']:
+                processed = 0
+                for alias in sharding.shard_aliases():
+                    with sharding.using_shard(alias):
+                        result = settle_pending(options['batch_size'])
+                    if sharding.is_enabled():
+                        delivered += deliver_prepared(alias)
+                    if not result.completed + result.failed:
+                        continue
+                    processed += result.completed + result.failed
+                    batches += 1
+                    completed += result.completed
+                    failed += result.failed
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"Batch {batches} ({alias}): {result.completed} completed, {result.failed} failed")
+                    if batches == options['max_batches']:
+                        break
+                if not processed:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['idle_sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - started
+        total = completed + failed
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Settled {total} transaction(s) in {batches} batch(es): {completed} completed, {failed} failed "
+            f"({elapsed:.2f}s, {rate:.0f} tx/s)"
+        ))
+        if delivered:
+            self.stdout.write(f"Completed {delivered} stalled cross-shard credit(s).")
@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.verification import purge_unverified_users, sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Purge expired email verification tokens (or re-issue and re-send them) in chunked batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reissue', action='store_true',
+                            help="Re-issue expired tokens of unverified users and email the new links instead of deleting them.")
+        parser.add_argument('--purge-users-after', type=int, metavar='DAYS',
+                            help="Also delete unverified users who joined more than DAYS ago and never used their accounts.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per database transaction.")
+
+    def handle(self, *args, **options):
+        if options['purge_users_after'] is not None and options['purge_users_after'] < 1:
+            raise CommandError("--purge-users-after must be at least 1 day.")
+
+        started = time.perf_counter()
+        deleted, reissued, sent = sweep_expired(options['reissue'], options['chunk_size'])
+        self.stdout.write(f"Deleted {deleted} expired token(s).")
+        if options['reissue']:
+            self.stdout.write(f"Re-issued {reissued} expired token(s); {sent} email(s) sent.")
+
+        if options['purge_users_after'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['purge_users_after'])
+            deleted = purge_unverified_users(cutoff, options['chunk_size'])
+            self.stdout.write(f"Deleted {deleted} unverified user(s) who joined before {cutoff:%Y-%m-%d}.")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Verification sweep finished in {elapsed:.2f}s."))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_address_user_date_of_birth_user_phone_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'id'], name='accounts_tr_status_a88a4f_idx'),
+        ),
+    ]
@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+import accounts.money
+from django.db import migrations, models
+
+# Converts Account.balance and Transaction/ArchivedTransaction.amount from
+# DecimalField(10, 2) to integer minor units. Existing rows are in the default
+# currency (2 decimal places), so minor = major * 100.
+
+CHUNK_SIZE = 2000
+
+CONVERSIONS = (
+    ('Account', 'balance'),
+    ('Transaction', 'amount'),
+    ('ArchivedTransaction', 'amount'),
+)
+
+
+def _convert(apps, source, target, transform):
+    for model_name, field in CONVERSIONS:
+        model = apps.get_model('accounts', model_name)
+        batch = []
+        for row in model.objects.only('pk', f'{field}{source}').iterator(chunk_size=CHUNK_SIZE):
+            setattr(row, f'{field}{target}', transform(getattr(row, f'{field}{source}')))
+            batch.append(row)
+            if len(batch) >= CHUNK_SIZE:
+                model.objects.bulk_update(batch, [f'{field}{target}'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, [f'{field}{target}'])
+
+
+def decimal_to_minor(apps, schema_editor):
+    _convert(apps, '', '_minor', lambda value: int((Decimal(value) * 100).to_integral_value()))
+
+
+def minor_to_decimal(apps, schema_editor):
+    _convert(apps, '_minor', '', lambda value: Decimal(value) / 100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_archivedtransaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='balance_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='amount_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='amount_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        # Nullable first so the reverse migration can re-add the columns before refilling them
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(decimal_to_minor, minor_to_decimal),
+        migrations.RemoveField(
+            model_name='account',
+            name='balance',
+        ),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='archivedtransaction',
+            name='amount',
+        ),
+        migrations.RenameField(
+            model_name='account',
+            old_name='balance_minor',
+            new_name='balance',
+        ),
+        migrations.RenameField(
+            model_name='transaction',
+            old_name='amount_minor',
+            new_name='amount',
+        ),
+        migrations.RenameField(
+            model_name='archivedtransaction',
+            old_name='amount_minor',
+            new_name='amount',
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='balance',
+            field=accounts.money.MoneyField(default=0, help_text='Amount in minor units (e.g. cents).'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=accounts.money.MoneyField(help_text='Amount in minor units (e.g. cents).'),
+        ),
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='amount',
+            field=accounts.money.MoneyField(help_text='Amount in minor units (e.g. cents).'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='currency',
+            field=models.CharField(choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='currency',
+            field=models.CharField(choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='currency',
+            field=models.CharField(choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], default='USD', max_length=3),
+        ),
+    ]
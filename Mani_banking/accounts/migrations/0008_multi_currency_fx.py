@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:07
+
+import accounts.money
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_integer_minor_unit_money'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='credit_amount',
+            field=accounts.money.MoneyField(blank=True, help_text='Amount in minor units (e.g. cents).', null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='credit_currency',
+            field=models.CharField(blank=True, choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], max_length=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='fx_rate',
+            field=models.DecimalField(blank=True, decimal_places=10, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='credit_amount',
+            field=accounts.money.MoneyField(blank=True, help_text='Amount in minor units (e.g. cents).', null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='credit_currency',
+            field=models.CharField(blank=True, choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], max_length=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='fx_rate',
+            field=models.DecimalField(blank=True, decimal_places=10, max_digits=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_currency', models.CharField(choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], max_length=3)),
+                ('quote_currency', models.CharField(choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], max_length=3)),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('base_currency', 'quote_currency'), name='unique_fx_pair')],
+            },
+        ),
+    ]
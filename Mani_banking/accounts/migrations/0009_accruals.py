@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_multi_currency_fx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('transfer', 'Transfer'), ('payment', 'Payment'), ('fee', 'Fee'), ('interest', 'Interest')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('transfer', 'Transfer'), ('payment', 'Payment'), ('fee', 'Fee'), ('interest', 'Interest')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='AccrualCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField()),
+                ('range_start', models.BigIntegerField()),
+                ('range_end', models.BigIntegerField()),
+                ('last_account_id', models.BigIntegerField(blank=True, null=True)),
+                ('accounts_processed', models.PositiveIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('run_date', 'range_start'), name='unique_accrual_range')],
+            },
+        ),
+    ]
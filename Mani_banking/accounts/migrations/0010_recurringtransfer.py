@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:10
+
+import accounts.money
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_accruals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', accounts.money.MoneyField(help_text='Amount in minor units (e.g. cents).')),
+                ('description', models.CharField(max_length=255)),
+                ('schedule', models.CharField(help_text="Cron expression in UTC, e.g. '0 0 1 * *' for the 1st of each month.", max_length=100)),
+                ('next_run_at', models.DateTimeField()),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_transfers', to='accounts.account')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_transfers', to=settings.AUTH_USER_MODEL)),
+                ('recipient_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_recurring_transfers', to='accounts.account')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['next_run_at'], name='recurring_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_recurringtransfer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='risk_flags',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:19
+
+import accounts.money
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_transaction_risk_flags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the statement month.')),
+                ('currency', models.CharField(choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], default='USD', max_length=3)),
+                ('opening_balance', accounts.money.MoneyField(help_text='Amount in minor units (e.g. cents).')),
+                ('closing_balance', accounts.money.MoneyField(help_text='Amount in minor units (e.g. cents).')),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('html_sha256', models.CharField(max_length=64)),
+                ('pdf_sha256', models.CharField(max_length=64)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statements', to='accounts.account')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'period'), name='unique_account_statement')],
+            },
+        ),
+    ]
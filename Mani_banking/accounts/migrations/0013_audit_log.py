@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_statement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(max_length=50)),
+                ('object_type', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=64)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('prev_hash', models.CharField(max_length=64, unique=True)),
+                ('hash', models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+    ]
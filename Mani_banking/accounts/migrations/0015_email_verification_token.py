@@ -0,0 +1,65 @@
+import hashlib
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Moves outstanding verification tokens off the user table into
+# EmailVerificationToken. Tokens are stored as their SHA-256, so links that
+# were already emailed keep working. Going backwards drops them (the raw tokens
+# cannot be recovered); affected users can have the email re-sent.
+
+CHUNK_SIZE = 2000
+
+
+def move_tokens(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    EmailVerificationToken = apps.get_model('accounts', 'EmailVerificationToken')
+    pending = (
+        User.objects
+        .filter(is_email_verified=False, email_verification_token__isnull=False, email_verification_token_expires__isnull=False)
+        .values_list('pk', 'email_verification_token', 'email_verification_token_expires')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    batch = []
+    for user_id, token, expires_at in pending:
+        batch.append(EmailVerificationToken(
+            user_id=user_id,
+            token_hash=hashlib.sha256(token.encode()).hexdigest(),
+            expires_at=expires_at,
+        ))
+        if len(batch) >= CHUNK_SIZE:
+            EmailVerificationToken.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        EmailVerificationToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailVerificationToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_hash', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='verification_token', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(move_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='email_verification_token',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='email_verification_token_expires',
+        ),
+    ]
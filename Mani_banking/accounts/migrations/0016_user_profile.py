@@ -0,0 +1,69 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+# Moves phone_number, date_of_birth and address off the user table into
+# UserProfile. Only users with at least one of them set get a profile row.
+
+CHUNK_SIZE = 2000
+PROFILE_FIELDS = ('phone_number', 'date_of_birth', 'address')
+
+
+def users_to_profiles(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    has_details = Q(phone_number__isnull=False) | Q(date_of_birth__isnull=False) | Q(address__isnull=False)
+    batch = []
+    for user_id, *details in User.objects.filter(has_details).values_list('pk', *PROFILE_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        batch.append(UserProfile(user_id=user_id, **dict(zip(PROFILE_FIELDS, details))))
+        if len(batch) >= CHUNK_SIZE:
+            UserProfile.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_create(batch)
+
+
+def profiles_to_users(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    batch = []
+    for profile in UserProfile.objects.iterator(chunk_size=CHUNK_SIZE):
+        batch.append(User(pk=profile.user_id, **{field: getattr(profile, field) for field in PROFILE_FIELDS}))
+        if len(batch) >= CHUNK_SIZE:
+            User.objects.bulk_update(batch, PROFILE_FIELDS)
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, PROFILE_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_email_verification_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('phone_number', models.CharField(blank=True, max_length=15, null=True)),
+                ('date_of_birth', models.DateField(blank=True, null=True)),
+                ('address', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(users_to_profiles, profiles_to_users),
+        migrations.RemoveField(
+            model_name='user',
+            name='address',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='date_of_birth',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='phone_number',
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:01
+
+import accounts.money
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='data_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='accounts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='recipient_account',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.account'),
+        ),
+        migrations.AlterField(
+            model_name='recurringtransfer',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_transfers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recurringtransfer',
+            name='recipient_account',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='incoming_recurring_transfers', to='accounts.account'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='initiated_transactions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='recipient_account',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='received_transactions', to='accounts.account'),
+        ),
+        migrations.CreateModel(
+            name='CrossShardPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.BigIntegerField()),
+                ('direction', models.CharField(choices=[('outgoing', 'Outgoing'), ('incoming', 'Incoming')], max_length=8)),
+                ('recipient_account_id', models.BigIntegerField()),
+                ('amount', accounts.money.MoneyField(help_text='Amount in minor units (e.g. cents).')),
+                ('currency', models.CharField(choices=[('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'), ('GHS', 'GHS'), ('NGN', 'NGN'), ('KES', 'KES'), ('JPY', 'JPY'), ('KWD', 'KWD')], default='USD', max_length=3)),
+                ('description', models.CharField(max_length=255)),
+                ('state', models.CharField(choices=[('prepared', 'Prepared'), ('credited', 'Credited')], default='prepared', max_length=8)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('credited_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient_account_id', 'created_at'], name='accounts_cr_recipie_9e16a6_idx'), models.Index(condition=models.Q(('state', 'prepared')), fields=['created_at'], name='posting_prepared_idx')],
+                'constraints': [models.UniqueConstraint(fields=('transaction_id', 'direction'), name='unique_posting_leg')],
+            },
+        ),
+    ]
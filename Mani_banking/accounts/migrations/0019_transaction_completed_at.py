@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:15
+
+from django.db import migrations, models
+from django.db.models import F
+
+# Settled rows written before completed_at existed get their creation time,
+# the best record there is of when they posted. Each backfill names its model
+# so ShardRouter runs it on every shard holding the table.
+
+
+def backfill(model_name):
+    def forwards(apps, schema_editor):
+        model = apps.get_model('accounts', model_name)
+        model.objects.using(schema_editor.connection.alias).filter(
+            status='completed', completed_at__isnull=True,
+        ).update(completed_at=F('date'))
+    return forwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_sharding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill('transaction'), migrations.RunPython.noop, hints={'model_name': 'transaction'}),
+        migrations.RunPython(
+            backfill('archivedtransaction'), migrations.RunPython.noop, hints={'model_name': 'archivedtransaction'},
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['account', 'completed_at'], name='accounts_ar_account_b8862b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['completed_at'], name='accounts_tr_complet_e3cc40_idx'),
+        ),
+    ]
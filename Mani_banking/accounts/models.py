@@ -1,22 +1,23 @@
 from django.db import models
 from django.contrib.auth.models import BaseUserManager,PermissionsMixin,AbstractBaseUser
 import random
-import dns.resolver
 import string
-from django.core.mail import send_mail
+from django.db import router, transaction as db_transaction
+from django.db.models import F
 from django.dispatch import receiver
-from django.db.models.signals import post_save
-from django.utils.crypto import get_random_string
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.core.exceptions import ValidationError
-import dns.resolver
-from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
+from functools import partial
+from . import conditional, events, fx, outbox, postings, resolver, sharding, verification
+from .money import CURRENCY_CHOICES, DEFAULT_CURRENCY, MoneyField, format_minor
 
 # MODELS FOR MANI_BANKING ACCOUNTS
 # USER MODEL
 def validate_email_domain(email):
     """Check if the email domain has valid MX records."""
+    # dnspython is only needed on sign-up; importing it lazily keeps worker startup lean
+    import dns.resolver
     domain = email.split('@')[-1]
     try:
         dns.resolver.resolve(domain, 'MX')
@@ -68,11 +69,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=30)
     
     is_email_verified = models.BooleanField(default=False)
-    email_verification_token = models.CharField(max_length=100, null=True, blank=True)
-    email_verification_token_expires = models.DateTimeField(null=True, blank=True)
-    phone_number = models.CharField(max_length=15, null=True, blank=True)
-    date_of_birth = models.DateField(null=True, blank=True)
-    address = models.TextField(null=True, blank=True)
+    # Bumped with every change to the user's accounts or transactions; API ETags derive from it
+    data_version = models.BigIntegerField(default=0, editable=False)
+    # Index into ACCOUNT_SHARDS of the database holding the user's accounts (accounts/sharding.py)
+    shard = models.PositiveSmallIntegerField(default=0, editable=False)
 
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -87,11 +87,54 @@ class User(AbstractBaseUser, PermissionsMixin):
         self.email = normalize_email(self.email)
         if not self.username:
             self.username = f"{self.email.split('@')[0]}{random.randint(1000, 9999)}"
+        if self._state.adding:
+            self.shard = sharding.shard_for_email(self.email)
+        if not self._state.adding and kwargs.get('update_fields') is None and not args:
+            # data_version only moves forward via conditional.bump_accounts; writing back
+            # the loaded copy could rewind it and revive an old ETag
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'data_version'
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
+# USER PROFILE MODEL
+# Personal details nothing in the request path reads. Every authenticated
+# request loads the User row, so it holds only what authentication,
+# permissions and the is_email_verified checks need; the profile is fetched
+# (user.profile) only where it is shown. Users without details have no row.
+
+class UserProfile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='profile')
+    phone_number = models.CharField(max_length=15, null=True, blank=True)
+    date_of_birth = models.DateField(null=True, blank=True)
+    address = models.TextField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Profile of {self.user_id}"
+
+# EMAIL VERIFICATION TOKEN MODEL
+# One outstanding token per unverified user, kept off the user row. Only the
+# SHA-256 of the emailed token is stored, under a unique index, so a
+# verification click is a single index lookup and a leaked table cannot be
+# replayed. `manage.py sweep_verifications` purges or re-issues expired tokens.
+
+class EmailVerificationToken(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='verification_token')
+    token_hash = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def is_expired(self):
+        return self.expires_at < timezone.now()
+
+    def __str__(self):
+        return f"Verification token for {self.user_id} (expires {self.expires_at})"
+
 # ACCOUNT MODEL
 
 class Account(models.Model):
@@ -112,19 +155,53 @@ class Account(models.Model):
         while True:
             account_number = ''.join(random.choices(string.digits, k=12))
             # Check for uniqueness
-            if not Account.objects.filter(account_number=account_number).exists():
+            if not sharding.account_number_taken(account_number):
                 return account_number
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='accounts')
-    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Owners live on 'default' and accounts on their shard, so no database-level constraint
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='accounts', db_constraint=False)
+    balance = MoneyField(default=0)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
     account_number = models.CharField(max_length=20, unique=True, default=generate_account_number)
     account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES, default='savings')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # When sharded, bumped instead of User.data_version so posting never writes to 'default'
+    data_version = models.BigIntegerField(default=0, editable=False)
     
+    # Status and currency as last loaded from or written to the database; None for new rows
+    _stored_status = None
+    _stored_currency = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_status = instance.__dict__.get('status')
+        instance._stored_currency = instance.__dict__.get('currency')
+        return instance
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Account, instance=self)
+        if not self._state.adding and kwargs.get('update_fields') is None and not args:
+            # As on User: never write back a loaded data_version
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'data_version'
+            ]
+        with db_transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            if self._stored_status is not None and self.status != self._stored_status:
+                outbox.emit([outbox.account_status_event(self, self._stored_status)], using=using)
+        self._stored_status = self.status
+        self._stored_currency = self.currency
+
+    @property
+    def formatted_balance(self):
+        return format_minor(self.balance, self.currency)
+
     def __str__(self):
-        return f"{self.user.first_name}'s {self.account_type} - {self.balance}"
+        return f"{self.user.first_name}'s {self.account_type} - {self.formatted_balance}"
 
 # TRANSACTION MODEL
 
@@ -135,7 +212,11 @@ class Transaction(models.Model):
         ('transfer', 'Transfer'),
         ('payment', 'Payment'),
         ('fee', 'Fee'),
+        ('interest', 'Interest'),
     )
+    # Effect of a completed transaction on the source account's balance
+    CREDIT_TYPES = ('deposit', 'interest')
+    DEBIT_TYPES = ('withdrawal', 'transfer', 'payment', 'fee')
     
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -144,72 +225,394 @@ class Transaction(models.Model):
     )
     
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions')
-    recipient_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='received_transactions')
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # The recipient may be on another shard (see accounts/postings.py)
+    recipient_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='received_transactions', db_constraint=False)
+    amount = MoneyField()
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
     description = models.CharField(max_length=255)
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     date = models.DateTimeField(auto_now_add=True)
-    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='initiated_transactions')
+    # When the balances moved; statements are dated by it, not by creation
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='initiated_transactions', db_constraint=False)
+    # Cross-currency transfers lock in their rate and credited amount up front
+    fx_rate = models.DecimalField(max_digits=20, decimal_places=10, null=True, blank=True)
+    credit_amount = MoneyField(null=True, blank=True)
+    credit_currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, null=True, blank=True)
+    # Comma-separated risk rules breached at creation; flagged rows wait for manual approval
+    risk_flags = models.CharField(max_length=255, blank=True, default='')
+
+    # Status as last loaded from or written to the database; None for new rows
+    _stored_status = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_status = instance.__dict__.get('status')
+        return instance
     
     def clean(self):
         if self.amount <= 0:
             raise ValidationError("Amount must be positive")
         if self.transaction_type == 'withdrawal' and self.account.balance < self.amount:
             raise ValidationError("Insufficient balance")
-        if self.transaction_type == 'transfer' and not self.recipient_account:
+        if self.transaction_type == 'transfer' and not self.recipient_account_id:
             raise ValidationError("Recipient account is required for transfers")
         if self.account.user.is_email_verified is False:
             raise ValidationError("User's email must be verified to perform transactions")
     
-    def save(self, *args, **kwargs):
+    @property
+    def recipient_amount(self):
+        """Amount credited to the recipient, in the recipient account's currency."""
+        return self.amount if self.credit_amount is None else self.credit_amount
+
+    def lock_fx_rate(self, recipient_currency=None):
+        """Lock the rate of a cross-currency transfer; pass recipient_currency to skip fetching the recipient."""
+        if self.transaction_type != 'transfer' or self.credit_amount is not None or not self.recipient_account_id:
+            return
+        if recipient_currency is None:
+            if sharding.is_local(self.recipient_account_id, self._state.db):
+                recipient_currency = self.recipient_account.currency
+            else:
+                # Out of the descriptor's reach on another shard
+                recipient_currency = sharding.fetch_accounts([self.recipient_account_id])[self.recipient_account_id].currency
+        if recipient_currency != self.currency:
+            fx.lock_rate(self, self.currency, recipient_currency)
+
+    def save(self, *args, recipient_currency=None, **kwargs):
         self.clean()
-        if self.status == 'completed':
-            if self.transaction_type == 'deposit':
-                self.account.balance += self.amount
-            elif self.transaction_type == 'withdrawal':
-                self.account.balance -= self.amount
-            elif self.transaction_type == 'transfer':
-                self.account.balance -= self.amount
-                if self.recipient_account:
-                    self.recipient_account.balance += self.amount
-                    self.recipient_account.save()
-            self.account.save()
-        super().save(*args, **kwargs)
+        if self._state.adding:
+            self.currency = self.account.currency
+            self.lock_fx_rate(recipient_currency)
+        using = kwargs.get('using') or router.db_for_write(Transaction, instance=self)
+        touched = []
+        cross_shard = False
+        with db_transaction.atomic(using=using, savepoint=False):
+            # Balances move once, when the row first reaches completed; re-saving it must not post again
+            if self.status == 'completed' and self._stored_status != 'completed':
+                self.completed_at = timezone.now()
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'completed_at'}
+                if self.transaction_type in self.CREDIT_TYPES:
+                    self.account.balance += self.amount
+                elif self.transaction_type in self.DEBIT_TYPES:
+                    self.account.balance -= self.amount
+                if self.transaction_type == 'transfer' and self.recipient_account_id:
+                    if not sharding.is_local(self.recipient_account_id, using):
+                        # Credited on the recipient's shard once this commits
+                        cross_shard = True
+                    elif self.recipient_account:
+                        self.recipient_account.balance += self.recipient_amount
+                        self.recipient_account.save()
+                        touched.append(self.recipient_account)
+                self.account.save()
+                touched.append(self.account)
+            super().save(*args, **kwargs)
+            if cross_shard:
+                postings.prepare([self], using)
+            if self.status != self._stored_status:
+                outbox.emit_transactions([self], using=using)
+        self._stored_status = self.status
+        # Push the delta to live subscribers once the write is durable
+        db_transaction.on_commit(partial(events.publish_transaction, self, touched), using=using)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Transaction, instance=self)
+        with db_transaction.atomic(using=using, savepoint=False):
+            result = super().delete(*args, **kwargs)
+            # Not a post_delete receiver, which would cost archiving its fast deletes;
+            # queryset deletes (archive, admin) bump themselves
+            conditional.bump_accounts([self.account_id], using=using)
+        return result
     
+    @property
+    def formatted_amount(self):
+        return format_minor(self.amount, self.currency)
+
     def __str__(self):
-        return f"{self.transaction_type} of {self.amount} on {self.date}"
+        return f"{self.transaction_type} of {self.formatted_amount} on {self.date}"
     
     class Meta:
         indexes = [
             models.Index(fields=['date']),
+            models.Index(fields=['completed_at']),
             models.Index(fields=['account']),
+            # Settlement workers claim pending rows in id order
+            models.Index(fields=['status', 'id']),
         ]
 
+# ARCHIVED TRANSACTION MODEL
+# Settled transactions older than TRANSACTION_ARCHIVE_AFTER_DAYS are moved here
+# by `manage.py archive_transactions`, keeping the hot table and its indexes small.
+
+class ArchivedTransaction(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # Original Transaction id
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='archived_transactions')
+    recipient_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False)
+    amount = MoneyField()
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    description = models.CharField(max_length=255)
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    status = models.CharField(max_length=10, choices=Transaction.STATUS_CHOICES)
+    date = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+', db_constraint=False)
+    fx_rate = models.DecimalField(max_digits=20, decimal_places=10, null=True, blank=True)
+    credit_amount = MoneyField(null=True, blank=True)
+    credit_currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def formatted_amount(self):
+        return format_minor(self.amount, self.currency)
+
+    def __str__(self):
+        return f"{self.transaction_type} of {self.formatted_amount} on {self.date} (archived)"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'date']),
+            models.Index(fields=['account', 'completed_at']),
+        ]
+
+# FX RATE MODEL
+# Loaded from a file by `manage.py load_fx_rates`; read through accounts.fx.rates.
+
+class FxRate(models.Model):
+    base_currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
+    quote_currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.base_currency}/{self.quote_currency} {self.rate}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['base_currency', 'quote_currency'], name='unique_fx_pair'),
+        ]
+
+# RECURRING TRANSFER MODEL
+# Standing orders. `manage.py run_scheduler` claims rows whose next_run_at has
+# passed (via the partial index below), posts them and advances next_run_at.
+
+class RecurringTransfer(models.Model):
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='recurring_transfers')
+    recipient_account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='incoming_recurring_transfers', db_constraint=False)
+    amount = MoneyField()
+    description = models.CharField(max_length=255)
+    schedule = models.CharField(max_length=100, help_text="Cron expression in UTC, e.g. '0 0 1 * *' for the 1st of each month.")
+    next_run_at = models.DateTimeField()
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='recurring_transfers', db_constraint=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def currency(self):
+        return self.account.currency
+
+    def __str__(self):
+        return f"{format_minor(self.amount, self.currency)} to {self.recipient_account.account_number} ({self.schedule})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_run_at'], condition=models.Q(is_active=True), name='recurring_due_idx'),
+        ]
+
+# ACCRUAL CHECKPOINT MODEL
+# One row per (run date, account id range) processed by `manage.py run_accruals`.
+# last_account_id advances in the same database transaction as the postings,
+# so an interrupted run resumes exactly where it stopped.
+
+class AccrualCheckpoint(models.Model):
+    run_date = models.DateField()
+    range_start = models.BigIntegerField()
+    range_end = models.BigIntegerField()
+    last_account_id = models.BigIntegerField(null=True, blank=True)
+    accounts_processed = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Accruals {self.run_date} [{self.range_start}-{self.range_end}]"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run_date', 'range_start'], name='unique_accrual_range'),
+        ]
+
+# STATEMENT MODEL
+# One row per account and month, written by `manage.py generate_statements`.
+# The rendered HTML and PDF are stored as immutable files named by their
+# SHA-256 digest (see accounts/statements.py); the digests double as ETags.
+
+class Statement(models.Model):
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='statements')
+    period = models.DateField(help_text="First day of the statement month.")
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    opening_balance = MoneyField()
+    closing_balance = MoneyField()
+    transaction_count = models.PositiveIntegerField(default=0)
+    html_sha256 = models.CharField(max_length=64)
+    pdf_sha256 = models.CharField(max_length=64)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statement {self.account.account_number} {self.period:%Y-%m}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period'], name='unique_account_statement'),
+        ]
+
+# AUDIT LOG MODEL
+# Append-only record of privileged actions, written in batches by
+# accounts/audit.py. Each row stores the hash of the previous row, and the
+# unique prev_hash keeps the chain linear, so editing, deleting or reordering
+# rows is detected by `manage.py verify_audit_log`.
+
+class AuditLogEntry(models.Model):
+    timestamp = models.DateTimeField()
+    # Plain ids rather than foreign keys: deleting a user must not rewrite hashed rows
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=50)
+    object_type = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    data = models.JSONField(default=dict, blank=True)
+    prev_hash = models.CharField(max_length=64, unique=True)
+    hash = models.CharField(max_length=64, unique=True)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Audit log entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Audit log entries are append-only.")
+
+    def __str__(self):
+        return f"{self.action} {self.object_type} {self.object_id} at {self.timestamp}"
+
+# CROSS-SHARD POSTING MODEL
+# The two legs of a transfer between shards (accounts/postings.py): the
+# 'outgoing' row is written on the sender's shard with the debit, the
+# 'incoming' row on the recipient's shard with the credit. The unique
+# (transaction_id, direction) pair makes crediting idempotent.
+
+class CrossShardPosting(models.Model):
+    DIRECTIONS = (
+        ('outgoing', 'Outgoing'),
+        ('incoming', 'Incoming'),
+    )
+
+    STATES = (
+        ('prepared', 'Prepared'),
+        ('credited', 'Credited'),
+    )
+
+    # Plain ids: the transaction and the recipient account are on different shards
+    transaction_id = models.BigIntegerField()
+    direction = models.CharField(max_length=8, choices=DIRECTIONS)
+    recipient_account_id = models.BigIntegerField()
+    amount = MoneyField()
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    description = models.CharField(max_length=255)
+    state = models.CharField(max_length=8, choices=STATES, default='prepared')
+    created_at = models.DateTimeField(default=timezone.now)
+    credited_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.direction} {format_minor(self.amount, self.currency)} for transaction {self.transaction_id} ({self.state})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_id', 'direction'], name='unique_posting_leg'),
+        ]
+        indexes = [
+            # Statements and reconciliation sum incoming credits per account
+            models.Index(fields=['recipient_account_id', 'created_at']),
+            models.Index(fields=['created_at'], condition=models.Q(state='prepared'), name='posting_prepared_idx'),
+        ]
+
+# TRANSACTIONAL OUTBOX MODELS
+# Events for downstream consumers are inserted in the same database
+# transaction as the change they describe (see accounts/outbox.py), and
+# `manage.py relay_outbox` publishes them in id order. OutboxOffset holds the
+# last event id each consumer has received.
+
+class OutboxEvent(models.Model):
+    topic = models.CharField(max_length=50)
+    key = models.CharField(max_length=64, help_text="Partitioning key, e.g. the account id.")
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.topic} {self.key} #{self.pk}"
+
+
+class OutboxOffset(models.Model):
+    consumer = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} at #{self.last_event_id}"
+
 # Signal to send verification email on user creation
 @receiver(post_save, sender=User)
 def send_verification_email(sender, instance, created, **kwargs):
     if created and not instance.is_email_verified:
-        # Generate a unique token and set expiration (24 hours)
-        instance.email_verification_token = get_random_string(length=64)
-        instance.email_verification_token_expires = timezone.now() + timedelta(hours=24)
-        instance.save()
-        # Send verification email
-        verification_link = f"{settings.SITE_URL}/verify-email/{instance.email_verification_token}/"
-        try:
-            send_mail(
-                subject='Verify Your Email Address',
-                message=f'Please verify your email by clicking this link: {verification_link}\nThis link expires in 24 hours.',
-                from_email='no-reply@manibanking.com',
-                recipient_list=[instance.email],
-                fail_silently=True,  # Prevent crashes on email failure
-            )
-        except Exception as e:
-            # Log the error (in production, use proper logging)
-            print(f"Failed to send verification email to {instance.email}: {e}")
+        verification.issue_and_send([instance])
+
+# Keep cached recipient lookups in step with account status and owner verification
+@receiver(post_save, sender=Account)
+def invalidate_resolved_account(sender, instance, created, **kwargs):
+    # Postings save balances all the time; only drop the entry when what it caches changed.
+    # Misses are not cached, so a new account needs nothing.
+    if created:
+        return
+    changed = (instance.status, instance.currency) != (instance._stored_status, instance._stored_currency)
+    if instance._stored_status is None or changed:
+        resolver.invalidate(instance.account_number)
+
+@receiver(post_delete, sender=Account)
+def invalidate_deleted_resolved_account(sender, instance, **kwargs):
+    resolver.invalidate(instance.account_number)
+
+@receiver(post_save, sender=User)
+def invalidate_resolved_user_accounts(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save only last_login; skip the lookup unless verification may have changed
+    if created or (update_fields is not None and 'is_email_verified' not in update_fields):
+        return
+    resolver.invalidate(*instance.accounts.values_list('account_number', flat=True))
 
 # Signal to create account for new users
 @receiver(post_save, sender=User)
 def create_user_account(sender, instance, created, **kwargs):
     if created and not hasattr(instance, 'account'):
-        Account.objects.create(user=instance)
\ No newline at end of file
+        # Through the user, so the account is created on the user's shard
+        instance.accounts.create()
+
+# Deleting a user cascades on 'default' only; remove accounts held on other shards
+@receiver(post_delete, sender=User)
+def delete_sharded_accounts(sender, instance, **kwargs):
+    alias = sharding.alias_for_user(instance)
+    if alias != 'default':
+        Account.objects.using(alias).filter(user_id=instance.pk).delete()
+
+# Response ETags (conditional.py) must move with every change a response shows, not only
+# those that emit outbox events: account edits and new or deleted accounts
+@receiver(post_save, sender=Account)
+def bump_saved_account(sender, instance, **kwargs):
+    conditional.bump_accounts([instance.pk], using=instance._state.db)
+
+@receiver(post_delete, sender=Account)
+def bump_deleted_account_owner(sender, instance, **kwargs):
+    # The account is gone, so bump its owner directly; sharded tags also count accounts
+    User.objects.filter(pk=instance.user_id).update(data_version=F('data_version') + 1)
+
+@receiver(post_migrate)
+def seed_shard_id_blocks(sender, using, **kwargs):
+    if sender.label == 'accounts':
+        sharding.seed_id_blocks(using)
\ No newline at end of file
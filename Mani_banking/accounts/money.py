@@ -0,0 +1,103 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import models
+from rest_framework import serializers
+
+# MONEY
+# Amounts are stored as 64-bit integers in the currency's minor unit (cents for
+# USD), so balance arithmetic is plain int math and never loses precision. The
+# currency code next to each amount determines how many minor units make a
+# major one.
+
+DEFAULT_CURRENCY = 'USD'
+MAX_MINOR = 2 ** 63 - 1  # Largest amount a 64-bit column holds
+
+CURRENCY_EXPONENTS = {
+    'USD': 2,
+    'EUR': 2,
+    'GBP': 2,
+    'GHS': 2,
+    'NGN': 2,
+    'KES': 2,
+    'JPY': 0,
+    'KWD': 3,
+}
+
+CURRENCY_CHOICES = tuple((code, code) for code in CURRENCY_EXPONENTS)
+
+
+def exponent(currency):
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+
+def to_minor(value, currency=DEFAULT_CURRENCY):
+    """Convert a major-unit amount ("12.34", Decimal, int) to integer minor units.
+
+    Raises ValueError for non-numeric input, more decimals than the currency
+    has, or amounts a 64-bit column cannot hold.
+    """
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    # Compared before scaling, which overflows for huge exponents
+    if amount.copy_abs() > Decimal(MAX_MINOR).scaleb(-exponent(currency)):
+        raise ValueError(f"Amount {value} is too large.")
+    minor = amount.scaleb(exponent(currency))
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{currency} amounts allow at most {exponent(currency)} decimal places.")
+    return int(minor)
+
+
+def format_minor(amount, currency=DEFAULT_CURRENCY):
+    """Format integer minor units as a major-unit string ("12.34") without Decimal."""
+    places = exponent(currency)
+    if not places:
+        return str(amount)
+    if amount < 0:
+        return '-' + format_minor(-amount, currency)
+    digits = str(amount)
+    if len(digits) <= places:
+        digits = digits.rjust(places + 1, '0')
+    return digits[:-places] + '.' + digits[-places:]
+
+
+class MoneyField(models.BigIntegerField):
+    description = "Amount in integer minor units"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('help_text', "Amount in minor units (e.g. cents).")
+        super().__init__(*args, **kwargs)
+
+
+class MoneyAmountField(serializers.Field):
+    """Serializes minor-unit ints as major-unit strings in the row's currency.
+
+    Input is parsed in the currency given by the serializer context
+    ('currency'), falling back to DEFAULT_CURRENCY, and must be positive.
+    """
+
+    def __init__(self, currency_field='currency', **kwargs):
+        self.currency_field = currency_field
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        amount = super().get_attribute(instance)
+        return amount, getattr(instance, self.currency_field, DEFAULT_CURRENCY)
+
+    def to_representation(self, value):
+        amount, currency = value
+        if amount is None:
+            return None
+        return format_minor(amount, currency)
+
+    def to_internal_value(self, data):
+        try:
+            amount = to_minor(data, self.context.get('currency', DEFAULT_CURRENCY))
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        if amount <= 0:
+            raise serializers.ValidationError("Amount must be positive.")
+        return amount
@@ -0,0 +1,219 @@
+import json
+import os
+import queue
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction as db_transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import conditional, sharding
+
+# TRANSACTIONAL OUTBOX
+# Every transaction status change and account status change inserts a compact
+# OutboxEvent in the same database transaction, so an event exists if and only
+# if the change committed. `manage.py relay_outbox` reads events past each
+# consumer's offset, publishes them to that consumer's sink and then advances
+# the offset: a crash between the two re-sends the batch (at-least-once), so
+# consumers must de-duplicate by event id.
+#
+# Ids are allocated before commit, so on PostgreSQL a later id can become
+# visible before an earlier one. The relay stops at such a gap until it is
+# older than OUTBOX_GAP_GRACE_SECONDS (rolled back inserts leave gaps that are
+# never filled).
+#
+# OUTBOX_CONSUMERS maps a consumer name to {'BACKEND': sink class path,
+# 'OPTIONS': {...}}. Sinks: FileSink (JSON lines), UnixSocketSink, MemorySink.
+#
+# With sharding each shard has its own events and offsets, relayed shard by
+# shard; ids come from disjoint blocks, so they stay unique across shards.
+
+
+def transaction_event(tx):
+    from .models import OutboxEvent
+    return OutboxEvent(
+        topic=f'transaction.{tx.status}',
+        key=str(tx.account_id),
+        payload={
+            'id': tx.pk,
+            'account': tx.account_id,
+            'recipient_account': tx.recipient_account_id,
+            'type': tx.transaction_type,
+            'status': tx.status,
+            'amount': tx.amount,
+            'currency': tx.currency,
+            'credit_amount': tx.credit_amount,
+            'credit_currency': tx.credit_currency,
+        },
+    )
+
+
+def account_status_event(account, previous_status):
+    from .models import OutboxEvent
+    return OutboxEvent(
+        topic='account.status',
+        key=str(account.pk),
+        payload={'id': account.pk, 'status': account.status, 'previous_status': previous_status},
+    )
+
+
+def emit(events, using=None):
+    """Insert events; call inside the database transaction that made the change.
+
+    using is the database of that change, when the router cannot tell it.
+    """
+    from .models import OutboxEvent
+    if events:
+        OutboxEvent.objects.db_manager(using).bulk_create(events, batch_size=1000)
+        # Whatever consumers are told about also changes the owners' API responses
+        conditional.bump_accounts(
+            {int(event.key) for event in events} | {event.payload.get('recipient_account') for event in events},
+            using=using,
+        )
+
+
+def emit_transactions(transactions, using=None):
+    emit([transaction_event(tx) for tx in transactions], using=using)
+
+
+# SINKS
+
+class BaseSink:
+    def publish(self, events):
+        """Deliver a batch of event dicts; raise if delivery may have failed."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileSink(BaseSink):
+    """Appends events as JSON lines and fsyncs before the offset moves."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def publish(self, events):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(json.dumps(event, separators=(',', ':')).encode() + b'\n' for event in events))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class UnixSocketSink(BaseSink):
+    """Streams each batch to a local socket as JSON lines followed by a blank line.
+
+    With ack, the consumer must answer every batch with an 'ok' line before
+    the offset moves.
+    """
+
+    def __init__(self, path, timeout=10, ack=True):
+        self.path = path
+        self.timeout = timeout
+        self.ack = ack
+        self._socket = None
+        self._reader = None
+
+    def _connect(self):
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._socket, self._reader = sock, sock.makefile('rb')
+        return self._socket
+
+    def publish(self, events):
+        try:
+            lines = b''.join(json.dumps(event, separators=(',', ':')).encode() + b'\n' for event in events)
+            self._connect().sendall(lines + b'\n')
+            if self.ack and self._reader.readline().strip() != b'ok':
+                raise ConnectionError("Consumer did not acknowledge the batch.")
+        except OSError:
+            # Reconnect on the next batch; the unacknowledged batch is sent again
+            self.close()
+            raise
+
+    def close(self):
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket = self._reader = None
+
+
+class MemorySink(BaseSink):
+    """Puts events on an in-process queue per name; meant for tests."""
+    queues = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name='default'):
+        self.name = name
+
+    @classmethod
+    def queue(cls, name='default'):
+        with cls._lock:
+            return cls.queues.setdefault(name, queue.Queue())
+
+    def publish(self, events):
+        q = self.queue(self.name)
+        for event in events:
+            q.put(event)
+
+
+def get_sink(consumer):
+    config = getattr(settings, 'OUTBOX_CONSUMERS', {}).get(consumer)
+    if config is None:
+        raise ImproperlyConfigured(f"No outbox consumer named {consumer!r} in OUTBOX_CONSUMERS.")
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+# RELAY
+
+def _visible_prefix(rows, last_event_id, now):
+    """Rows up to the first id gap that may still be filled by an open transaction."""
+    grace = timedelta(seconds=getattr(settings, 'OUTBOX_GAP_GRACE_SECONDS', 30))
+    expected = last_event_id + 1
+    for index, row in enumerate(rows):
+        if row['id'] != expected and now - row['created_at'] < grace:
+            return rows[:index]
+        expected = row['id'] + 1
+    return rows
+
+
+def relay_batch(consumer, sink, batch_size=500):
+    """Publish the next batch for consumer and advance its offset. Returns events sent."""
+    from .models import OutboxEvent, OutboxOffset
+    alias = sharding.current_shard()
+    with db_transaction.atomic(using=alias):
+        # The row lock keeps two relays of one consumer from sending the same batch concurrently
+        OutboxOffset.objects.get_or_create(consumer=consumer, defaults={'last_event_id': sharding.id_floor(alias)})
+        offset = OutboxOffset.objects.select_for_update().get(consumer=consumer)
+        rows = list(
+            OutboxEvent.objects
+            .filter(id__gt=offset.last_event_id)
+            .order_by('id')
+            .values('id', 'topic', 'key', 'payload', 'created_at')[:batch_size]
+        )
+        rows = _visible_prefix(rows, offset.last_event_id, timezone.now())
+        if not rows:
+            return 0
+        sink.publish([dict(row, created_at=row['created_at'].isoformat()) for row in rows])
+        offset.last_event_id = rows[-1]['id']
+        offset.save(update_fields=['last_event_id', 'updated_at'])
+    return len(rows)
+
+
+def prune(consumers):
+    """Delete events every listed consumer has received. Returns rows deleted."""
+    from .models import OutboxEvent, OutboxOffset
+    offsets = OutboxOffset.objects.filter(consumer__in=consumers)
+    if offsets.count() < len(set(consumers)):
+        return 0  # A consumer that never relayed still needs everything
+    low = offsets.aggregate(low=Min('last_event_id'))['low']
+    deleted, _ = OutboxEvent.objects.filter(id__lte=low).delete()
+    return deleted
@@ -0,0 +1,134 @@
+import logging
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from . import conditional, events, sharding
+
+logger = logging.getLogger(__name__)
+
+# CROSS-SHARD TRANSFERS
+# A transfer whose recipient account is on another shard (accounts/sharding.py)
+# cannot be posted in one database transaction, so it is posted in two phases:
+#
+# 1. prepare: in the sender's transaction the source account is debited, the
+#    transfer saved and an 'outgoing' CrossShardPosting recorded as prepared.
+#    Nothing reaches the recipient unless this commits.
+# 2. deliver: after that commit, the recipient's shard records an 'incoming'
+#    posting and credits the account in one transaction of its own, then the
+#    outgoing leg is marked credited. The incoming row is unique per transfer,
+#    so delivering a leg twice credits it once.
+#
+# A crash between the phases leaves prepared legs behind; settlement workers
+# call deliver_prepared() to finish legs older than CROSS_SHARD_RETRY_SECONDS.
+# Transfers are validated against the recipient when prepared, so delivery
+# never fails on account rules.
+
+
+def outgoing(tx):
+    from .models import CrossShardPosting
+    return CrossShardPosting(
+        transaction_id=tx.pk,
+        direction='outgoing',
+        recipient_account_id=tx.recipient_account_id,
+        amount=tx.recipient_amount,
+        currency=tx.credit_currency or tx.currency,
+        description=tx.description,
+    )
+
+
+def prepare(transactions, using):
+    """Record outgoing legs of saved transfers; call inside the sender's database transaction."""
+    from .models import CrossShardPosting
+    if transactions:
+        CrossShardPosting.objects.using(using).bulk_create([outgoing(tx) for tx in transactions])
+        ids = [tx.pk for tx in transactions]
+        # robust: the sender has committed, a recipient shard being down must not fail its request
+        db_transaction.on_commit(partial(deliver, using, ids), using=using, robust=True)
+
+
+def credit(alias, legs):
+    """Credit outgoing legs on their recipients' shard alias, once each."""
+    from .models import Account, CrossShardPosting
+    with db_transaction.atomic(using=alias):
+        done = set(
+            CrossShardPosting.objects.using(alias)
+            .filter(direction='incoming', transaction_id__in=[leg.transaction_id for leg in legs])
+            .values_list('transaction_id', flat=True)
+        )
+        fresh = [leg for leg in legs if leg.transaction_id not in done]
+        if not fresh:
+            return
+        # A concurrent delivery of the same leg fails here on the unique constraint and rolls back
+        CrossShardPosting.objects.using(alias).bulk_create([
+            CrossShardPosting(
+                transaction_id=leg.transaction_id,
+                direction='incoming',
+                recipient_account_id=leg.recipient_account_id,
+                amount=leg.amount,
+                currency=leg.currency,
+                description=leg.description,
+                state='credited',
+                credited_at=timezone.now(),
+            )
+            for leg in fresh
+        ])
+        accounts = {
+            account.pk: account
+            for account in Account.objects.using(alias).select_for_update()
+            .filter(pk__in={leg.recipient_account_id for leg in fresh})
+            .order_by('pk')
+        }
+        for leg in fresh:
+            account = accounts.get(leg.recipient_account_id)
+            if account is None:
+                logger.error("Cross-shard transfer %s: recipient account %s no longer exists.",
+                             leg.transaction_id, leg.recipient_account_id)
+                continue
+            account.balance += leg.amount
+        updated_at = timezone.now()
+        for account in accounts.values():
+            account.updated_at = updated_at
+        Account.objects.using(alias).bulk_update(accounts.values(), ['balance', 'updated_at'])
+        conditional.bump_accounts(accounts.keys(), using=alias)
+        db_transaction.on_commit(partial(events.publish_balances, list(accounts.values())), using=alias)
+
+
+def deliver(using, transaction_ids):
+    """Phase two for prepared legs of these transfers on shard `using`. Returns legs completed."""
+    from .models import CrossShardPosting
+    legs = list(
+        CrossShardPosting.objects.using(using)
+        .filter(direction='outgoing', state='prepared', transaction_id__in=transaction_ids)
+    )
+    by_alias = {}
+    for leg in legs:
+        by_alias.setdefault(sharding.alias_for_id(leg.recipient_account_id), []).append(leg)
+    completed = []
+    for alias, alias_legs in by_alias.items():
+        try:
+            credit(alias, alias_legs)
+        except IntegrityError:
+            continue  # Delivered concurrently; the next deliver_prepared() marks the legs
+        completed += alias_legs
+    CrossShardPosting.objects.using(using).filter(pk__in=[leg.pk for leg in completed]).update(
+        state='credited', credited_at=timezone.now(),
+    )
+    return len(completed)
+
+
+def deliver_prepared(using, batch_size=500):
+    """Retry legs on shard `using` left prepared past the retry delay. Returns legs completed."""
+    from .models import CrossShardPosting
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'CROSS_SHARD_RETRY_SECONDS', 30))
+    ids = list(
+        CrossShardPosting.objects.using(using)
+        .filter(direction='outgoing', state='prepared', created_at__lt=cutoff)
+        .order_by('created_at')
+        .values_list('transaction_id', flat=True)[:batch_size]
+    )
+    return deliver(using, ids) if ids else 0
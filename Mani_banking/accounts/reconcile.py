@@ -0,0 +1,93 @@
+from collections import namedtuple
+
+from django.db import connections
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from . import conditional, sharding
+from .models import Account, ArchivedTransaction, CrossShardPosting, Transaction
+
+# BALANCE RECONCILIATION
+# An account's balance must equal the sum of its completed postings, hot and
+# archived: credits and debits on its own transactions plus the credited side
+# (credit_amount, else amount) of transfers it received, including credits
+# from other shards (incoming CrossShardPosting rows). Accounts are checked
+# in id-ordered chunks; each chunk is a single statement that aggregates the
+# postings per account in the database and returns only the accounts whose
+# stored balance differs, so nothing but the drift crosses the wire.
+
+Drift = namedtuple('Drift', ['account_id', 'account_number', 'currency', 'balance', 'expected', 'fixed'])
+
+
+def _postings_sql(connection, model):
+    """Per-posting (account_id, delta) rows of one transaction table for an account id range."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    credits = ', '.join(['%s'] * len(Transaction.CREDIT_TYPES))
+    debits = ', '.join(['%s'] * len(Transaction.DEBIT_TYPES))
+    sql = (
+        f"SELECT account_id, CASE WHEN transaction_type IN ({credits}) THEN amount"
+        f" WHEN transaction_type IN ({debits}) THEN -amount ELSE 0 END AS delta"
+        f" FROM {table} WHERE status = 'completed' AND account_id BETWEEN %s AND %s"
+        f" UNION ALL"
+        f" SELECT recipient_account_id, COALESCE(credit_amount, amount)"
+        f" FROM {table} WHERE status = 'completed' AND transaction_type = 'transfer'"
+        f" AND recipient_account_id BETWEEN %s AND %s"
+    )
+    return sql, [*Transaction.CREDIT_TYPES, *Transaction.DEBIT_TYPES]
+
+
+def find_drift(start, end):
+    """Return (id, account_number, currency, balance, expected) for drifted accounts in [start, end] of the current shard."""
+    connection = connections[sharding.current_shard()]
+    hot_sql, hot_types = _postings_sql(connection, Transaction)
+    archived_sql, archived_types = _postings_sql(connection, ArchivedTransaction)
+    account_table = connection.ops.quote_name(Account._meta.db_table)
+    posting_table = connection.ops.quote_name(CrossShardPosting._meta.db_table)
+    sql = (
+        f"SELECT a.id, a.account_number, a.currency, a.balance, COALESCE(p.expected, 0)"
+        f" FROM {account_table} a LEFT JOIN ("
+        f"SELECT account_id, SUM(delta) AS expected FROM ({hot_sql} UNION ALL {archived_sql}"
+        f" UNION ALL SELECT recipient_account_id, amount FROM {posting_table}"
+        f" WHERE direction = 'incoming' AND recipient_account_id BETWEEN %s AND %s) postings"
+        f" GROUP BY account_id"
+        f") p ON p.account_id = a.id"
+        f" WHERE a.id BETWEEN %s AND %s AND a.balance <> COALESCE(p.expected, 0)"
+        f" ORDER BY a.id"
+    )
+    params = [*hot_types, start, end, start, end, *archived_types, start, end, start, end, start, end, start, end]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # SUM over bigint comes back as Decimal on PostgreSQL
+        return [(pk, number, currency, int(balance), int(expected)) for pk, number, currency, balance, expected in cursor.fetchall()]
+
+
+def fix_drift(rows):
+    """Set drifted balances to their expected values; returns the ids actually corrected.
+
+    Each update only applies if the balance is still the one observed, so a
+    posting that lands between the check and the fix is never overwritten.
+    """
+    fixed = set()
+    updated_at = timezone.now()
+    with db_transaction.atomic(using=sharding.current_shard()):
+        for pk, _, _, balance, expected in rows:
+            if Account.objects.filter(pk=pk, balance=balance).update(balance=expected, updated_at=updated_at):
+                fixed.add(pk)
+        conditional.bump_accounts(fixed)
+    return fixed
+
+
+def reconcile_range(start, end, chunk_size, fix=False):
+    """Check accounts with ids in [start, end] chunk by chunk; returns a list of Drift."""
+    # Shards allocate ids from disjoint blocks, so a range lies on a single shard
+    with sharding.using_shard(sharding.alias_for_id(start)):
+        return _reconcile_range(start, end, chunk_size, fix)
+
+
+def _reconcile_range(start, end, chunk_size, fix):
+    drift = []
+    for chunk_start in range(start, end + 1, chunk_size):
+        rows = find_drift(chunk_start, min(chunk_start + chunk_size - 1, end))
+        fixed = fix_drift(rows) if fix and rows else set()
+        drift.extend(Drift(*row, fixed=row[0] in fixed) for row in rows)
+    return drift
@@ -0,0 +1,52 @@
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from . import sharding
+from .models import RecurringTransfer, Transaction
+from .schedules import next_run
+from .settlement import SettlementResult, settle_batch
+
+# STANDING ORDER SCHEDULER
+# Due schedules are claimed oldest first with SKIP LOCKED, so any number of
+# scheduler processes can share a midnight spike. Each batch inserts its
+# transfers with one bulk_create, posts them through the settlement path and
+# advances next_run_at in the same database transaction. A batch covers the
+# schedules of one shard (accounts/sharding.py).
+
+
+def claim_due(now, batch_size):
+    return list(
+        RecurringTransfer.objects
+        .select_for_update(skip_locked=True, of=('self',))
+        .select_related('account')
+        .filter(is_active=True, next_run_at__lte=now)
+        .order_by('next_run_at', 'id')[:batch_size]
+    )
+
+
+def run_due_batch(now=None, batch_size=500):
+    """Post one batch of due standing orders. Returns a SettlementResult."""
+    now = now or timezone.now()
+    with db_transaction.atomic(using=sharding.current_shard()):
+        due = claim_due(now, batch_size)
+        if not due:
+            return SettlementResult(0, 0)
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                account_id=item.account_id,
+                recipient_account_id=item.recipient_account_id,
+                amount=item.amount,
+                currency=item.account.currency,
+                description=item.description,
+                transaction_type='transfer',
+                created_by_id=item.created_by_id,
+            )
+            for item in due
+        ])
+        result = settle_batch(transactions)
+        for item in due:
+            # Runs missed while the scheduler was down are not replayed
+            item.last_run_at = item.next_run_at
+            item.next_run_at = next_run(item.schedule, max(item.next_run_at, now))
+        RecurringTransfer.objects.bulk_update(due, ['next_run_at', 'last_run_at'])
+    return result
@@ -0,0 +1,64 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import sharding
+
+# RECIPIENT RESOLUTION BY ACCOUNT NUMBER
+# Transfers name their recipient by account number. The facts validation needs
+# (id, status, whether the owner is verified, currency) are cached per number,
+# so a warm lookup costs no queries and a cold one a single joined SELECT.
+# Entries are dropped whenever an account's status or its owner's verification
+# changes: Account/User post_save signals cover save(), and code that changes
+# status with queryset.update() (the admin freeze actions) calls invalidate().
+# With sharding, owners are on 'default' apart from their accounts, so a cold
+# lookup tries the shards in turn and then reads the owner.
+
+ResolvedAccount = namedtuple('ResolvedAccount', ['id', 'status', 'owner_verified', 'currency'])
+
+
+def _key(account_number):
+    return f'account-number:{account_number}'
+
+
+def resolve(account_number):
+    """Return the ResolvedAccount for account_number, or None if there is none."""
+    entry = cache.get(_key(account_number))
+    if entry is None:
+        entry = _lookup(account_number) if not sharding.is_enabled() else _lookup_sharded(account_number)
+        if entry is None:
+            return None
+        cache.set(_key(account_number), entry, getattr(settings, 'ACCOUNT_RESOLVER_TTL', 300))
+    return ResolvedAccount(*entry)
+
+
+def _lookup(account_number):
+    from .models import Account
+    return (
+        Account.objects
+        .filter(account_number=account_number)
+        .values_list('pk', 'status', 'user__is_email_verified', 'currency')
+        .first()
+    )
+
+
+def _lookup_sharded(account_number):
+    from .models import Account, User
+    for alias in sharding.shard_aliases():
+        row = (
+            Account.objects.using(alias)
+            .filter(account_number=account_number)
+            .values_list('pk', 'status', 'user_id', 'currency')
+            .first()
+        )
+        if row is not None:
+            pk, status, user_id, currency = row
+            verified = User.objects.filter(pk=user_id).values_list('is_email_verified', flat=True).first()
+            return pk, status, bool(verified), currency
+    return None
+
+
+def invalidate(*account_numbers):
+    if account_numbers:
+        cache.delete_many([_key(number) for number in account_numbers])
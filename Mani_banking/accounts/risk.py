@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import fx
+from .money import DEFAULT_CURRENCY
+
+# VELOCITY AND FRAUD CHECKS
+# Each account (as sender) and recipient account keeps bucketed sliding-window
+# counters in process memory, so evaluating a transfer is a handful of dict and
+# list operations instead of COUNT/SUM queries over Transaction. Breaching any
+# rule in RISK_RULES flags the transaction for manual review: it stays pending
+# and the settlement worker leaves it alone.
+#
+# Only money leaving an account (Transaction.DEBIT_TYPES) is checked and
+# counted; deposits and interest never count towards the sender's limits.
+# Amounts are normalised to minor units of DEFAULT_CURRENCY at the in-memory
+# FX rates before they reach a window, so one limit means the same value for
+# USD, JPY and KWD accounts. Without a rate only the decimal places are lined up.
+#
+# Rule metrics:
+#   count             transactions sent by the account in the window
+#   amount            DEFAULT_CURRENCY minor units sent by the account in the window
+#   new_recipients    distinct recipients first paid within the window
+#   recipient_amount  DEFAULT_CURRENCY minor units received by the recipient in the window
+#
+# State is per process: with N workers each one only sees the traffic it served,
+# so an account spreading requests over workers can send up to N times a limit
+# before any of them flags it. Put a shared cache behind RISK_ENGINE for exact
+# global limits.
+
+BUCKETS = 60
+
+
+class SlidingWindow:
+    """Count and sum of events over the last `span` seconds, in fixed buckets.
+
+    Running totals are kept up to date as buckets expire, so reading them is O(1)
+    amortised rather than a pass over every bucket.
+    """
+    __slots__ = ('bucket_seconds', 'counts', 'sums', 'head', 'count', 'total')
+
+    def __init__(self, span):
+        self.bucket_seconds = max(1, span // BUCKETS)
+        self.counts = [0] * BUCKETS
+        self.sums = [0] * BUCKETS
+        self.head = None
+        self.count = 0
+        self.total = 0
+
+    def _advance(self, stamp):
+        if self.head is None:
+            self.head = stamp
+            return
+        for expired in range(self.head + 1, min(stamp, self.head + BUCKETS) + 1):
+            index = expired % BUCKETS
+            self.count -= self.counts[index]
+            self.total -= self.sums[index]
+            self.counts[index] = 0
+            self.sums[index] = 0
+        self.head = max(self.head, stamp)
+
+    def add(self, now, amount):
+        stamp = int(now) // self.bucket_seconds
+        self._advance(stamp)
+        if stamp <= self.head - BUCKETS:
+            return  # Older than the window
+        index = stamp % BUCKETS
+        self.counts[index] += 1
+        self.sums[index] += amount
+        self.count += 1
+        self.total += amount
+
+    def totals(self, now):
+        self._advance(int(now) // self.bucket_seconds)
+        return self.count, self.total
+
+
+class AccountRisk:
+    __slots__ = ('sent', 'received', 'recipients', 'new_recipients')
+
+    def __init__(self, spans):
+        self.sent = {span: SlidingWindow(span) for span in spans}
+        self.received = {span: SlidingWindow(span) for span in spans}
+        self.recipients = set()
+        self.new_recipients = {span: SlidingWindow(span) for span in spans}
+
+
+class RiskEngine:
+    def __init__(self, rules, max_accounts=100000):
+        self.rules = rules
+        self.spans = sorted({rule['window'] for rule in rules})
+        self.max_accounts = max_accounts
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, account_id):
+        state = self._states.get(account_id)
+        if state is None:
+            state = self._states[account_id] = AccountRisk(self.spans)
+            if len(self._states) > self.max_accounts:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(account_id)
+        return state
+
+    def is_outgoing(self, transaction_type):
+        from .models import Transaction
+        return transaction_type in Transaction.DEBIT_TYPES
+
+    def normalise(self, amount, currency):
+        """amount in minor units of currency, as minor units of DEFAULT_CURRENCY."""
+        try:
+            scaled = fx.rates.scaled_rate(currency, DEFAULT_CURRENCY)
+        except fx.FxRateUnavailable:
+            scaled = fx.RATE_SCALE
+        return fx.convert(amount, currency, DEFAULT_CURRENCY, scaled)
+
+    def evaluate(self, account_id, recipient_id, amount, now=None, transaction_type='transfer',
+                 currency=DEFAULT_CURRENCY):
+        """Names of the rules this transaction would breach, counting itself."""
+        if not self.is_outgoing(transaction_type):
+            return []
+        now = time.time() if now is None else now
+        amount = self.normalise(amount, currency)
+        breached = []
+        with self._lock:
+            sender = self._state(account_id)
+            recipient = self._state(recipient_id) if recipient_id else None
+            is_new_recipient = recipient_id is not None and recipient_id not in sender.recipients
+            for rule in self.rules:
+                metric, window = rule['metric'], rule['window']
+                if metric == 'count':
+                    value = sender.sent[window].totals(now)[0] + 1
+                elif metric == 'amount':
+                    value = sender.sent[window].totals(now)[1] + amount
+                elif metric == 'new_recipients':
+                    value = sender.new_recipients[window].totals(now)[0] + is_new_recipient
+                elif metric == 'recipient_amount':
+                    if recipient is None:
+                        continue
+                    value = recipient.received[window].totals(now)[1] + amount
+                else:
+                    continue
+                if value > rule['limit']:
+                    breached.append(rule['name'])
+        return breached
+
+    def record(self, account_id, recipient_id, amount, now=None, transaction_type='transfer',
+               currency=DEFAULT_CURRENCY):
+        if not self.is_outgoing(transaction_type):
+            return
+        now = time.time() if now is None else now
+        amount = self.normalise(amount, currency)
+        with self._lock:
+            sender = self._state(account_id)
+            for window in sender.sent.values():
+                window.add(now, amount)
+            if recipient_id:
+                if recipient_id not in sender.recipients:
+                    sender.recipients.add(recipient_id)
+                    for window in sender.new_recipients.values():
+                        window.add(now, 1)
+                for window in self._state(recipient_id).received.values():
+                    window.add(now, amount)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                path = getattr(settings, 'RISK_ENGINE', 'accounts.risk.RiskEngine')
+                _engine = import_string(path)(getattr(settings, 'RISK_RULES', []))
+    return _engine
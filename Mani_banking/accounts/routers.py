@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# READ-REPLICA ROUTING
+# Reads go to the replica only inside views that opt in (ReplicaReadMixin) and
+# only when the replica alias is configured. A user who just wrote is pinned to
+# the primary for REPLICA_STICKY_SECONDS so they always read their own writes.
+# The pin is kept in the cache, which settings.CACHES shares between worker
+# processes: the user's next request may land on any of them.
+
+PRIMARY_DATABASE = 'default'
+REPLICA_DATABASE = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DATABASE in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+def pin_to_primary(user_id):
+    """Route this user's reads to the primary for the stickiness window."""
+    if replica_configured():
+        cache.set(_pin_key(user_id), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id), False)
+
+
+@contextmanager
+def primary_reads():
+    """Send reads in the block to the primary, e.g. when writing from a replica-read view."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data
+        databases = {PRIMARY_DATABASE, REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve the view's reads from the replica unless the user is pinned."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication runs against the primary; switch once the user is known
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and not is_pinned(request.user.pk):
+            _replica_reads.set(True)
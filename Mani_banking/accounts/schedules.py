@@ -0,0 +1,86 @@
+from collections import namedtuple
+from datetime import timedelta
+from functools import lru_cache
+
+# CRON-STYLE SCHEDULES
+# Five fields: minute hour day-of-month month day-of-week (0 = Sunday), each
+# accepting *, numbers, ranges (1-5), lists (1,15) and steps (*/10, 1-31/2).
+# Times are evaluated in UTC. next_run() jumps field by field instead of
+# scanning minute by minute, and is memoised because schedules that share an
+# expression and a due time (e.g. "0 0 1 * *" at midnight) share the answer.
+
+FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day of month', 1, 31),
+    ('month', 1, 12),
+    ('day of week', 0, 6),
+)
+
+CronSchedule = namedtuple('CronSchedule', ['minutes', 'hours', 'days', 'months', 'weekdays', 'any_day', 'any_weekday'])
+
+
+def _parse_field(text, name, low, high):
+    values = set()
+    for part in text.split(','):
+        range_part, _, step = part.partition('/')
+        try:
+            step = int(step) if step else 1
+            if range_part == '*':
+                start, end = low, high
+            elif '-' in range_part:
+                start, end = (int(v) for v in range_part.split('-', 1))
+            else:
+                start = end = int(range_part)
+        except ValueError:
+            raise ValueError(f"Invalid {name} field: {text!r}")
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Invalid {name} field: {text!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@lru_cache(maxsize=1024)
+def parse(expression):
+    """Parse a five-field cron expression. Raises ValueError if it is invalid."""
+    parts = expression.split()
+    if len(parts) != 5:
+        raise ValueError("Schedule must have 5 fields: minute hour day-of-month month day-of-week.")
+    fields = [_parse_field(part, *spec) for part, spec in zip(parts, FIELDS)]
+    return CronSchedule(*fields, any_day=parts[2] == '*', any_weekday=parts[4] == '*')
+
+
+def _day_matches(schedule, moment):
+    in_days = moment.day in schedule.days
+    in_weekdays = (moment.weekday() + 1) % 7 in schedule.weekdays
+    # Standard cron: when both day fields are restricted, either may match
+    if schedule.any_day:
+        return in_weekdays
+    if schedule.any_weekday:
+        return in_days
+    return in_days or in_weekdays
+
+
+@lru_cache(maxsize=4096)
+def next_run(expression, after):
+    """First time strictly after `after` (an aware UTC datetime) matching expression."""
+    schedule = parse(expression)
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = moment + timedelta(days=366 * 5)
+    while moment < limit:
+        if moment.month not in schedule.months:
+            year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+            moment = moment.replace(year=year, month=month, day=1, hour=0, minute=0)
+            continue
+        if not _day_matches(schedule, moment):
+            moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            continue
+        if moment.hour not in schedule.hours:
+            moment = (moment + timedelta(hours=1)).replace(minute=0)
+            continue
+        later_minutes = [m for m in schedule.minutes if m >= moment.minute]
+        if not later_minutes:
+            moment = (moment + timedelta(hours=1)).replace(minute=0)
+            continue
+        return moment.replace(minute=min(later_minutes))
+    raise ValueError(f"Schedule {expression!r} never fires.")
@@ -1,43 +1,106 @@
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
-from .models import User, Account, Transaction
+from .models import User, Account, Transaction, RecurringTransfer
+from . import resolver, schedules, sharding
 from django.utils.timezone import now
+from .money import MoneyAmountField
+
+class ShardedAccountField(serializers.PrimaryKeyRelatedField):
+    """An account by primary key, fetched from the shard its id belongs to."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+            return self.get_queryset().using(sharding.alias_for_id(pk)).get(pk=pk)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 class TransactionSerializer(serializers.ModelSerializer):
+    serializer_related_field = ShardedAccountField
+    amount = MoneyAmountField()
+    credit_amount = MoneyAmountField(currency_field='credit_currency', read_only=True)
+    # Preferred way to name a transfer recipient; recipient_account (a primary key) still works
+    recipient_account_number = serializers.CharField(max_length=20, write_only=True, required=False)
+
     class Meta:
         model = Transaction
-        fields = ['id', 'recipient_account', 'amount','account', 'description', 'transaction_type', 'status', 'date']
-        read_only_fields = ['id', 'status','account','date']
+        fields = ['id', 'recipient_account', 'recipient_account_number', 'amount', 'currency', 'account', 'description', 'transaction_type', 'status', 'date',
+                  'fx_rate', 'credit_amount', 'credit_currency']
+        read_only_fields = ['id', 'status', 'currency', 'account', 'date', 'fx_rate', 'credit_amount', 'credit_currency']
 
     def validate(self, data):
         # Ensure only authenticated user's account can be used
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
-            if data['account'].user != request.user:
-                raise serializers.ValidationError("You can only create transactions for your own account.")
-            # For transfers, ensure recipient_account exists and is not the same as the source account
+            # The source account is read-only and chosen by the view from request.user's accounts,
+            # which also rejects transfers to that same account
+            number = data.pop('recipient_account_number', None)
+            if number:
+                if data.get('recipient_account'):
+                    raise serializers.ValidationError("Give either recipient_account or recipient_account_number, not both.")
+                data.update(self.resolve_recipient(number))
+            # For transfers, ensure recipient_account exists
             if data['transaction_type'] == 'transfer':
-                if not data.get('recipient_account'):
+                if not data.get('recipient_account') and not data.get('recipient_account_id'):
                     raise serializers.ValidationError("Recipient account is required for transfers.")
-                if data['recipient_account'] == data['account']:
-                    raise serializers.ValidationError("Cannot transfer to the same account.")
         else:
             raise serializers.ValidationError("Authentication required.")
         return data
 
+    def resolve_recipient(self, account_number):
+        # Cached lookup, so validating a transfer does not query the recipient or its owner
+        recipient = resolver.resolve(account_number)
+        if recipient is None:
+            raise serializers.ValidationError("Recipient account not found.")
+        if recipient.status != 'active':
+            raise serializers.ValidationError("Recipient account is not active.")
+        if not recipient.owner_verified:
+            raise serializers.ValidationError("Recipient account cannot receive transfers yet.")
+        return {'recipient_account_id': recipient.id, 'recipient_currency': recipient.currency}
+
     def create(self, validated_data):
         # Set created_by to the authenticated user
         validated_data['created_by'] = self.context['request'].user
-        transaction = Transaction.objects.create(**validated_data)
+        recipient_currency = validated_data.pop('recipient_currency', None)
+        transaction = Transaction(**validated_data)
+        transaction.save(force_insert=True, recipient_currency=recipient_currency)
     
         return transaction
 
+class RecurringTransferSerializer(serializers.ModelSerializer):
+    serializer_related_field = ShardedAccountField
+    amount = MoneyAmountField()
+
+    class Meta:
+        model = RecurringTransfer
+        fields = ['id', 'recipient_account', 'amount', 'description', 'schedule', 'next_run_at', 'last_run_at', 'is_active']
+        read_only_fields = ['id', 'next_run_at', 'last_run_at']
+
+    def validate_schedule(self, value):
+        try:
+            # Parses it, and rejects schedules that never fire (e.g. 30 February)
+            schedules.next_run(value, now())
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be positive.")
+        return value
+
 class AccountSerializer(serializers.ModelSerializer):
+    balance = MoneyAmountField(read_only=True)
     transactions = serializers.SerializerMethodField()
 
     class Meta:
         model = Account
-        fields = ['account_number', 'account_type', 'balance', 'status', 'created_at', 'transactions']
-        read_only_fields = ['account_number', 'balance', 'created_at', 'transactions']
+        fields = ['account_number', 'account_type', 'balance', 'currency', 'status', 'created_at', 'transactions']
+        read_only_fields = ['account_number', 'balance', 'currency', 'created_at', 'transactions']
 
     def get_transactions(self, obj):
         # Return the 10 most recent transactions, ordered by date descending
@@ -0,0 +1,152 @@
+from collections import namedtuple
+from functools import partial
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from . import events, fx, outbox, postings, sharding
+from .models import Account, Transaction
+
+# SETTLEMENT OF PENDING TRANSACTIONS
+# Workers claim pending rows with SELECT ... FOR UPDATE SKIP LOCKED so several
+# of them can drain the queue in parallel without blocking on each other. A
+# claimed batch is posted with one bulk_update for accounts and one for the
+# transactions instead of a save() per row.
+#
+# Each worker call covers one shard (see accounts/sharding.py). Transfers to
+# accounts on other shards debit here and are credited in a second phase
+# (accounts/postings.py), whose leftovers deliver_prepared() picks up.
+
+SettlementResult = namedtuple('SettlementResult', ['completed', 'failed'])
+
+# Only money moving between accounts here settles without an admin. Deposits,
+# withdrawals and payments bring in or send out money the bank has not seen,
+# so they stay pending until approve_transaction.
+AUTO_SETTLED_TYPES = ('transfer',)
+
+
+def claim_pending(batch_size):
+    """Lock up to batch_size pending transactions not held by another worker.
+
+    Transactions flagged by the risk checks, and types outside
+    AUTO_SETTLED_TYPES, are left for manual approval.
+
+    Must be called inside transaction.atomic(); the locks last until commit.
+    """
+    queryset = (
+        Transaction.objects
+        .select_for_update(skip_locked=True, of=('self',))
+        .filter(status='pending', risk_flags='', transaction_type__in=AUTO_SETTLED_TYPES)
+        .order_by('id')
+    )
+    return list(queryset[:batch_size])
+
+
+def lock_accounts(account_ids):
+    """Lock and return {pk: account}, in primary key order so concurrent workers cannot deadlock.
+
+    Accounts on other shards than the current one are included unlocked; they
+    can only be transfer recipients, credited in the second phase.
+    """
+    alias = sharding.current_shard()
+    local = [pk for pk in account_ids if sharding.is_local(pk, alias)]
+    queryset = Account.objects.select_for_update().filter(pk__in=local).order_by('pk')
+    # Owners are on 'default' once accounts are sharded, out of reach of a join
+    queryset = queryset.prefetch_related('user') if sharding.is_enabled() else queryset.select_related('user')
+    accounts = {account.pk: account for account in queryset}
+    accounts.update(sharding.fetch_accounts(set(account_ids).difference(local)))
+    return accounts
+
+
+def rejection_reason(tx, accounts):
+    """Return why tx cannot be posted against the locked accounts, or None."""
+    account = accounts.get(tx.account_id)
+    if account is None or account.status != 'active':
+        return 'Source account is not active.'
+    if not account.user.is_email_verified:
+        return "User's email must be verified to perform transactions."
+    if tx.amount <= 0:
+        return 'Amount must be positive.'
+    if tx.currency != account.currency:
+        return 'Currency does not match the source account.'
+    if tx.transaction_type == 'transfer':
+        recipient = accounts.get(tx.recipient_account_id)
+        if recipient is None:
+            return 'Recipient account required.'
+        if recipient.pk == account.pk:
+            return 'Cannot transfer to the same account.'
+        if recipient.status != 'active':
+            return 'Recipient account is not active.'
+        if tx.credit_amount is None and recipient.currency != account.currency:
+            try:
+                # Rows created in bulk skip Transaction.save; lock their rate here from the in-memory table
+                fx.lock_rate(tx, account.currency, recipient.currency)
+            except fx.FxRateUnavailable as e:
+                return str(e)
+    if tx.transaction_type in Transaction.DEBIT_TYPES and account.balance < tx.amount:
+        return 'Insufficient funds.'
+    return None
+
+
+def settle_batch(transactions):
+    """Post a batch of claimed pending transactions.
+
+    Transactions are applied in order against in-memory balances so a batch
+    holding several postings for one account sees each of them. Rows that break
+    a rule are marked failed.
+    """
+    if not transactions:
+        return SettlementResult(0, 0)
+
+    account_ids = {tx.account_id for tx in transactions}
+    account_ids.update(tx.recipient_account_id for tx in transactions if tx.recipient_account_id)
+    accounts = lock_accounts(account_ids)
+
+    alias = sharding.current_shard()
+    completed_at = timezone.now()
+    touched = {}
+    cross_shard = []
+    completed = failed = 0
+    for tx in transactions:
+        if rejection_reason(tx, accounts):
+            tx.status = 'failed'
+            failed += 1
+            continue
+        account = accounts[tx.account_id]
+        if tx.transaction_type in Transaction.CREDIT_TYPES:
+            account.balance += tx.amount
+        elif tx.transaction_type in Transaction.DEBIT_TYPES:
+            account.balance -= tx.amount
+        touched[account.pk] = account
+        if tx.transaction_type == 'transfer':
+            recipient = accounts[tx.recipient_account_id]
+            if sharding.is_local(recipient.pk, alias):
+                recipient.balance += tx.recipient_amount
+                touched[recipient.pk] = recipient
+            else:
+                cross_shard.append(tx)
+        tx.status = 'completed'
+        tx.completed_at = completed_at
+        completed += 1
+
+    # bulk_update skips auto_now, so stamp updated_at explicitly
+    for account in touched.values():
+        account.updated_at = completed_at
+    Account.objects.bulk_update(touched.values(), ['balance', 'updated_at'])
+    Transaction.objects.bulk_update(transactions, ['status', 'completed_at', 'fx_rate', 'credit_amount', 'credit_currency'])
+    postings.prepare(cross_shard, alias)
+    outbox.emit_transactions(transactions)
+
+    for tx in transactions:
+        tx.account = accounts[tx.account_id]
+        tx_accounts = [a for a in (touched.get(tx.account_id), touched.get(tx.recipient_account_id)) if a]
+        db_transaction.on_commit(
+            partial(events.publish_transaction, tx, tx_accounts if tx.status == 'completed' else []), using=alias,
+        )
+    return SettlementResult(completed, failed)
+
+
+def settle_pending(batch_size=500):
+    """Claim and settle one batch of the current shard in its own database transaction."""
+    with db_transaction.atomic(using=sharding.current_shard()):
+        return settle_batch(claim_pending(batch_size))
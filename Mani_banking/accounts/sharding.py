@@ -0,0 +1,214 @@
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+# ACCOUNT SHARDING
+# Accounts and everything hanging off them (transactions, archived rows,
+# standing orders, statements, accrual checkpoints, outbox events, cross-shard
+# postings) are split over the databases listed in ACCOUNT_SHARDS, by user.
+# Users and the other tables stay on 'default', which is also shard 0, so an
+# unsharded install is the one-shard case and its data never moves.
+#
+# The shard map is User.shard, chosen once at sign-up from a hash of the email
+# (the user id is not known before the insert) and never changed afterwards.
+# ACCOUNT_SHARDS may therefore only be appended to. Each shard allocates ids
+# from its own block of SHARD_ID_SPACE (seeded after migrate), so any account
+# or transaction id names its shard without a lookup.
+#
+# ShardRouter routes a query by its instance hint (a user, or a row already
+# bound to a shard) and otherwise by the shard of the current context: views
+# mix in UserShardMixin, batch jobs wrap each shard in using_shard(). Replica
+# reads (accounts/routers.py) do not apply to sharded models.
+
+SHARD_ID_SPACE = 10 ** 12
+
+SHARDED_MODELS = frozenset({
+    'account', 'transaction', 'archivedtransaction', 'recurringtransfer', 'statement',
+    'accrualcheckpoint', 'outboxevent', 'outboxoffset', 'crossshardposting',
+})
+
+_current_shard = ContextVar('current_shard', default=None)
+
+
+def shard_aliases():
+    return list(getattr(settings, 'ACCOUNT_SHARDS', None) or ['default'])
+
+
+def is_enabled():
+    return len(shard_aliases()) > 1
+
+
+def is_sharded(model):
+    return model._meta.app_label == 'accounts' and model._meta.model_name in SHARDED_MODELS
+
+
+def shard_for_email(email):
+    """Shard index for a new user."""
+    return zlib.crc32(email.encode()) % len(shard_aliases())
+
+
+def alias_for_user(user):
+    aliases = shard_aliases()
+    if user.shard >= len(aliases):
+        raise ImproperlyConfigured(f"User {user.pk} is on shard {user.shard}, which ACCOUNT_SHARDS does not list.")
+    return aliases[user.shard]
+
+
+def alias_for_id(pk):
+    """The shard whose id block holds pk."""
+    aliases = shard_aliases()
+    # Ids past the last block can only be missing; look for them on the last shard
+    return aliases[min(max(int(pk) // SHARD_ID_SPACE, 0), len(aliases) - 1)]
+
+
+def id_floor(alias):
+    """Ids allocated on alias are greater than this."""
+    return shard_aliases().index(alias) * SHARD_ID_SPACE
+
+
+def is_local(account_id, alias):
+    return not is_enabled() or alias_for_id(account_id) == alias
+
+
+def current_shard():
+    return _current_shard.get() or shard_aliases()[0]
+
+
+@contextmanager
+def using_shard(alias):
+    """Route unhinted queries on sharded models to alias within the block."""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def group_by_shard(pks):
+    """{alias: [pk, ...]} for ids of sharded rows."""
+    by_alias = {}
+    for pk in pks:
+        by_alias.setdefault(alias_for_id(pk), []).append(pk)
+    return by_alias
+
+
+def fetch_accounts(account_ids):
+    """{pk: account} for accounts on any shard, one query per shard, without locks."""
+    from .models import Account
+    return {
+        account.pk: account
+        for alias, pks in group_by_shard(account_ids).items()
+        for account in Account.objects.using(alias).filter(pk__in=pks)
+    }
+
+
+def account_number_taken(account_number):
+    # Account numbers are unique across shards, not only within one
+    from .models import Account
+    return any(
+        Account.objects.using(alias).filter(account_number=account_number).exists()
+        for alias in shard_aliases()
+    )
+
+
+def seed_id_blocks(using):
+    """Start every sharded table of shard `using` at its id block; idempotent."""
+    from django.apps import apps
+    aliases = shard_aliases()
+    if using not in aliases or id_floor(using) == 0:
+        return
+    floor = id_floor(using)
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in apps.get_app_config('accounts').get_models():
+            if not is_sharded(model) or model._meta.pk.get_internal_type() not in ('AutoField', 'BigAutoField'):
+                continue
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, floor])
+                elif row[0] < floor:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [floor, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, model._meta.pk.column])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f"SELECT last_value FROM {sequence}")
+                if cursor.fetchone()[0] < floor:
+                    cursor.execute("SELECT setval(%s, %s)", [sequence, floor])
+            else:
+                raise ImproperlyConfigured(f"Shard {using!r}: id blocks are only supported on SQLite and PostgreSQL.")
+
+
+class ShardRouter:
+    """Routes sharded models; defers everything else to the next router."""
+
+    def _shard_of_instance(self, instance):
+        if instance._meta.label == settings.AUTH_USER_MODEL:
+            return alias_for_user(instance)
+        if not is_sharded(type(instance)):
+            return None
+        if instance._state.db:
+            return instance._state.db
+        account_id = getattr(instance, 'account_id', None)
+        if account_id is not None:
+            return alias_for_id(account_id)
+        user_id = getattr(instance, 'user_id', None)
+        if user_id is not None:
+            from .models import User
+            shard = User.objects.filter(pk=user_id).values_list('shard', flat=True).first()
+            return shard_aliases()[shard or 0]
+        return None
+
+    def _shard_for(self, model, hints):
+        if not is_enabled():
+            return None
+        instance = hints.get('instance')
+        if not is_sharded(model):
+            # Django falls back to the hint's database, but other shards hold only sharded tables
+            if instance is not None and instance._state.db in shard_aliases():
+                return 'default' if instance._state.db != 'default' else None
+            return None
+        alias = self._shard_of_instance(instance) if instance is not None else None
+        return alias or current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Foreign keys between shards and to users on 'default' hold plain ids (db_constraint=False)
+        aliases = set(shard_aliases())
+        if is_enabled() and obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default' or db not in shard_aliases():
+            return None
+        # Other shards hold only the sharded tables; data migrations run on 'default'
+        return app_label == 'accounts' and model_name in SHARDED_MODELS
+
+
+class UserShardMixin:
+    """Route the view's account and transaction queries to the user's shard."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _current_shard.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _current_shard.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication reads users from 'default'; switch once the user is known
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated and is_enabled():
+            _current_shard.set(alias_for_user(request.user))
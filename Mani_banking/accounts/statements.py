@@ -0,0 +1,386 @@
+import hashlib
+import json
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from html import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Case, F, IntegerField, Q, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from rest_framework.renderers import BaseRenderer
+
+from . import sharding
+from .models import Account, ArchivedTransaction, CrossShardPosting, Statement, Transaction, User
+from .money import format_minor
+
+# MONTHLY STATEMENTS
+# `manage.py generate_statements` renders one HTML and one PDF statement per
+# account and month. Accounts are processed in id-ordered chunks: the month's
+# postings for a whole chunk are streamed in completion order with one
+# query per table and split per account in memory, and opening balances carry
+# over from the previous month's statement (falling back to a grouped sum of
+# earlier postings). Rendered files are stored under their SHA-256 digest, so
+# identical content is written once and a stored file never changes; the
+# download view serves the digest as a strong ETag, and renders the statement
+# again if its file has gone missing from storage. Transfers credited from
+# another shard are listed from their incoming CrossShardPosting rows.
+#
+# A posting belongs to the month its balances moved in (completed_at), not the
+# one it was created in: a transaction approved after its creation month's
+# statement was generated appears on the next one instead of on none.
+#
+# The PDF renderer is a small pure-Python writer for monospaced text pages
+# using the standard Courier font, so no PDF library is needed.
+
+KINDS = {
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+POSTING_FIELDS = ('id', 'account_id', 'recipient_account_id', 'amount', 'credit_amount',
+                  'transaction_type', 'description', 'completed_at')
+
+StatementHeader = namedtuple('StatementHeader', ['title', 'owner', 'account', 'opening', 'closing'])
+
+storage = SimpleLazyObject(lambda: FileSystemStorage(location=settings.STATEMENTS_ROOT))
+
+
+class _StatementRenderer(BaseRenderer):
+    # Lets DRF content negotiation accept the statement media types; the file
+    # itself is returned as a FileResponse, so only error payloads get here
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+class PDFRenderer(_StatementRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class HTMLRenderer(_StatementRenderer):
+    media_type = 'text/html'
+    format = 'html'
+
+
+def month_bounds(period):
+    """Aware datetimes for the start of the month of `period` and of the next month."""
+    next_period = date(period.year + period.month // 12, period.month % 12 + 1, 1)
+    return (
+        timezone.make_aware(datetime(period.year, period.month, 1)),
+        timezone.make_aware(datetime(next_period.year, next_period.month, 1)),
+    )
+
+
+def previous_period(period):
+    return date(period.year - 1, 12, 1) if period.month == 1 else date(period.year, period.month - 1, 1)
+
+
+def artifact_path(digest, kind):
+    return f'{digest[:2]}/{digest}.{kind}'
+
+
+def store_artifact(content, kind):
+    """Store content under its SHA-256 digest unless already present; returns the digest."""
+    digest = hashlib.sha256(content).hexdigest()
+    path = artifact_path(digest, kind)
+    if not storage.exists(path):
+        storage.save(path, ContentFile(content))
+    return digest
+
+
+def open_artifact(digest, kind):
+    return storage.open(artifact_path(digest, kind), 'rb')
+
+
+def _deltas(account_ids, row):
+    """Yield (account_id, signed amount) for each side of a posting that touches account_ids."""
+    if row['account_id'] in account_ids:
+        if row['transaction_type'] in Transaction.CREDIT_TYPES:
+            yield row['account_id'], row['amount']
+        elif row['transaction_type'] in Transaction.DEBIT_TYPES:
+            yield row['account_id'], -row['amount']
+        else:
+            yield row['account_id'], 0
+    if row['transaction_type'] == 'transfer' and row['recipient_account_id'] in account_ids:
+        yield row['recipient_account_id'], row['amount'] if row['credit_amount'] is None else row['credit_amount']
+
+
+def _posting_sum(model, account_ids, before):
+    """Per-account sum of postings in one table completed before `before`."""
+    sums = defaultdict(int)
+    completed = model.objects.filter(status='completed', completed_at__lt=before)
+    sent = (
+        completed.filter(account_id__in=account_ids)
+        .values('account_id')
+        .annotate(delta=Sum(Case(
+            When(transaction_type__in=Transaction.CREDIT_TYPES, then=F('amount')),
+            When(transaction_type__in=Transaction.DEBIT_TYPES, then=-F('amount')),
+            default=0,
+            output_field=IntegerField(),
+        )))
+    )
+    received = (
+        completed.filter(recipient_account_id__in=account_ids, transaction_type='transfer')
+        .values('recipient_account_id')
+        .annotate(delta=Sum(Coalesce('credit_amount', 'amount')))
+    )
+    for row in sent:
+        sums[row['account_id']] += int(row['delta'] or 0)
+    for row in received:
+        sums[row['recipient_account_id']] += int(row['delta'] or 0)
+    return sums
+
+
+def opening_balances(account_ids, period):
+    """Balance of each account at the start of `period`.
+
+    Carries over last month's closing balance where a statement exists; other
+    accounts get a grouped sum of all earlier postings.
+    """
+    balances = dict(
+        Statement.objects
+        .filter(account_id__in=account_ids, period=previous_period(period))
+        .values_list('account_id', 'closing_balance')
+    )
+    missing = [pk for pk in account_ids if pk not in balances]
+    if missing:
+        start, _ = month_bounds(period)
+        hot = _posting_sum(Transaction, missing, start)
+        archived = _posting_sum(ArchivedTransaction, missing, start)
+        incoming = dict(
+            CrossShardPosting.objects
+            .filter(direction='incoming', recipient_account_id__in=missing, created_at__lt=start)
+            .values('recipient_account_id')
+            .annotate(total=Sum('amount'))
+            .values_list('recipient_account_id', 'total')
+        )
+        for pk in missing:
+            balances[pk] = hot[pk] + archived[pk] + int(incoming.get(pk) or 0)
+    return balances
+
+
+def month_postings(account_ids, period):
+    """Postings completed in the month touching account_ids, per account, in completion order."""
+    start, end = month_bounds(period)
+    ids = set(account_ids)
+    lines = defaultdict(list)
+    touching = Q(account_id__in=account_ids) | Q(recipient_account_id__in=account_ids, transaction_type='transfer')
+    for model in (ArchivedTransaction, Transaction):
+        rows = (
+            model.objects
+            .filter(touching, status='completed', completed_at__gte=start, completed_at__lt=end)
+            .order_by('completed_at', 'id')
+            .values(*POSTING_FIELDS)
+            .iterator(chunk_size=2000)
+        )
+        for row in rows:
+            for account_id, delta in _deltas(ids, row):
+                lines[account_id].append((row['completed_at'], row['transaction_type'], row['description'], delta))
+    incoming = (
+        CrossShardPosting.objects
+        .filter(direction='incoming', recipient_account_id__in=account_ids, created_at__gte=start, created_at__lt=end)
+        .values_list('recipient_account_id', 'created_at', 'description', 'amount')
+    )
+    for account_id, credited_at, description, amount in incoming:
+        lines[account_id].append((credited_at, 'transfer', description, amount))
+    # Archived rows are older than hot ones, but keep the merge correct regardless
+    for account_lines in lines.values():
+        account_lines.sort(key=lambda line: line[0])
+    return lines
+
+
+def statement_rows(opening, lines, currency):
+    """(date, type, description, amount, running balance) per line, formatted once for both renderers."""
+    rows = []
+    balance = opening
+    for when, transaction_type, description, delta in lines:
+        balance += delta
+        rows.append((f'{when:%Y-%m-%d}', transaction_type, description,
+                     format_minor(delta, currency), format_minor(balance, currency)))
+    return rows
+
+
+def render_html(header, rows):
+    body = ''.join(
+        f'<tr><td>{when}</td><td>{transaction_type}</td><td>{escape(description)}</td>'
+        f'<td class="n">{amount}</td><td class="n">{balance}</td></tr>'
+        for when, transaction_type, description, amount, balance in rows
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f'<title>{escape(header.title)}</title>'
+        '<style>body{font-family:sans-serif}table{border-collapse:collapse;width:100%}'
+        'td,th{border-bottom:1px solid #ddd;padding:4px;text-align:left}.n{text-align:right}</style>'
+        '</head><body>'
+        f'<h1>{escape(header.title)}</h1>'
+        f'<p>{escape(header.owner)}<br>{escape(header.account)}</p>'
+        f'<p>Opening balance: {header.opening}<br>Closing balance: {header.closing}</p>'
+        '<table><thead><tr><th>Date</th><th>Type</th><th>Description</th><th class="n">Amount</th>'
+        '<th class="n">Balance</th></tr></thead><tbody>'
+        + body +
+        '</tbody></table></body></html>'
+    ).encode()
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+FONT_SIZE = 9
+LEADING = 11
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+
+def _pdf_text(line):
+    text = line.encode('cp1252', errors='replace')
+    return b'(' + text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def render_pdf_text(lines):
+    """Render lines of text as a PDF document in 9pt Courier, paginated."""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for page in pages:
+        stream = b'\n'.join(
+            [b'BT', b'/F1 %d Tf' % FONT_SIZE, b'%d TL' % LEADING, b'%d %d Td' % (MARGIN, PAGE_HEIGHT - MARGIN)]
+            + [_pdf_text(line) + b" '" for line in page]
+            + [b'ET']
+        )
+        page_number = len(objects) + 1
+        kids.append(b'%d 0 R' % page_number)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+            % (PAGE_WIDTH, PAGE_HEIGHT, page_number + 1)
+        )
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+    objects[1] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % len(pages)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_pdf(header, rows):
+    text = [
+        header.title,
+        header.owner,
+        header.account,
+        '',
+        f'Opening balance: {header.opening}',
+        '',
+        f'{"Date":<10}  {"Type":<10}  {"Description":<34}  {"Amount":>14}  {"Balance":>14}',
+    ]
+    text.extend(
+        f'{when}  {transaction_type:<10}  {description[:34]:<34}  {amount:>14}  {balance:>14}'
+        for when, transaction_type, description, amount, balance in rows
+    )
+    text += ['', f'Closing balance: {header.closing}']
+    return render_pdf_text(text)
+
+
+def generate_chunk(accounts, period):
+    """Render and store statements for a chunk of account rows; returns how many were written."""
+    account_ids = [account['id'] for account in accounts]
+    openings = opening_balances(account_ids, period)
+    postings = month_postings(account_ids, period)
+    # Owners are read apart from their accounts, which may be on another database
+    owners = {
+        pk: f"{first_name} {last_name}".strip()
+        for pk, first_name, last_name in User.objects
+        .filter(pk__in={account['user_id'] for account in accounts})
+        .values_list('pk', 'first_name', 'last_name')
+    }
+    statements = []
+    for account in accounts:
+        currency = account['currency']
+        opening = openings[account['id']]
+        lines = postings.get(account['id'], [])
+        closing = opening + sum(line[3] for line in lines)
+        header = StatementHeader(
+            title=f"Mani Banking statement for {period:%B %Y}",
+            owner=owners.get(account['user_id'], ''),
+            account=f"Account {account['account_number']} ({account['account_type']}, {currency})",
+            opening=format_minor(opening, currency),
+            closing=format_minor(closing, currency),
+        )
+        rows = statement_rows(opening, lines, currency)
+        statements.append(Statement(
+            account_id=account['id'],
+            period=period,
+            currency=currency,
+            opening_balance=opening,
+            closing_balance=closing,
+            transaction_count=len(lines),
+            html_sha256=store_artifact(render_html(header, rows), 'html'),
+            pdf_sha256=store_artifact(render_pdf(header, rows), 'pdf'),
+        ))
+    Statement.objects.bulk_create(
+        statements,
+        update_conflicts=True,
+        unique_fields=['account', 'period'],
+        update_fields=['currency', 'opening_balance', 'closing_balance', 'transaction_count',
+                       'html_sha256', 'pdf_sha256', 'generated_at'],
+    )
+    return len(statements)
+
+
+def regenerate(account_id, period):
+    """Render an account's stored statement again, e.g. after its files went missing from storage.
+
+    Returns the new (html_sha256, pdf_sha256).
+    """
+    account = (
+        Account.objects
+        .filter(pk=account_id)
+        .values('id', 'account_number', 'account_type', 'currency', 'user_id')
+        .get()
+    )
+    generate_chunk([account], period)
+    return (
+        Statement.objects
+        .filter(account_id=account_id, period=period)
+        .values_list('html_sha256', 'pdf_sha256')
+        .get()
+    )
+
+
+def generate_range(period, start, end, chunk_size):
+    """Generate statements for accounts with ids in [start, end] opened before the month ended."""
+    # Shards allocate ids from disjoint blocks, so a range lies on a single shard
+    with sharding.using_shard(sharding.alias_for_id(start)):
+        return _generate_range(period, start, end, chunk_size)
+
+
+def _generate_range(period, start, end, chunk_size):
+    _, month_end = month_bounds(period)
+    accounts = (
+        Account.objects
+        .filter(pk__range=(start, end), created_at__lt=month_end)
+        .order_by('pk')
+        .values('id', 'account_number', 'account_type', 'currency', 'user_id')
+    )
+    written = 0
+    last_id = start - 1
+    while True:
+        chunk = list(accounts.filter(pk__gt=last_id)[:chunk_size])
+        if not chunk:
+            return written
+        written += generate_chunk(chunk, period)
+        last_id = chunk[-1]['id']
@@ -1,3 +1,1249 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import zlib
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import connections, transaction as db_transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from . import (
+    accruals, audit, compression, events, fx, outbox, postings, resolver, risk, routers, schedules, sharding, statements,
+    verification,
+)
+from .archive import archive_batch, archive_cutoff
+from .authentication import LazyJWTAuthentication
+from .money import MAX_MINOR, format_minor, to_minor
+from .models import (
+    Account, AccrualCheckpoint, ArchivedTransaction, AuditLogEntry, CrossShardPosting, EmailVerificationToken, FxRate,
+    OutboxEvent, RecurringTransfer, Transaction, User, UserProfile,
+)
+from .pagination import LargeTablePaginator
+from .reconcile import Drift, find_drift, fix_drift, reconcile_range
+from .recurring import run_due_batch
+from .settlement import settle_pending
+from .views import AccountEventStreamView
+
+# Risk state and cached responses must not leak between tests or into the project cache
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_user(email, **fields):
+    fields.setdefault('is_email_verified', True)
+    user = User(email=email, username=email.split('@')[0], **fields)
+    user.set_unusable_password()
+    user.save()
+    return user
+
+
+def fund(account, balance, **fields):
+    Account.objects.using(account._state.db).filter(pk=account.pk).update(balance=balance, **fields)
+    return Account.objects.using(account._state.db).get(pk=account.pk)
+
+
+def open_with(account, amount):
+    """Start account from zero with a completed deposit, so the ledger explains its balance."""
+    account = fund(account, 0)
+    Transaction(account=account, transaction_type='deposit', amount=amount, description='opening',
+                created_by=account.user, status='completed').save()
+    return Account.objects.using(account._state.db).get(pk=account.pk)
+
+
+class BankingTestCase(TestCase):
+    """Alice pays Bob.
+
+    With MANI_SHARDS set, their accounts land on different shards and the same
+    tests go through the two-phase transfers of accounts/postings.py.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.alice = make_user('alice@example.com')
+        self.bob = make_user('bob@example.com')
+        self.alice_account = fund(self.alice.accounts.get(), 100000)
+        self.bob_account = fund(self.bob.accounts.get(), 100000)
+        self.alias = self.alice_account._state.db
+        self.enterContext(sharding.using_shard(self.alias))
+
+    @contextmanager
+    def committed(self):
+        """Run what the shards defer to commit, cross-shard credits included."""
+        with ExitStack() as stack:
+            # The sender's callbacks run first, and may defer more on the recipient's shard
+            for alias in dict.fromkeys([self.bob_account._state.db, self.alias]):
+                stack.enter_context(self.captureOnCommitCallbacks(using=alias, execute=True))
+            yield
+
+    def client_for(self, user):
+        return self.client_class(HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=user)[0].key}')
+
+    def balance(self, account):
+        return Account.objects.using(account._state.db).get(pk=account.pk).balance
+
+    def pending(self, transaction_type, amount, **fields):
+        fields.setdefault('account', self.alice_account)
+        tx = Transaction(transaction_type=transaction_type, amount=amount, description=transaction_type,
+                         created_by=self.alice, **fields)
+        tx.save()
+        return tx
+
+    def settle(self):
+        with self.committed():
+            return settle_pending()
+
+
+def user_on_default(prefix):
+    """A new user whose accounts live on 'default', which admin pages read."""
+    return next(user for user in (make_user(f'{prefix}{i}@example.com') for i in range(50)) if user.shard == 0)
+
+
+def drain(subscription):
+    received = []
+    while True:
+        try:
+            received.append(subscription.get(timeout=0))
+        except queue.Empty:
+            return received
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AccountEventTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.broker = events.InProcessBroker()
+        self.enterContext(mock.patch.object(events, '_broker', self.broker))
+
+    def test_transaction_goes_to_its_owner_only(self):
+        alice, bob = self.broker.subscribe(self.alice.pk), self.broker.subscribe(self.bob.pk)
+        self.pending('transfer', 2500, recipient_account=self.bob_account)
+        self.settle()
+        self.assertEqual([event['type'] for event in drain(alice)], ['transaction', 'balance'])
+        self.assertEqual(drain(bob), [{'type': 'balance', 'account_number': self.bob_account.account_number,
+                                       'balance': '1025.00'}])
+
+    def test_database_broker_sees_other_processes(self):
+        # Subscriptions read the database, as they must when run_settlement posts the transfer
+        alice = events.DatabaseBroker().subscribe(self.alice.pk)
+        bob = events.DatabaseBroker().subscribe(self.bob.pk)
+        tx = self.pending('transfer', 2500, recipient_account=self.bob_account)
+        self.settle()
+        alice.poll()
+        bob.poll()
+        received = drain(alice)
+        self.assertEqual([(event['type'], event.get('status')) for event in received],
+                         [('transaction', 'pending'), ('transaction', 'completed'), ('balance', None)])
+        self.assertEqual(received[1]['id'], tx.pk)
+        self.assertEqual(received[1]['amount'], '25.00')
+        self.assertEqual(received[2]['balance'], '975.00')
+        self.assertEqual([(event['type'], event['balance']) for event in drain(bob)], [('balance', '1025.00')])
+
+        alice.poll()
+        self.assertEqual(drain(alice), [])
+
+    def test_stream_delivers_and_unsubscribes(self):
+        response = self.client_for(self.alice).get('/api/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b'retry: 5000\n\n')
+        self.broker.publish(self.alice.pk, {'type': 'balance', 'account_number': '1', 'balance': '1.00'})
+        self.assertEqual(next(stream), b'event: balance\ndata: {"type":"balance","account_number":"1","balance":"1.00"}\n\n')
+        response.close()
+        self.assertEqual(self.broker._subscribers, {})
+
+    def test_stream_ends_at_its_deadline(self):
+        with mock.patch.object(AccountEventStreamView, 'max_stream_seconds', 0):
+            response = self.client_for(self.alice).get('/api/events/', HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(b''.join(response.streaming_content), b'retry: 5000\n\n')
+
+    def test_stream_needs_verified_email(self):
+        User.objects.filter(pk=self.alice.pk).update(is_email_verified=False)
+        response = self.client_for(self.alice).get('/api/events/')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SettlementTests(BankingTestCase):
+
+    def test_transfers_settle(self):
+        tx = self.pending('transfer', 2500, recipient_account=self.bob_account)
+        self.assertEqual(self.settle(), (1, 0))
+        tx.refresh_from_db()
+        self.assertEqual(tx.status, 'completed')
+        self.assertIsNotNone(tx.completed_at)
+        self.assertEqual(self.balance(self.alice_account), 97500)
+        self.assertEqual(self.balance(self.bob_account), 102500)
+
+    def test_other_types_wait_for_approval(self):
+        for transaction_type in ('deposit', 'withdrawal', 'payment'):
+            self.pending(transaction_type, 1000)
+        self.assertEqual(self.settle(), (0, 0))
+        self.assertFalse(Transaction.objects.exclude(status='pending').exists())
+        self.assertEqual(self.balance(self.alice_account), 100000)
+
+    def test_flagged_transfers_wait_for_approval(self):
+        self.pending('transfer', 1000, recipient_account=self.bob_account, risk_flags='hourly_count')
+        self.assertEqual(self.settle(), (0, 0))
+
+    def test_insufficient_funds_fail(self):
+        tx = self.pending('transfer', 100001, recipient_account=self.bob_account)
+        self.assertEqual(self.settle(), (0, 1))
+        tx.refresh_from_db()
+        self.assertEqual(tx.status, 'failed')
+        self.assertEqual(self.balance(self.bob_account), 100000)
+
+    def test_batch_sees_earlier_postings(self):
+        self.pending('transfer', 60000, recipient_account=self.bob_account)
+        self.pending('transfer', 60000, recipient_account=self.bob_account)
+        self.assertEqual(self.settle(), (1, 1))
+        self.assertEqual(self.balance(self.alice_account), 40000)
+        self.assertEqual(self.balance(self.bob_account), 160000)
+
+    def test_command_drains_the_queue_in_batches(self):
+        for _ in range(3):
+            self.pending('transfer', 1000, recipient_account=self.bob_account)
+        out = StringIO()
+        with self.committed():
+            call_command('run_settlement', batch_size=2, stdout=out)
+        self.assertIn('Settled 3 transaction(s) in 2 batch(es): 3 completed, 0 failed', out.getvalue())
+        self.assertEqual(self.balance(self.bob_account), 103000)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminChangelistTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.client.force_login(make_user('admin@example.com', is_staff=True, is_superuser=True))
+        self.owner = user_on_default('owner')
+        self.account = self.owner.accounts.get()
+
+    def add_transactions(self, count):
+        Transaction.objects.bulk_create(
+            Transaction(account=self.account, recipient_account=self.account, amount=100, transaction_type='deposit',
+                        description='deposit', created_by=self.owner)
+            for _ in range(count)
+        )
+
+    def changelist_queries(self, path):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_transaction_queries_do_not_grow_with_rows(self):
+        self.add_transactions(2)
+        few = self.changelist_queries('/admin/accounts/transaction/')
+        self.add_transactions(30)
+        self.assertEqual(self.changelist_queries('/admin/accounts/transaction/'), few)
+
+    def test_account_queries_do_not_grow_with_rows(self):
+        few = self.changelist_queries('/admin/accounts/account/')
+        for i in range(5):
+            user_on_default(f'holder{i}-')
+        self.assertEqual(self.changelist_queries('/admin/accounts/account/'), few)
+
+    def test_paginator_fetches_pages_by_primary_key(self):
+        self.add_transactions(25)
+        queryset = Transaction.objects.order_by('-pk')
+        paginator = LargeTablePaginator(queryset, 10)
+        self.assertEqual(paginator.count, 25)
+        self.assertEqual(paginator.num_pages, 3)
+        with self.assertNumQueries(2):
+            page = paginator.page(3)
+        self.assertEqual([tx.pk for tx in page], list(queryset.values_list('pk', flat=True))[20:])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ArchiveTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = self.client_for(self.alice)
+        now = timezone.now()
+        # Pending rows stay hot however old they get
+        self.old_pending = self.dated(self.pending('deposit', 100), now - timedelta(days=500))
+        self.archived = self.dated(self.pending('deposit', 200, status='completed'), now - timedelta(days=400))
+        self.recent = self.dated(self.pending('deposit', 300, status='completed'), now - timedelta(days=1))
+        self.assertEqual(archive_batch(archive_cutoff()), 1)
+
+    def dated(self, tx, date):
+        Transaction.objects.filter(pk=tx.pk).update(date=date)
+        return tx
+
+    def listed(self, **params):
+        response = self.api.get('/api/transactions/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count'], [row['id'] for row in response.json()['results']]
+
+    def test_only_settled_rows_move(self):
+        self.assertEqual(list(ArchivedTransaction.objects.values_list('pk', flat=True)), [self.archived.pk])
+        self.assertEqual(set(Transaction.objects.values_list('pk', flat=True)), {self.old_pending.pk, self.recent.pk})
+
+    def test_default_list_skips_the_archive(self):
+        with CaptureQueriesContext(connections[self.alias]) as queries:
+            listed = self.listed()
+        self.assertEqual(listed, (2, [self.recent.pk, self.old_pending.pk]))
+        self.assertFalse([query for query in queries if 'archivedtransaction' in query['sql']])
+
+    def test_recent_range_skips_the_archive(self):
+        date_from = (timezone.now() - timedelta(days=30)).date().isoformat()
+        self.assertEqual(self.listed(date_from=date_from), (1, [self.recent.pk]))
+
+    def test_range_into_the_archive_merges_by_date(self):
+        date_from = (timezone.now() - timedelta(days=600)).date().isoformat()
+        self.assertEqual(self.listed(date_from=date_from), (3, [self.recent.pk, self.archived.pk, self.old_pending.pk]))
+        self.assertEqual(self.listed(date_from=date_from, limit=1, offset=1), (3, [self.archived.pk]))
+        self.assertEqual(self.listed(date_from=date_from, limit=2, offset=1), (3, [self.archived.pk, self.old_pending.pk]))
+
+
+class ReplicaProbeView(routers.ReplicaReadMixin, APIView):
+    permission_classes = []
+
+    def get(self, request):
+        return Response({'replica': routers.PrimaryReplicaRouter().db_for_read(Transaction)})
+
+    post = get
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASES={**settings.DATABASES, 'replica': settings.DATABASES['default']})
+class ReplicaRoutingTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('reader@example.com')
+
+    def routed(self, method='get'):
+        request = getattr(APIRequestFactory(), method)('/')
+        force_authenticate(request, user=self.user)
+        return ReplicaProbeView.as_view()(request).data['replica']
+
+    def test_reads_go_to_the_replica_inside_opted_in_views(self):
+        self.assertEqual(self.routed(), 'replica')
+        self.assertIsNone(routers.PrimaryReplicaRouter().db_for_read(Transaction))
+
+    def test_writes_stay_on_the_primary(self):
+        self.assertIsNone(self.routed('post'))
+        self.assertEqual(routers.PrimaryReplicaRouter().db_for_write(Transaction), 'default')
+
+    def test_writers_read_their_writes(self):
+        routers.pin_to_primary(self.user.pk)
+        self.assertTrue(routers.is_pinned(self.user.pk))
+        self.assertIsNone(self.routed())
+
+    def test_no_pins_without_a_replica(self):
+        with override_settings(DATABASES={'default': settings.DATABASES['default']}):
+            routers.pin_to_primary(self.user.pk)
+        self.assertFalse(routers.is_pinned(self.user.pk))
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASES={**settings.DATABASES, 'replica': settings.DATABASES['default']})
+class ReplicaPinTests(BankingTestCase):
+
+    def test_creating_a_transaction_pins_its_user(self):
+        response = self.client_for(self.alice).post('/api/transactions/create/', {
+            'transaction_type': 'deposit', 'amount': '10.00', 'description': 'cash',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(routers.is_pinned(self.alice.pk))
+        self.assertFalse(routers.is_pinned(self.bob.pk))
+
+
+class MoneyTests(SimpleTestCase):
+
+    def test_minor_units_round_trip(self):
+        for value, currency, minor, formatted in (('12.34', 'USD', 1234, '12.34'), ('0.05', 'EUR', 5, '0.05'),
+                                                  ('1000', 'JPY', 1000, '1000'), ('1.234', 'KWD', 1234, '1.234'),
+                                                  ('-7.5', 'USD', -750, '-7.50')):
+            with self.subTest(value=value, currency=currency):
+                self.assertEqual(to_minor(value, currency), minor)
+                self.assertEqual(format_minor(minor, currency), formatted)
+
+    def test_rejects_what_a_column_cannot_hold(self):
+        self.assertEqual(to_minor('92233720368547758.07', 'USD'), MAX_MINOR)
+        for value in ('92233720368547758.08', '1e20', '1e999999999', '12.345', 'NaN', 'abc'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    to_minor(value, 'USD')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AmountInputTests(BankingTestCase):
+
+    def create(self, amount):
+        return self.client_for(self.alice).post('/api/transactions/create/', {
+            'transaction_type': 'deposit', 'amount': amount, 'description': 'cash',
+        }, content_type='application/json')
+
+    def test_out_of_range_amounts_are_rejected(self):
+        for amount in ('1e20', '0', '-5', '0.00'):
+            with self.subTest(amount=amount):
+                self.assertEqual(self.create(amount).status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_search_ignores_amounts_out_of_range(self):
+        response = self.client_for(self.alice).get('/api/transactions/', {'search': '1e20'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CurrencyAmountTests(BankingTestCase):
+
+    def post(self, path, data):
+        return self.client_for(self.alice).post(path, data, content_type='application/json')
+
+    def test_amounts_use_account_currency(self):
+        cases = (('JPY', '1000', 1000), ('KWD', '1.234', 1234), ('USD', '12.34', 1234))
+        for currency, amount, minor in cases:
+            with self.subTest(currency=currency):
+                fund(self.alice_account, 10 ** 7, currency=currency)
+                response = self.post('/api/transactions/create/',
+                                     {'transaction_type': 'withdrawal', 'amount': amount, 'description': 'cash'})
+                self.assertEqual(response.status_code, 201, response.content)
+                self.assertEqual(response.json()['amount'], amount)
+                self.assertEqual(Transaction.objects.get(pk=response.json()['id']).amount, minor)
+
+    def test_too_many_decimals_rejected(self):
+        fund(self.alice_account, 10 ** 7, currency='JPY')
+        response = self.post('/api/transactions/create/',
+                             {'transaction_type': 'withdrawal', 'amount': '10.5', 'description': 'cash'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_recurring_transfer_uses_source_currency(self):
+        fund(self.alice_account, 10 ** 7, currency='KWD')
+        response = self.post('/api/recurring-transfers/', {
+            'recipient_account': self.bob_account.pk, 'amount': '2.500', 'schedule': '0 0 1 * *', 'description': 'rent',
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(RecurringTransfer.objects.get().amount, 2500)
+
+
+@override_settings(CACHES=TEST_CACHES, FX_VERSION_CHECK_SECONDS=0)
+class FxTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        fx.invalidate()
+        self.addCleanup(fx.invalidate)
+        self.bob_account = fund(self.bob_account, 100000, currency='EUR')
+        self.rate = FxRate.objects.create(base_currency='USD', quote_currency='EUR', rate='0.9')
+
+    def test_transfer_locks_rate_and_credits_converted_amount(self):
+        tx = self.pending('transfer', 1000, recipient_account=self.bob_account)
+        self.assertEqual((tx.credit_amount, tx.credit_currency, tx.fx_rate), (900, 'EUR', Decimal('0.9')))
+        # A later rate change does not touch the locked transfer
+        FxRate.objects.filter(pk=self.rate.pk).update(rate='0.5')
+        self.settle()
+        self.assertEqual(self.balance(self.bob_account), 100900)
+
+    def test_rate_changes_reach_other_processes(self):
+        self.assertEqual(fx.rates.scaled_rate('USD', 'EUR'), fx.scale_rate('0.9'))
+        # Saved elsewhere: nothing calls invalidate() here, the version check sees it
+        FxRate.objects.filter(pk=self.rate.pk).update(rate='0.8', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(fx.rates.scaled_rate('USD', 'EUR'), fx.scale_rate('0.8'))
+        self.assertEqual(fx.rates.scaled_rate('EUR', 'USD'), fx.RATE_SCALE * 10 // 8)
+
+    def test_missing_rate_fails_the_transfer(self):
+        self.bob_account = fund(self.bob_account, 100000, currency='GBP')
+        tx = Transaction(account=self.alice_account, recipient_account=self.bob_account, amount=1000,
+                         transaction_type='transfer', description='transfer', created_by=self.alice)
+        with self.assertRaises(fx.FxRateUnavailable):
+            tx.save()
+
+
+@override_settings(CACHES=TEST_CACHES, ACCRUAL_RULES={'savings': {'interest_rate': '0.0365'}})
+class AccrualTests(BankingTestCase):
+
+    def accrue(self, run_date):
+        call_command('run_accruals', date=run_date, stdout=StringIO())
+
+    def interest(self, account):
+        return Transaction.objects.using(account._state.db).filter(account=account, transaction_type='interest')
+
+    def test_accrues_once_per_run_date(self):
+        self.accrue('2026-01-31')
+        self.accrue('2026-01-31')
+        for account in (self.alice_account, self.bob_account):
+            # 0.0365 / 365 of 100000 is 10
+            self.assertEqual(self.balance(account), 100010)
+            self.assertEqual(self.interest(account).count(), 1)
+
+        self.accrue('2026-02-01')
+        self.assertEqual(self.balance(self.alice_account), 100020)
+        self.assertEqual(self.interest(self.alice_account).count(), 2)
+
+    def test_resumes_from_its_checkpoint(self):
+        second = fund(self.alice.accounts.create(), 100000)
+        run_date = date(2026, 1, 31)
+        real_chunk = accruals.accrue_chunk
+
+        def crash_on_second_chunk(*args):
+            if AccrualCheckpoint.objects.get().last_account_id is not None:
+                raise RuntimeError("Worker died")
+            return real_chunk(*args)
+
+        with mock.patch.object(accruals, 'accrue_chunk', crash_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                accruals.accrue_range(run_date, self.alice_account.pk, second.pk, chunk_size=1)
+        self.assertEqual(self.balance(self.alice_account), 100010)
+        self.assertEqual(self.balance(second), 100000)
+
+        # Unsharded, bob's account falls inside the range too.
+        remaining = Account.objects.filter(pk__gt=self.alice_account.pk, pk__lte=second.pk).count()
+        self.assertEqual(
+            accruals.accrue_range(run_date, self.alice_account.pk, second.pk, chunk_size=1), (remaining, remaining),
+        )
+        self.assertEqual(accruals.accrue_range(run_date, self.alice_account.pk, second.pk, chunk_size=1), (0, 0))
+        self.assertEqual(self.balance(self.alice_account), 100010)
+        self.assertEqual(self.balance(second), 100010)
+        checkpoint = AccrualCheckpoint.objects.get()
+        self.assertEqual((checkpoint.accounts_processed, checkpoint.last_account_id), (remaining + 1, second.pk))
+        self.assertIsNotNone(checkpoint.completed_at)
+
+    def test_charges_round_down(self):
+        rule = {'overdraft_rate': '0.15', 'daily_fee': 3}
+        # 100000 * 0.15 / 365 is 41.09
+        expected = ([0, 0, 0], [44, 3, 3])
+        self.assertEqual(accruals.daily_accruals([-100000, 0, 5], rule), expected)
+        with mock.patch.object(accruals, 'np', None):
+            self.assertEqual(accruals.daily_accruals([-100000, 0, 5], rule), expected)
+
+
+class ScheduleTests(SimpleTestCase):
+
+    def at(self, *args):
+        return datetime(*args, tzinfo=dt_timezone.utc)
+
+    def test_next_run(self):
+        cases = (
+            ('*/15 * * * *', self.at(2026, 1, 1, 10, 7), self.at(2026, 1, 1, 10, 15)),
+            ('0 0 1 * *', self.at(2026, 1, 1, 0, 0), self.at(2026, 2, 1, 0, 0)),
+            ('30 9 * * 1-5', self.at(2026, 1, 2, 10, 0), self.at(2026, 1, 5, 9, 30)),
+            ('0 0 29 2 *', self.at(2026, 3, 1, 0, 0), self.at(2028, 2, 29, 0, 0)),
+            # Both day fields restricted: either may match
+            ('0 12 13 * 5', self.at(2026, 2, 10, 0, 0), self.at(2026, 2, 13, 12, 0)),
+            ('0 12 15 * 0', self.at(2026, 2, 10, 0, 0), self.at(2026, 2, 15, 12, 0)),
+        )
+        for expression, after, expected in cases:
+            with self.subTest(expression=expression, after=after):
+                self.assertEqual(schedules.next_run(expression, after), expected)
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '60 * * * *', '* * 0 * *', '5-1 * * * *', '*/0 * * * *', 'a * * * *'):
+            with self.subTest(expression=expression), self.assertRaises(ValueError):
+                schedules.parse(expression)
+        with self.assertRaisesMessage(ValueError, "never fires"):
+            schedules.next_run('0 0 30 2 *', self.at(2026, 1, 1))
+
+
+class RecurringTransferTests(BankingTestCase):
+
+    def schedule(self, expression, **fields):
+        return self.client_for(self.alice).post('/api/recurring-transfers/', {
+            'recipient_account': self.bob_account.pk, 'amount': '25.00', 'schedule': expression, 'description': 'rent',
+            **fields,
+        }, content_type='application/json')
+
+    def test_rejects_schedules_that_never_fire(self):
+        for expression in ('0 0 30 2 *', '0 0 1 13 *'):
+            with self.subTest(expression=expression):
+                response = self.schedule(expression)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('schedule', response.json())
+        self.assertFalse(RecurringTransfer.objects.exists())
+
+    def test_due_transfers_run_and_advance(self):
+        self.assertEqual(self.schedule('0 0 1 * *').status_code, 201)
+        monthly = RecurringTransfer.objects.get()
+        now = monthly.next_run_at
+
+        with self.committed():
+            result = run_due_batch(now=now)
+        self.assertEqual((result.completed, result.failed), (1, 0))
+        monthly.refresh_from_db()
+        self.assertEqual(monthly.last_run_at, now)
+        self.assertEqual(monthly.next_run_at, schedules.next_run('0 0 1 * *', now))
+        self.assertEqual(self.balance(self.alice_account), 97500)
+        self.assertEqual(self.balance(self.bob_account), 102500)
+
+        # Already advanced: a second run in the same minute does nothing
+        self.assertEqual(run_due_batch(now=now), (0, 0))
+
+        # The monthly order is due again by New Year; the yearly one overdraws
+        self.assertEqual(self.schedule('0 0 1 1 *', amount='1500.00').status_code, 201)
+        yearly = RecurringTransfer.objects.latest('pk')
+        with self.committed():
+            result = run_due_batch(now=yearly.next_run_at)
+        self.assertEqual((result.completed, result.failed), (1, 1))
+        yearly.refresh_from_db()
+        self.assertGreater(yearly.next_run_at, yearly.last_run_at)
+        self.assertEqual(self.balance(self.alice_account), 95000)
+
+
+@override_settings(FX_VERSION_CHECK_SECONDS=0)
+class RiskTests(BankingTestCase):
+    rules = [
+        {'name': 'hourly_amount', 'metric': 'amount', 'window': 3600, 'limit': 500000},
+        {'name': 'hourly_recipient_inflow', 'metric': 'recipient_amount', 'window': 3600, 'limit': 500000},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        fx.invalidate()
+        self.addCleanup(fx.invalidate)
+        self.engine = risk.RiskEngine(self.rules)
+        self.enterContext(mock.patch.object(risk, '_engine', self.engine))
+
+    def create(self, transaction_type, amount, **fields):
+        response = self.client_for(self.alice).post('/api/transactions/create/', {
+            'transaction_type': transaction_type, 'amount': amount, 'description': transaction_type, **fields,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Transaction.objects.get(pk=response.json()['id'])
+
+    def test_deposits_do_not_count_as_sent(self):
+        # Windows are recorded once each transaction commits
+        with self.committed():
+            self.assertEqual(self.create('deposit', '6000.00').risk_flags, '')
+        with self.committed():
+            self.assertEqual(self.create('transfer', '10.00', recipient_account=self.bob_account.pk).risk_flags, '')
+        self.assertEqual(self.create('payment', '4990.01').risk_flags, 'hourly_amount')
+
+    def test_limits_are_in_the_default_currency(self):
+        FxRate.objects.create(base_currency='USD', quote_currency='JPY', rate=Decimal('150'))
+        # 600000 JPY is 4000.00 USD, under the 5000.00 limit
+        self.assertEqual(self.engine.evaluate(1, 2, 600000, currency='JPY'), [])
+        self.assertEqual(self.engine.evaluate(1, 2, 800000, currency='JPY'), ['hourly_amount', 'hourly_recipient_inflow'])
+        # Without a rate the decimal places still line up: 5000.001 KWD is over 5000.00
+        self.assertEqual(self.engine.evaluate(1, 2, 5000000, currency='KWD'), [])
+        self.assertEqual(self.engine.evaluate(1, 2, 5000010, currency='KWD'), ['hourly_amount', 'hourly_recipient_inflow'])
+
+        # Two senders reach the recipient's limit in JPY; one more US cent breaches it
+        self.engine.record(5, 7, 375000, now=0, currency='JPY')
+        self.engine.record(6, 7, 375000, now=0, currency='JPY')
+        self.assertEqual(self.engine.evaluate(5, 8, 375000, now=1, currency='JPY'), [])
+        self.assertEqual(self.engine.evaluate(6, 7, 1, now=1), ['hourly_recipient_inflow'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResolverTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.carol = user_on_default('carol')
+        self.carol_account = self.carol.accounts.get()
+        self.number = self.carol_account.account_number
+        self.carol_accounts = Account.objects.using(self.carol_account._state.db)
+
+    def transfer_to(self, number):
+        return self.client_for(self.alice).post('/api/transactions/create/', {
+            'transaction_type': 'transfer', 'amount': '10.00', 'description': 'rent', 'recipient_account_number': number,
+        }, content_type='application/json')
+
+    def test_lookups_stay_cached_until_status_changes(self):
+        self.assertEqual(resolver.resolve(self.number).status, 'active')
+        # update() bypasses the signals: the cached entry is served
+        self.carol_accounts.filter(pk=self.carol_account.pk).update(status='closed')
+        self.assertEqual(resolver.resolve(self.number).status, 'active')
+
+        account = self.carol_accounts.get(pk=self.carol_account.pk)
+        account.balance = 500
+        account.save()
+        self.assertEqual(resolver.resolve(self.number).status, 'active')
+        account.status = 'frozen'
+        account.save()
+        self.assertEqual(resolver.resolve(self.number).status, 'frozen')
+
+    def test_owner_verification_drops_entries(self):
+        self.assertTrue(resolver.resolve(self.number).owner_verified)
+        self.carol.last_login = timezone.now()
+        self.carol.save(update_fields=['last_login'])
+        self.carol.is_email_verified = False
+        self.carol.save(update_fields=['is_email_verified'])
+        self.assertFalse(resolver.resolve(self.number).owner_verified)
+        self.assertEqual(self.transfer_to(self.number).status_code, 400)
+
+    def test_admin_freeze_drops_entries(self):
+        self.assertEqual(self.transfer_to(self.number).status_code, 201)
+        self.client.force_login(make_user('admin@example.com', is_staff=True, is_superuser=True))
+        # Admin pages read 'default', not the shard the test runs in
+        with sharding.using_shard(self.carol_account._state.db):
+            response = self.client.post('/admin/accounts/account/', {
+                'action': 'freeze_account', '_selected_action': [self.carol_account.pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        response = self.transfer_to(self.number)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not active', response.content.decode())
+
+
+class ApproveTransactionTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.client_for(make_user('admin@example.com', is_staff=True))
+
+    def approve(self, tx, client=None):
+        with self.committed():
+            return (client or self.admin).post(f'/api/transactions/{tx.pk}/approve/')
+
+    def test_approve_posts_once(self):
+        tx = self.pending('deposit', 5000)
+        response = self.approve(tx)
+        self.assertEqual(response.status_code, 200)
+        tx.refresh_from_db()
+        self.assertEqual(tx.status, 'completed')
+        self.assertIsNotNone(tx.completed_at)
+        self.assertEqual(self.balance(self.alice_account), 105000)
+
+        response = self.approve(tx)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.balance(self.alice_account), 105000)
+
+    def test_approve_transfer_credits_recipient(self):
+        tx = self.pending('transfer', 5000, recipient_account=self.bob_account)
+        self.assertEqual(self.approve(tx).status_code, 200)
+        self.assertEqual(self.balance(self.alice_account), 95000)
+        self.assertEqual(self.balance(self.bob_account), 105000)
+
+    def test_every_debit_type_needs_funds(self):
+        for transaction_type in ('withdrawal', 'payment', 'transfer'):
+            with self.subTest(transaction_type=transaction_type):
+                tx = self.pending(transaction_type, 5000, recipient_account=self.bob_account)
+                fund(self.alice_account, 4999)
+                response = self.approve(tx)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], f'Insufficient funds for {transaction_type}.')
+                tx.refresh_from_db()
+                self.assertEqual(tx.status, 'pending')
+                self.assertEqual(self.balance(self.alice_account), 4999)
+
+    def test_admins_only(self):
+        tx = self.pending('deposit', 5000)
+        self.assertEqual(self.approve(tx, self.client_for(self.alice)).status_code, 403)
+        self.assertEqual(self.balance(self.alice_account), 100000)
+
+    def test_unknown_transaction(self):
+        self.assertEqual(self.admin.post('/api/transactions/999999/approve/').status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+
+
+class ReconcileTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice_account = open_with(self.alice_account, 100000)
+        self.bob_account = open_with(self.bob_account, 100000)
+
+    def reconcile(self, account, fix=False):
+        return reconcile_range(account.pk, account.pk, 100, fix=fix)
+
+    def test_postings_explain_balances(self):
+        self.pending('withdrawal', 1000, status='completed')
+        self.pending('transfer', 2500, recipient_account=self.bob_account)
+        self.settle()
+        self.assertEqual(self.balance(self.alice_account), 96500)
+        self.assertEqual(self.balance(self.bob_account), 102500)
+        self.assertEqual(self.reconcile(self.alice_account), [])
+        self.assertEqual(self.reconcile(self.bob_account), [])
+
+    def test_drift_found_and_fixed(self):
+        account = fund(self.bob_account, 99000)
+        self.assertEqual(self.reconcile(account, fix=True), [
+            Drift(account.pk, account.account_number, 'USD', 99000, 100000, fixed=True),
+        ])
+        self.assertEqual(self.balance(account), 100000)
+        self.assertEqual(self.reconcile(account), [])
+
+    def test_fix_skips_balances_that_moved(self):
+        account = fund(self.bob_account, 99000)
+        with sharding.using_shard(account._state.db):
+            drift = find_drift(account.pk, account.pk)
+            fund(account, 98000)
+            self.assertEqual(fix_drift(drift), set())
+        self.assertEqual(self.balance(account), 98000)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminApprovalTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(make_user('admin@example.com', is_staff=True, is_superuser=True))
+        self.carol = user_on_default('carol')
+        self.carol_account = fund(self.carol.accounts.get(), 100000)
+
+    def approve(self, *transactions):
+        # Admin pages read 'default', not the shard the test runs in
+        with sharding.using_shard('default'), self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/admin/accounts/transaction/', {
+                'action': 'approve_transaction', '_selected_action': [tx.pk for tx in transactions],
+            }, follow=True)
+
+    def test_refuses_debits_without_funds(self):
+        with sharding.using_shard('default'):
+            payment = Transaction.objects.create(account=self.carol_account, transaction_type='payment', amount=500000,
+                                                 description='car', created_by=self.carol)
+            deposit = Transaction.objects.create(account=self.carol_account, transaction_type='deposit', amount=2500,
+                                                 description='salary', created_by=self.carol)
+        response = self.approve(payment, deposit)
+        self.assertEqual(
+            [(m.level_tag, m.message) for m in response.context['messages']],
+            [('success', '1 transaction(s) approved successfully.'),
+             ('warning', f'1 transaction(s) not approved: #{payment.pk}: Insufficient funds.')],
+        )
+        payment.refresh_from_db()
+        deposit.refresh_from_db()
+        self.assertEqual((payment.status, deposit.status), ('pending', 'completed'))
+        self.assertEqual(self.balance(self.carol_account), 102500)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StatementTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(mock.patch.object(statements, 'storage', FileSystemStorage(location=root)))
+        self.alice_account = open_with(self.alice_account, 100000)
+        self.pending('withdrawal', 2500, status='completed')
+        self.period = timezone.localdate().replace(day=1)
+        statements.generate_range(self.period, self.alice_account.pk, self.alice_account.pk, 10)
+        self.path = f'/api/accounts/{self.alice_account.account_number}/statements/{self.period:%Y-%m}/'
+
+    def download(self, kind='pdf', **extra):
+        return self.client_for(self.alice).get(self.path, {'kind': kind}, **extra)
+
+    def test_download_and_revalidate(self):
+        response = self.download('html')
+        self.assertEqual(response.status_code, 200)
+        html = b''.join(response.streaming_content).decode()
+        self.assertIn('Opening balance: 0.00', html)
+        self.assertIn('Closing balance: 975.00', html)
+
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF-1.4'))
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client_for(self.bob).get(self.path).status_code, 404)
+
+    def test_missing_file_is_rendered_again(self):
+        first = self.download()
+        content = b''.join(first.streaming_content)
+        digest = first['ETag'].strip('"')
+        statements.storage.delete(statements.artifact_path(digest, 'pdf'))
+
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertTrue(statements.storage.exists(statements.artifact_path(digest, 'pdf')))
+
+
+class AuditTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.admin = make_user('admin@example.com', is_staff=True)
+        self.user = make_user('carol@example.com')
+
+    def record(self, *actions):
+        with self.captureOnCommitCallbacks(execute=True), audit.batch():
+            for action in actions:
+                audit.record(action, self.user, self.admin, reason=action)
+
+    def verify(self):
+        out = StringIO()
+        call_command('verify_audit_log', chunk_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_events_are_chained(self):
+        self.record('user.freeze', 'user.unfreeze')
+        self.record('user.delete')
+        entries = list(AuditLogEntry.objects.order_by('id'))
+        self.assertEqual([e.action for e in entries], ['user.freeze', 'user.unfreeze', 'user.delete'])
+        self.assertEqual(entries[0].prev_hash, audit.GENESIS_HASH)
+        self.assertEqual([e.prev_hash for e in entries[1:]], [e.hash for e in entries[:-1]])
+        self.assertIn('3 entries verified', self.verify())
+
+    def test_rolled_back_work_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), db_transaction.atomic():
+                audit.record('user.freeze', self.user, self.admin)
+                raise RuntimeError
+        self.assertFalse(AuditLogEntry.objects.exists())
+
+    def test_verify_finds_tampering(self):
+        self.record('user.freeze', 'user.unfreeze', 'user.delete')
+        first, middle, last = AuditLogEntry.objects.order_by('id')
+        # queryset.update/delete go around the append-only model methods
+        AuditLogEntry.objects.filter(pk=last.pk).update(data={'reason': 'forged'})
+        with self.assertRaisesMessage(CommandError, f"Audit log entry {last.pk} was modified"):
+            self.verify()
+        AuditLogEntry.objects.filter(pk=middle.pk).delete()
+        with self.assertRaisesMessage(CommandError, f"Audit log entry {last.pk} does not follow"):
+            self.verify()
+        with self.assertRaises(ValueError):
+            first.delete()
+
+
+OUTBOX_TEST_CONSUMERS = {
+    'ledger': {'BACKEND': 'accounts.outbox.MemorySink', 'OPTIONS': {'name': 'ledger'}},
+    'search': {'BACKEND': 'accounts.outbox.MemorySink', 'OPTIONS': {'name': 'search'}},
+}
+
+
+@override_settings(CACHES=TEST_CACHES, OUTBOX_CONSUMERS=OUTBOX_TEST_CONSUMERS)
+class OutboxTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        outbox.MemorySink.queues.clear()
+
+    def events(self):
+        return [
+            event
+            for alias in sharding.shard_aliases()
+            for event in OutboxEvent.objects.using(alias).order_by('id').values_list('id', 'topic', 'key')
+        ]
+
+    def relay(self, *args):
+        out = StringIO()
+        call_command('relay_outbox', *args, stdout=out)
+        return out.getvalue()
+
+    def received(self, name):
+        return [(event['id'], event['topic'], event['key']) for event in drain(outbox.MemorySink.queue(name))]
+
+    def test_status_changes_emit_events(self):
+        with self.assertRaises(RuntimeError), db_transaction.atomic(using=self.alias):
+            self.pending('withdrawal', 1000, status='completed')
+            raise RuntimeError
+        self.assertEqual(self.events(), [])
+
+        self.pending('transfer', 2500, recipient_account=self.bob_account)
+        self.settle()
+        self.assertIn(('transaction.completed', str(self.alice_account.pk)), [event[1:] for event in self.events()])
+
+    def test_relay_sends_each_event_once_and_prunes(self):
+        self.pending('transfer', 2500, recipient_account=self.bob_account)
+        self.settle()
+        events = self.events()
+        self.assertTrue(events)
+
+        self.assertIn(f'ledger: {len(events)} event(s) published.', self.relay('--consumer', 'ledger', '--prune'))
+        self.assertEqual(self.received('ledger'), events)
+        # search has not relayed yet, so nothing is pruned
+        self.assertEqual(self.events(), events)
+
+        self.assertIn('Pruned', self.relay('--prune'))
+        self.assertEqual(self.received('search'), events)
+        self.assertEqual(self.received('ledger'), [])
+        self.assertEqual(self.events(), [])
+
+    def test_failed_publish_is_sent_again(self):
+        self.pending('withdrawal', 1000, status='completed')
+        sink = outbox.MemorySink('ledger')
+        with sharding.using_shard(self.alias):
+            with mock.patch.object(sink, 'publish', side_effect=ConnectionError), self.assertRaises(ConnectionError):
+                outbox.relay_batch('ledger', sink)
+            self.assertEqual(outbox.relay_batch('ledger', sink), 1)
+            self.assertEqual(outbox.relay_batch('ledger', sink), 0)
+        self.assertEqual(len(self.received('ledger')), 1)
+
+    def test_relay_waits_at_recent_gaps(self):
+        now = timezone.now()
+        rows = [{'id': 1, 'created_at': now}, {'id': 3, 'created_at': now}]
+        self.assertEqual(outbox._visible_prefix(rows, 0, now), rows[:1])
+        rows[1]['created_at'] = now - timedelta(minutes=5)
+        self.assertEqual(outbox._visible_prefix(rows, 0, now), rows)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VerificationTests(TestCase):
+    databases = '__all__'
+
+    def register(self, email):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = make_user(email, is_email_verified=False)
+        return user, self.link_token(mail.outbox[-1])
+
+    def link_token(self, message):
+        return message.body.split('/verify-email/')[1].split('/')[0]
+
+    def verify(self, token):
+        return self.client.get(f'/api/verify-email/{token}/')
+
+    def sweep(self, *args):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sweep_verifications', *args, stdout=out)
+        return out.getvalue()
+
+    def test_link_verifies_once(self):
+        user, token = self.register('dave@example.com')
+        self.assertEqual(mail.outbox[-1].to, ['dave@example.com'])
+        # Only the digest is stored
+        self.assertEqual(EmailVerificationToken.objects.get(user=user).token_hash, verification.hash_token(token))
+        self.assertFalse(EmailVerificationToken.objects.filter(token_hash=token).exists())
+
+        self.assertEqual(self.verify(token).json(), {'message': 'Email verified successfully.'})
+        user.refresh_from_db()
+        self.assertTrue(user.is_email_verified)
+        self.assertEqual(self.verify(token).status_code, 400)
+
+    def test_sweep_reissues_expired_links(self):
+        user, token = self.register('dave@example.com')
+        EmailVerificationToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.verify(token).json(), {'error': 'Verification link has expired.'})
+
+        self.assertIn('Re-issued 1 expired token(s); 1 email(s) sent.', self.sweep('--reissue'))
+        new_token = self.link_token(mail.outbox[-1])
+        self.assertNotEqual(new_token, token)
+        self.assertEqual(self.verify(token).status_code, 400)
+        self.assertEqual(self.verify(new_token).status_code, 200)
+
+    def test_sweep_deletes_expired_tokens_and_idle_users(self):
+        idle, _ = self.register('idle@example.com')
+        busy, _ = self.register('busy@example.com')
+        fund(busy.accounts.get(), 500)
+        User.objects.filter(pk__in=[idle.pk, busy.pk]).update(date_joined=timezone.now() - timedelta(days=60))
+        EmailVerificationToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        output = self.sweep('--purge-users-after', '30', '--chunk-size', '1')
+        self.assertIn('Deleted 2 expired token(s).', output)
+        self.assertIn('Deleted 1 unverified user(s)', output)
+        self.assertEqual(list(User.objects.filter(pk__in=[idle.pk, busy.pk]).values_list('pk', flat=True)), [busy.pk])
+        self.assertFalse(EmailVerificationToken.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UserProfileTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = make_user('dave@example.com')
+        UserProfile.objects.create(user=self.user, phone_number='+233200000000', address='1 Ring Road')
+
+    def test_requests_do_not_load_the_profile(self):
+        client = self.client_class(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertEqual(client.get('/api/dashboard/').status_code, 200)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('userprofile', sql)
+        self.assertNotIn('phone_number', sql)
+
+    def test_admin_shows_and_deletes_the_profile(self):
+        self.client.force_login(make_user('admin@example.com', is_staff=True, is_superuser=True))
+        response = self.client.get(f'/admin/accounts/user/{self.user.pk}/change/')
+        self.assertContains(response, '+233200000000')
+        self.assertContains(response, 'name="profile-0-address"')
+        self.user.delete()
+        self.assertFalse(UserProfile.objects.exists())
+
+
+# What a fresh worker has imported once Django is set up and the URLconf loaded
+BOOTED_MODULES = """
+import json, sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+sys.stdout.write(json.dumps(sorted(sys.modules)))
+"""
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LazyImportTests(TestCase):
+    databases = '__all__'
+
+    def test_worker_boot_skips_deferred_packages(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='Mani_banking.settings')
+        result = subprocess.run([sys.executable, '-c', BOOTED_MODULES], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+        modules = set(json.loads(result.stdout))
+        self.assertIn('accounts.models', modules)
+        for package in ('rest_framework_simplejwt', 'jwt', 'dns'):
+            with self.subTest(package=package):
+                self.assertNotIn(package, modules)
+
+    def test_jwt_backend_is_built_for_bearer_headers_only(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+        user = make_user('dave@example.com')
+        self.enterContext(mock.patch.object(LazyJWTAuthentication, '_backend', None))
+
+        token = Token.objects.create(user=user)
+        response = self.client.get('/api/dashboard/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(LazyJWTAuthentication._backend)
+
+        response = self.client.get('/api/dashboard/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(LazyJWTAuthentication._backend)
+        self.assertEqual(self.client.get('/api/dashboard/', HTTP_AUTHORIZATION='Bearer forged').status_code, 401)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalResponseTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = self.client_for(self.alice)
+
+    def assertInvalidates(self, change, client=None):
+        client = client or self.api
+        etag = client.get('/api/dashboard/')['ETag']
+        self.assertEqual(client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        self.assertEqual(client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unchanged_is_not_modified(self):
+        response = self.api.get('/api/transactions/')
+        self.assertEqual(response.status_code, 200)
+        repeat = self.api.get('/api/transactions/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_tags_are_per_user(self):
+        etag = self.api.get('/api/dashboard/')['ETag']
+        other = self.client_for(self.bob).get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other.status_code, 200)
+
+    def test_posting_invalidates(self):
+        self.assertInvalidates(lambda: self.pending('deposit', 1000))
+
+    def test_recipient_is_invalidated(self):
+        self.pending('transfer', 1000, recipient_account=self.bob_account)
+        self.assertInvalidates(self.settle, self.client_for(self.bob))
+
+    def test_account_edit_invalidates(self):
+        def retype():
+            account = Account.objects.get(pk=self.alice_account.pk)
+            account.account_type = 'checking'
+            account.save()
+        self.assertInvalidates(retype)
+
+    def test_new_account_invalidates(self):
+        self.assertInvalidates(self.alice.accounts.create)
+
+    def test_deleted_transaction_invalidates(self):
+        tx = self.pending('deposit', 1000)
+        self.assertInvalidates(lambda: Transaction.objects.get(pk=tx.pk).delete())
+
+    def test_profile_edit_invalidates(self):
+        def rename():
+            self.alice.first_name = 'Alicia'
+            self.alice.save()
+        self.assertInvalidates(rename)
+
+
+@override_settings(CACHES=TEST_CACHES, RESPONSE_COMPRESSION_MIN_BYTES=200)
+class CompressionTests(BankingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = self.client_for(self.alice)
+        for i in range(10):
+            self.pending('deposit', 1000 + i)
+
+    def test_large_responses_are_gzipped(self):
+        plain = self.api.get('/api/transactions/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.api.get('/api/transactions/', HTTP_ACCEPT_ENCODING='br;q=1.0, gzip;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content))
+        # The compressed body still revalidates against its tag
+        repeat = self.api.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertNotIn('Content-Encoding', repeat)
+
+    def test_small_or_refused_bodies_are_left_alone(self):
+        for min_bytes, accept in ((10 ** 6, 'gzip'), (200, 'gzip;q=0, identity')):
+            with self.subTest(min_bytes=min_bytes, accept=accept), self.settings(RESPONSE_COMPRESSION_MIN_BYTES=min_bytes):
+                response = self.api.get('/api/transactions/', HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Content-Encoding', response)
+
+    def test_streams_are_compressed_chunk_by_chunk(self):
+        encoder = compression.GzipEncoder()
+        chunks = list(compression.compress_stream(encoder, [b'data: one\n\n' * 20, b'data: two\n\n' * 20]))
+        self.assertEqual(len(chunks), 3)
+        # Each flushed chunk decodes on its own, so clients see events as they are sent
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decoder.decompress(chunks[0]), b'data: one\n\n' * 20)
+        self.assertEqual(decoder.decompress(b''.join(chunks[1:])), b'data: two\n\n' * 20)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CrossShardPostingTests(BankingTestCase):
+    """Phases driven by hand; without shards every leg is credited on 'default'."""
+
+    def prepare_transfer(self, amount=2500):
+        tx = self.pending('transfer', amount, recipient_account=self.bob_account)
+        postings.prepare([tx], self.alias)
+        return tx
+
+    def incoming(self, tx):
+        return CrossShardPosting.objects.using(self.bob_account._state.db).filter(
+            transaction_id=tx.pk, direction='incoming',
+        )
+
+    def test_deliver_credits_once(self):
+        with self.committed():
+            tx = self.prepare_transfer()
+        self.assertEqual(self.balance(self.bob_account), 102500)
+        outgoing = CrossShardPosting.objects.get(transaction_id=tx.pk, direction='outgoing')
+        self.assertEqual(outgoing.state, 'credited')
+
+        self.assertEqual(postings.deliver(self.alias, [tx.pk]), 0)
+        postings.credit(self.bob_account._state.db, [outgoing])
+        self.assertEqual(self.balance(self.bob_account), 102500)
+        self.assertEqual(self.incoming(tx).count(), 1)
+
+    def test_credit_skips_delivered_legs(self):
+        with self.captureOnCommitCallbacks(using=self.alias):
+            tx = self.prepare_transfer()
+        leg = CrossShardPosting.objects.get(transaction_id=tx.pk, direction='outgoing')
+        postings.credit(self.bob_account._state.db, [leg])
+        # The outgoing leg is still prepared, as after a crash before it was marked
+        self.assertEqual(postings.deliver(self.alias, [tx.pk]), 1)
+        self.assertEqual(self.balance(self.bob_account), 102500)
+        self.assertEqual(self.incoming(tx).count(), 1)
+        self.assertFalse(CrossShardPosting.objects.filter(state='prepared').exists())
+
+    def test_deliver_prepared_retries_old_legs(self):
+        with self.captureOnCommitCallbacks(using=self.alias):
+            tx = self.prepare_transfer()
+        self.assertEqual(postings.deliver_prepared(self.alias), 0)
+        CrossShardPosting.objects.filter(transaction_id=tx.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(postings.deliver_prepared(self.alias), 1)
+        self.assertEqual(postings.deliver_prepared(self.alias), 0)
+        self.assertEqual(self.balance(self.bob_account), 102500)
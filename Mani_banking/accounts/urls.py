@@ -1,5 +1,5 @@
 from django.urls import path
-from accounts.views import RegisterView, LoginView, UserDashboardView, TransactionCreateView, TransactionListView, VerifyEmailView, approve_transaction
+from accounts.views import RegisterView, LoginView, UserDashboardView, TransactionCreateView, TransactionListView, VerifyEmailView, AccountEventStreamView, RecurringTransferListCreateView, StatementDownloadView, approve_transaction
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -7,6 +7,9 @@ urlpatterns = [
     path('dashboard/', UserDashboardView.as_view(), name='user_dashboard'),
     path('transactions/create/', TransactionCreateView.as_view(), name='transaction_create'),
     path('transactions/', TransactionListView.as_view(), name='transaction_list'),
+    path('recurring-transfers/', RecurringTransferListCreateView.as_view(), name='recurring_transfers'),
+    path('events/', AccountEventStreamView.as_view(), name='account_events'),
+    path('accounts/<str:account_number>/statements/<str:month>/', StatementDownloadView.as_view(), name='account_statement'),
     path('verify-email/<str:token>/', VerifyEmailView.as_view(), name='verify_email'),
     path('transactions/<int:transaction_id>/approve/', approve_transaction, name='approve_transaction'),
 ]
\ No newline at end of file
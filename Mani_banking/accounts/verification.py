@@ -0,0 +1,139 @@
+import hashlib
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from . import sharding
+
+# EMAIL VERIFICATION
+# The raw token only ever exists in the emailed link; EmailVerificationToken
+# stores its SHA-256 under a unique index. Issuing replaces a user's previous
+# token (one upsert per batch of users), and emails are sent after the commit
+# with send_mass_mail, so a batch of re-sends shares one mail connection.
+
+FROM_EMAIL = 'no-reply@manibanking.com'
+TOKEN_LENGTH = 64
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def token_ttl():
+    return timedelta(seconds=getattr(settings, 'EMAIL_VERIFICATION_TTL', 24 * 60 * 60))
+
+
+def issue(users):
+    """Create or replace the token of each user. Returns (user, raw token) pairs."""
+    from .models import EmailVerificationToken
+    now = timezone.now()
+    issued = [(user, get_random_string(length=TOKEN_LENGTH)) for user in users]
+    EmailVerificationToken.objects.bulk_create(
+        [
+            EmailVerificationToken(user=user, token_hash=hash_token(token), expires_at=now + token_ttl(), created_at=now)
+            for user, token in issued
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['token_hash', 'expires_at', 'created_at'],
+    )
+    return issued
+
+
+def message(user, token):
+    link = f"{settings.SITE_URL}/verify-email/{token}/"
+    hours = int(token_ttl().total_seconds() // 3600)
+    return (
+        'Verify Your Email Address',
+        f'Please verify your email by clicking this link: {link}\nThis link expires in {hours} hours.',
+        FROM_EMAIL,
+        [user.email],
+    )
+
+
+def send(issued):
+    """Email every (user, token) pair over a single connection. Returns messages sent."""
+    if not issued:
+        return 0
+    from django.core.mail import send_mass_mail  # The email package is only loaded once mail goes out
+    # fail_silently keeps a mail outage from failing registration; the sweeper re-sends
+    return send_mass_mail([message(user, token) for user, token in issued], fail_silently=True)
+
+
+def issue_and_send(users):
+    """Issue tokens now and email them once the current transaction commits."""
+    issued = issue(users)
+    db_transaction.on_commit(partial(send, issued))
+    return len(issued)
+
+
+# SWEEPING
+# Expired tokens are handled in pk-ordered chunks, each in its own database
+# transaction, so a sweep over millions of rows never holds long locks.
+
+def sweep_expired(reissue=False, chunk_size=1000):
+    """Delete expired tokens, or re-issue and re-send them. Returns (deleted, reissued, emails sent)."""
+    from .models import EmailVerificationToken
+    expired = (
+        EmailVerificationToken.objects
+        .filter(expires_at__lt=timezone.now())
+        .select_related('user')
+        .only('pk', 'user__email', 'user__is_email_verified')
+        .order_by('pk')
+    )
+    deleted = reissued = sent = last_pk = 0
+    while True:
+        tokens = list(expired.filter(pk__gt=last_pk)[:chunk_size])
+        if not tokens:
+            break
+        last_pk = tokens[-1].pk
+        # Verified users no longer need a token at all
+        stale = [token.pk for token in tokens if not reissue or token.user.is_email_verified]
+        with db_transaction.atomic():
+            EmailVerificationToken.objects.filter(pk__in=stale).delete()
+            issued = issue([token.user for token in tokens if token.pk not in stale]) if reissue else []
+        sent += send(issued)
+        deleted += len(stale)
+        reissued += len(issued)
+    return deleted, reissued, sent
+
+
+def purge_unverified_users(joined_before, chunk_size=1000):
+    """Delete never-verified users who joined before the cutoff and never used their accounts."""
+    from .models import Account, ArchivedTransaction, CrossShardPosting, Transaction, User
+    used = (
+        ~Q(balance=0)
+        | Exists(Transaction.objects.filter(Q(account=OuterRef('pk')) | Q(recipient_account=OuterRef('pk'))))
+        | Exists(ArchivedTransaction.objects.filter(account=OuterRef('pk')))
+        | Exists(CrossShardPosting.objects.filter(recipient_account_id=OuterRef('pk')))
+    )
+    candidates = (
+        User.objects
+        .filter(is_email_verified=False, is_staff=False, date_joined__lt=joined_before)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+    deleted = 0
+    last_pk = 0
+    while True:
+        pks = list(candidates.filter(pk__gt=last_pk)[:chunk_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        # Accounts may be on other databases than their owners (accounts/sharding.py),
+        # so usage is looked up per shard rather than joined
+        active = {
+            user_id
+            for alias in sharding.shard_aliases()
+            for user_id in Account.objects.using(alias).filter(user_id__in=pks).filter(used).values_list('user_id', flat=True)
+        }
+        with db_transaction.atomic():
+            _, per_model = User.objects.filter(pk__in=set(pks) - active, is_email_verified=False).delete()
+        deleted += per_model.get(User._meta.label, 0)
+    return deleted
@@ -1,6 +1,4 @@
 import uuid
-from django.utils.crypto import get_random_string
-from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
@@ -9,8 +7,8 @@ from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
-from .models import User, Account, Transaction
-from .serializers import UserDashboardSerializer, TransactionSerializer
+from .models import User, Account, Transaction, ArchivedTransaction, RecurringTransfer, Statement, EmailVerificationToken
+from .serializers import UserDashboardSerializer, TransactionSerializer, RecurringTransferSerializer
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from django.utils.timezone import now
@@ -18,6 +16,21 @@ from django.shortcuts import get_object_or_404
 from django.db import transaction as db_transaction
 from django.db.models import Q
 from django.contrib.auth import authenticate
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from datetime import datetime
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+import json
+import queue
+import time
+from functools import partial
+from . import archive, audit, events, risk, sharding, statements, verification
+from .money import to_minor
+from .schedules import next_run
+from .routers import ReplicaReadMixin, pin_to_primary, primary_reads
+from .sharding import UserShardMixin
+from .settlement import lock_accounts
+from .conditional import ConditionalResponseMixin
 
 class RegisterView(APIView):
     permission_classes = []
@@ -48,18 +61,14 @@ class RegisterView(APIView):
             )
 
         try:
-            user = User.objects.create_user(
+            # The post_save signal issues the verification token and emails it
+            User.objects.create_user(
                 email=email,
                 username=username,
                 first_name=first_name,
                 last_name=last_name,
                 password=password
             )
-            #Generate verification Token
-            token = get_random_string(length=64)
-            user.email_verification_token = token
-            user.email_verification_token_expires = timezone.now() + timezone.timedelta(days = 1)
-            user.save()
             return Response(
                 {"message": "User registered successfully. Please verify your email."},
                 status=status.HTTP_201_CREATED
@@ -105,7 +114,7 @@ class LoginView(ObtainAuthToken):
             }
         }, status=status.HTTP_200_OK)
 
-class UserDashboardView(APIView):
+class UserDashboardView(ConditionalResponseMixin, UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -138,19 +147,44 @@ class UserDashboardView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class TransactionCreateView(generics.CreateAPIView):
+class TransactionCreateView(UserShardMixin, generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = TransactionSerializer
 
+    def user_accounts(self):
+        if not hasattr(self, '_user_accounts'):
+            self._user_accounts = list(self.request.user.accounts.all())
+        return self._user_accounts
+
+    def get_serializer_context(self):
+        # Amounts are entered in the currency of the account perform_create posts from
+        context = super().get_serializer_context()
+        if self.request.user.is_authenticated and self.user_accounts():
+            context['currency'] = self.user_accounts()[-1].currency
+        return context
+
     def perform_create(self, serializer):
         try:
-            accounts = self.request.user.accounts.all()
+            accounts = self.user_accounts()
             if not self.request.user.is_email_verified:
                 raise PermissionDenied("Email verification required to create transactions.")
+            if not accounts:
+                raise NotFound("User account not found.")
             for account in accounts:
                 if account.status != 'active':
                     raise PermissionDenied(f"Cannot create transactions for a {account.status} account.")
-            serializer.save(account=account, created_by=self.request.user)
+            recipient = serializer.validated_data.get('recipient_account')
+            recipient_id = recipient.pk if recipient is not None else serializer.validated_data.get('recipient_account_id')
+            if recipient_id is not None and recipient_id == account.pk:
+                raise ValidationError("Cannot transfer to the same account.")
+            # Velocity checks run in memory; a breach keeps the transaction pending for manual review
+            engine = risk.get_engine()
+            amount = serializer.validated_data['amount']
+            kind = {'transaction_type': serializer.validated_data['transaction_type'], 'currency': account.currency}
+            flags = engine.evaluate(account.pk, recipient_id, amount, **kind)
+            serializer.save(account=account, created_by=self.request.user, risk_flags=','.join(flags))
+            db_transaction.on_commit(partial(engine.record, account.pk, recipient_id, amount, **kind))
+            pin_to_primary(self.request.user.pk)
         except ObjectDoesNotExist:
             raise NotFound("User account not found.")
 
@@ -163,7 +197,7 @@ class TransactionCreateView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class TransactionListView(generics.ListAPIView):
+class TransactionListView(ConditionalResponseMixin, UserShardMixin, ReplicaReadMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = TransactionSerializer
     pagination_class = LimitOffsetPagination
@@ -177,31 +211,45 @@ class TransactionListView(generics.ListAPIView):
             for account in accounts:
                 if account.status != 'active':
                     raise PermissionDenied(f"Cannot view transactions for a {account.status} account.")
-            queryset = Transaction.objects.filter(account__in=accounts)
-            transaction_type = self.request.query_params.get('type')
-            status = self.request.query_params.get('status')
-            date_from = self.request.query_params.get('date_from')
-            date_to = self.request.query_params.get('date_to')
-            search = self.request.query_params.get('search')
-            
-            if transaction_type:
-                queryset = queryset.filter(transaction_type=transaction_type)
-            if status:
-                queryset = queryset.filter(status=status)
-            if date_from:
-                queryset = queryset.filter(date__gte=date_from)
-            if date_to:
-                queryset = queryset.filter(date__lte=date_to)
-            if search:
-                queryset = queryset.filter(
-                    Q(description__icontains=search) |
-                    Q(amount__icontains=search)
-                )
-            
-            return queryset.order_by('-date')
+            currencies = {account.currency for account in accounts}
+            queryset = self.filter_transactions(Transaction.objects.filter(account__in=accounts), currencies)
+            archived = ArchivedTransaction.objects.filter(account__in=accounts)
+            if not archive.needs_archive(self.request.query_params.get('date_from'), archived):
+                return queryset
+            # Date range reaches back into the archive, fall through to cold storage
+            return archive.TieredTransactions(queryset, self.filter_transactions(archived, currencies))
         except ObjectDoesNotExist:
             raise NotFound("User account not found.")
 
+    def filter_transactions(self, queryset, currencies):
+        transaction_type = self.request.query_params.get('type')
+        status = self.request.query_params.get('status')
+        date_from = self.request.query_params.get('date_from')
+        date_to = self.request.query_params.get('date_to')
+        search = self.request.query_params.get('search')
+
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        if status:
+            queryset = queryset.filter(status=status)
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+        if search:
+            query = Q(description__icontains=search)
+            # Amounts are stored in minor units, so match a typed amount exactly,
+            # read in each currency the user's accounts hold
+            for currency in currencies:
+                try:
+                    query |= Q(amount=to_minor(search, currency), currency=currency)
+                except ValueError:
+                    pass
+            queryset = queryset.filter(query)
+
+        # id breaks ties so archived rows merge into the same order (archive.TieredTransactions)
+        return queryset.order_by('-date', '-id')
+
     def list(self, request, *args, **kwargs):
         try:
             queryset = self.get_queryset()
@@ -216,31 +264,176 @@ class TransactionListView(generics.ListAPIView):
         except NotFound as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
 
+class RecurringTransferListCreateView(UserShardMixin, generics.ListCreateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = RecurringTransferSerializer
+
+    def get_queryset(self):
+        return (
+            RecurringTransfer.objects
+            .filter(account__user=self.request.user)
+            .select_related('account')
+            .order_by('next_run_at')
+        )
+
+    def source_account(self):
+        if not hasattr(self, '_source_account'):
+            self._source_account = self.request.user.accounts.filter(status='active').first()
+        return self._source_account
+
+    def get_serializer_context(self):
+        # Amounts are entered in the currency of the account the transfers are drawn from
+        context = super().get_serializer_context()
+        if self.request.method == 'POST' and self.request.user.is_authenticated and self.source_account():
+            context['currency'] = self.source_account().currency
+        return context
+
+    def perform_create(self, serializer):
+        user = self.request.user
+        if not user.is_email_verified:
+            raise PermissionDenied("Email verification required to schedule transfers.")
+        account = self.source_account()
+        if account is None:
+            raise PermissionDenied("An active account is required to schedule transfers.")
+        if serializer.validated_data['recipient_account'] == account:
+            raise ValidationError("Cannot transfer to the same account.")
+        serializer.save(
+            account=account,
+            created_by=user,
+            next_run_at=next_run(serializer.validated_data['schedule'], now()),
+        )
+
+class EventStreamRenderer(BaseRenderer):
+    # Lets DRF content negotiation accept "Accept: text/event-stream"
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error payloads reach the renderer; the stream itself bypasses it
+        return json.dumps(data).encode(self.charset)
+
+class AccountEventStreamView(APIView):
+    """Server-sent events stream of the user's balance and transaction updates."""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    heartbeat_seconds = 15
+    # Each open stream holds a worker thread; end it so clients reconnect and
+    # closed tabs give the thread back
+    max_stream_seconds = 300
+
+    def get(self, request):
+        if not request.user.is_email_verified:
+            return Response(
+                {"error": "Email verification required to receive updates."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        response = StreamingHttpResponse(
+            self.stream(request.user.pk),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream(self, user_id):
+        broker = events.get_broker()
+        subscription = broker.subscribe(user_id)
+        deadline = time.monotonic() + self.max_stream_seconds
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event = subscription.get(timeout=min(self.heartbeat_seconds, remaining))
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield events.format_sse(event)
+        finally:
+            broker.unsubscribe(user_id, subscription)
+
+class StatementDownloadView(UserShardMixin, ReplicaReadMixin, APIView):
+    """A monthly statement as PDF, or HTML with ?kind=html.
+
+    Stored statements never change, so the content digest is a strong ETag and
+    a repeat download with If-None-Match is answered with 304.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, statements.PDFRenderer, statements.HTMLRenderer]
+
+    def get(self, request, account_number, month):
+        kind = request.query_params.get('kind', 'pdf')
+        if kind not in statements.KINDS:
+            return Response({"error": "kind must be 'pdf' or 'html'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            period = datetime.strptime(month, '%Y-%m').date()
+        except ValueError:
+            raise NotFound("Statement not found.")
+        stored = (
+            Statement.objects
+            .filter(account__account_number=account_number, account__user=request.user, period=period)
+            .values_list('account_id', 'html_sha256', 'pdf_sha256')
+            .first()
+        )
+        if stored is None:
+            raise NotFound("Statement not found.")
+        account_id, *digests = stored
+        digest = digests[0] if kind == 'html' else digests[1]
+        etag = f'"{digest}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                artifact = statements.open_artifact(digest, kind)
+            except FileNotFoundError:
+                # Lost from storage (e.g. restored without its files): render it again from the ledger
+                with primary_reads():
+                    digests = statements.regenerate(account_id, period)
+                digest = digests[0] if kind == 'html' else digests[1]
+                etag = f'"{digest}"'
+                artifact = statements.open_artifact(digest, kind)
+            response = FileResponse(
+                artifact,
+                content_type=statements.KINDS[kind],
+                filename=f'statement-{account_number}-{month}.{kind}',
+            )
+        response['ETag'] = etag
+        # Clients may keep the file but must revalidate, which is a cheap 304
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 class VerifyEmailView(APIView):
     permission_classes = []
 
     def get(self, request, token):
         try:
-            user = User.objects.get(email_verification_token=token)
+            # Tokens are stored hashed under a unique index: one index lookup per click
+            verification_token = EmailVerificationToken.objects.select_related('user').get(
+                token_hash=verification.hash_token(token)
+            )
+            user = verification_token.user
             if user.is_email_verified:
                 return Response(
                     {"message": "Email already verified."},
                     status=status.HTTP_200_OK
                 )
-            if user.email_verification_token_expires < now():
+            if verification_token.is_expired:
                 return Response(
                     {"error": "Verification link has expired."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            user.is_email_verified = True
-            user.email_verification_token = None
-            user.email_verification_token_expires = None
-            user.save()
+            with db_transaction.atomic():
+                user.is_email_verified = True
+                user.save(update_fields=['is_email_verified'])
+                verification_token.delete()
             return Response(
                 {"message": "Email verified successfully."},
                 status=status.HTTP_200_OK
             )
-        except User.DoesNotExist:
+        except EmailVerificationToken.DoesNotExist:
             return Response(
                 {"error": "Invalid verification link."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -249,31 +442,28 @@ class VerifyEmailView(APIView):
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
 def approve_transaction(request, transaction_id):
-    tx = get_object_or_404(Transaction, id=transaction_id)
-
-    if tx.status != 'pending':
-        return Response({'error': 'Transaction already processed.'}, status=400)
-
     try:
-        with db_transaction.atomic():
-            if tx.transaction_type == 'deposit':
-                tx.account.balance += tx.amount
-            elif tx.transaction_type == 'withdrawal':
-                if tx.account.balance < tx.amount:
-                    return Response({'error': 'Insufficient funds for withdrawal.'}, status=400)
-                tx.account.balance -= tx.amount
-            elif tx.transaction_type == 'transfer':
-                if not tx.recipient_account:
-                    return Response({'error': 'Recipient account required.'}, status=400)
-                if tx.account.balance < tx.amount:
-                    return Response({'error': 'Insufficient funds for transfer.'}, status=400)
-                tx.account.balance -= tx.amount
-                tx.recipient_account.balance += tx.amount
-                tx.recipient_account.save()
-
-            tx.account.save()
+        # Transaction ids name their shard; a recipient on another shard is credited after commit
+        alias = sharding.alias_for_id(transaction_id)
+        with sharding.using_shard(alias), db_transaction.atomic(using=alias):
+            tx = get_object_or_404(Transaction.objects.select_for_update(of=('self',)), id=transaction_id)
+            if tx.status != 'pending':
+                return Response({'error': 'Transaction already processed.'}, status=400)
+            if tx.transaction_type == 'transfer' and not tx.recipient_account_id:
+                return Response({'error': 'Recipient account required.'}, status=400)
+            accounts = lock_accounts({tx.account_id, tx.recipient_account_id} - {None})
+            tx.account = accounts[tx.account_id]
+            if tx.recipient_account_id:
+                tx.recipient_account = accounts[tx.recipient_account_id]
+            if tx.transaction_type in Transaction.DEBIT_TYPES and tx.account.balance < tx.amount:
+                return Response({'error': f'Insufficient funds for {tx.transaction_type}.'}, status=400)
+            # save() posts the balance changes exactly once
             tx.status = 'completed'
             tx.save()
+            audit.record('transaction.approve', tx, request.user, using=alias, amount=tx.amount, currency=tx.currency)
+        pin_to_primary(tx.account.user_id)
         return Response({'message': 'Transaction approved and completed.'})
+    except Http404:
+        raise
     except Exception as e:
         return Response({'error': str(e)}, status=500)
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""Audit logging cost: one hash-chained bulk insert per batch versus an insert per event."""
+from benchmarks.utils import best_of, make_user, report, setup_django
+
+EVENTS = 2000
+
+
+def bench_audit():
+    from accounts import audit
+
+    actor = make_user('admin@example.com', is_staff=True)
+    account = actor.accounts.get()
+
+    def unbatched():
+        for _ in range(EVENTS):
+            audit.record('account.status', account, actor, old='active', new='frozen')
+
+    def batched():
+        with audit.batch():
+            unbatched()
+
+    report('audit.record, one insert per event', EVENTS, best_of(unbatched, 3))
+    report('audit.record inside audit.batch()', EVENTS, best_of(batched, 3))
+
+
+if __name__ == '__main__':
+    setup_django()
+    bench_audit()
+    from django.core.management import call_command
+    call_command('verify_audit_log')
@@ -0,0 +1,51 @@
+"""Currency conversion throughput, standalone and inside batch settlement."""
+from benchmarks.utils import best_of, make_user, report, setup_django
+
+N = 100000
+
+
+def bench_convert():
+    from accounts import fx
+    scaled = fx.rates.scaled_rate('USD', 'EUR')
+    amounts = list(range(1, N + 1))
+    report('fx.convert (cached scaled rate)', N, best_of(lambda: [fx.convert(a, 'USD', 'EUR', scaled) for a in amounts]))
+    report('fx.rates.scaled_rate lookup', N, best_of(lambda: [fx.rates.scaled_rate('USD', 'EUR') for _ in amounts]))
+
+
+def bench_settlement():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from accounts.models import Account, Transaction
+    from accounts.settlement import settle_pending
+
+    sender = make_user('usd@example.com')
+    source = sender.accounts.get()
+    recipient = make_user('eur@example.com').accounts.get()
+    Account.objects.filter(pk=recipient.pk).update(currency='EUR')
+    count = 5000
+
+    def post():
+        Account.objects.filter(pk=source.pk).update(balance=count * 1000)
+        Transaction.objects.bulk_create(
+            Transaction(account=source, recipient_account=recipient, amount=1000, description='bench',
+                        transaction_type='transfer', created_by=sender)
+            for _ in range(count)
+        )
+        while settle_pending(500).completed:
+            pass
+
+    report('cross-currency settlement (batches of 500)', count, best_of(post, 3))
+    with CaptureQueriesContext(connection) as queries:
+        post()
+    fx_queries = [q for q in queries.captured_queries if 'accounts_fxrate' in q['sql']]
+    print(f"FxRate queries during {count} conversions: {len(fx_queries)}")
+
+
+if __name__ == '__main__':
+    setup_django()
+    from accounts import fx
+    from accounts.models import FxRate
+    FxRate.objects.create(base_currency='USD', quote_currency='EUR', rate='0.9213')
+    fx.invalidate()
+    bench_convert()
+    bench_settlement()
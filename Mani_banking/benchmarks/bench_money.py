@@ -0,0 +1,72 @@
+"""Posting and serialization throughput with integer minor-unit money."""
+from decimal import Decimal
+
+from benchmarks.utils import best_of, make_user, report, setup_django
+
+N = 100000
+
+
+def bench_arithmetic():
+    decimals = [Decimal('12.34')] * N
+    ints = [1234] * N
+
+    def decimal_sum():
+        total = Decimal('0.00')
+        for value in decimals:
+            total += value
+
+    def int_sum():
+        total = 0
+        for value in ints:
+            total += value
+
+    report('balance arithmetic (Decimal)', N, best_of(decimal_sum))
+    report('balance arithmetic (int minor units)', N, best_of(int_sum))
+
+
+def bench_formatting():
+    from accounts.money import format_minor
+    decimals = [Decimal('1234.56')] * N
+    ints = [123456] * N
+    report('format amount (str(Decimal))', N, best_of(lambda: [str(v) for v in decimals]))
+    report('format amount (format_minor)', N, best_of(lambda: [format_minor(v) for v in ints]))
+
+
+def bench_serializer():
+    from accounts.models import Transaction
+    from accounts.serializers import TransactionSerializer
+    rows = [
+        Transaction(id=i, account_id=1, amount=1234, description='bench', transaction_type='deposit', status='completed')
+        for i in range(10000)
+    ]
+    report('TransactionSerializer(many=True)', len(rows), best_of(lambda: TransactionSerializer(rows, many=True).data, 3))
+
+
+def bench_posting():
+    from accounts.models import Account, Transaction
+    from accounts.settlement import settle_pending
+    user = make_user('bench@example.com')
+    account = user.accounts.get()
+    recipient = make_user('recipient@example.com').accounts.get()
+    count = 5000
+
+    def post():
+        # Only transfers settle without an admin
+        Account.objects.filter(pk=account.pk).update(balance=count * 1234)
+        Transaction.objects.bulk_create(
+            Transaction(account=account, recipient_account=recipient, amount=1234, description='bench',
+                        transaction_type='transfer', created_by=user)
+            for _ in range(count)
+        )
+        while settle_pending(500).completed:
+            pass
+
+    report('settlement posting (batches of 500)', count, best_of(post, 3))
+
+
+if __name__ == '__main__':
+    setup_django()
+    bench_arithmetic()
+    bench_formatting()
+    bench_serializer()
+    bench_posting()
@@ -0,0 +1,38 @@
+"""Reconciliation throughput: transactions aggregated per second by the grouped chunk query."""
+from benchmarks.utils import best_of, make_user, report, setup_django
+
+ACCOUNTS = 2000
+TRANSACTIONS_PER_ACCOUNT = 100
+
+
+def bench_reconcile():
+    from accounts.models import Account, Transaction
+    from accounts.reconcile import reconcile_range
+
+    owner = make_user('owner@example.com')
+    Account.objects.bulk_create(Account(user=owner, account_number=f'{i:012d}') for i in range(ACCOUNTS - 1))
+    accounts = list(Account.objects.order_by('pk'))
+    batch = []
+    for account in accounts:
+        for i in range(TRANSACTIONS_PER_ACCOUNT):
+            batch.append(Transaction(account=account, amount=100 + i, description='bench',
+                                     transaction_type='deposit', status='completed'))
+        if len(batch) >= 50000:
+            Transaction.objects.bulk_create(batch)
+            batch = []
+    Transaction.objects.bulk_create(batch)
+    expected = sum(100 + i for i in range(TRANSACTIONS_PER_ACCOUNT))
+    Account.objects.update(balance=expected)
+    Account.objects.filter(pk=accounts[-1].pk).update(balance=0)
+
+    start, end = accounts[0].pk, accounts[-1].pk
+    rows = ACCOUNTS * TRANSACTIONS_PER_ACCOUNT
+    for chunk_size in (100, 1000, 10000):
+        drift = reconcile_range(start, end, chunk_size)
+        assert len(drift) == 1, drift
+        report(f'reconcile, {chunk_size} accounts per query', rows, best_of(lambda: reconcile_range(start, end, chunk_size), 3))
+
+
+if __name__ == '__main__':
+    setup_django()
+    bench_reconcile()
@@ -0,0 +1,40 @@
+"""Bytes on the wire and server time for the transaction list and dashboard: identity, gzip, brotli and 304."""
+from benchmarks.utils import best_of, make_user, report, setup_django
+
+TRANSACTIONS = 500
+REQUESTS = 200
+
+
+def bench_responses():
+    from django.test import Client
+    from rest_framework.authtoken.models import Token
+    from accounts import compression
+    from accounts.models import Account, Transaction
+
+    user = make_user('reader@example.com')
+    account = user.accounts.get()
+    Account.objects.filter(pk=account.pk).update(balance=10 ** 9)
+    Transaction.objects.bulk_create(
+        Transaction(account=account, amount=1000 + i, description=f'Groceries and household items #{i}',
+                    transaction_type='payment', status='completed', created_by=user)
+        for i in range(TRANSACTIONS)
+    )
+    client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+    encodings = [('identity', 'identity'), ('gzip', 'gzip')]
+    if compression.brotli is not None:
+        encodings.append(('br', 'br'))
+    for path in ('/api/transactions/?limit=100', '/api/dashboard/'):
+        etag = client.get(path)['ETag']
+        for name, accept in encodings:
+            size = len(client.get(path, HTTP_ACCEPT_ENCODING=accept).content)
+            seconds = best_of(lambda: [client.get(path, HTTP_ACCEPT_ENCODING=accept) for _ in range(REQUESTS)], 3)
+            report(f'{path} {name} ({size:,} B)', REQUESTS, seconds)
+        size = len(client.get(path, HTTP_IF_NONE_MATCH=etag).content)
+        seconds = best_of(lambda: [client.get(path, HTTP_IF_NONE_MATCH=etag) for _ in range(REQUESTS)], 3)
+        report(f'{path} 304 revalidation ({size:,} B)', REQUESTS, seconds)
+
+
+if __name__ == '__main__':
+    setup_django()
+    bench_responses()
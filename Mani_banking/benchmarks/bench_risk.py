@@ -0,0 +1,29 @@
+"""Latency of the in-memory velocity checks run before each transaction is created."""
+import random
+
+from benchmarks.utils import best_of, report, setup_django
+
+N = 100000
+
+
+def bench_engine():
+    from django.conf import settings
+    from accounts.risk import RiskEngine
+    engine = RiskEngine(settings.RISK_RULES)
+    rng = random.Random(1)
+    events = [(rng.randrange(10000), rng.randrange(10000), rng.randrange(100, 100000)) for _ in range(N)]
+    for i, (account_id, recipient_id, amount) in enumerate(events):
+        engine.record(account_id, recipient_id, amount, now=1_000_000 + i / 10)
+
+    def evaluate():
+        for i, (account_id, recipient_id, amount) in enumerate(events):
+            engine.evaluate(account_id, recipient_id, amount, now=1_010_000 + i / 10)
+
+    seconds = best_of(evaluate, 3)
+    report('RiskEngine.evaluate', N, seconds)
+    print(f"{'mean latency':<48} {seconds / N * 1e6:>14.2f} us")
+
+
+if __name__ == '__main__':
+    setup_django()
+    bench_engine()
@@ -0,0 +1,104 @@
+"""Transfer throughput as the number of account shards grows.
+
+Each shard count runs in a fresh interpreter with MANI_SHARDS set and its
+test databases as SQLite files in a temporary directory, so parallel workers
+really contend for each file's write lock. WORKERS processes post completed
+transfers the way approve_transaction does (lock both accounts, save); each
+worker's senders sit on one shard. 'local' transfers stay on the sender's
+shard, 'any' picks recipients from all users, so most of them cross shards
+and take the two-phase path. Shards add throughput only with cores to run the
+workers on; on a single CPU the numbers show what sharding costs instead.
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.utils import make_user, report
+
+SHARD_COUNTS = (1, 2, 4)
+WORKERS = 4
+USERS = 200
+TRANSFERS = 250  # Per worker
+
+
+def setup_shards(directory):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Mani_banking.settings')
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+    from django.db import connections
+    from django.test.utils import setup_test_environment
+    from accounts import sharding
+    setup_test_environment()
+    for alias in sharding.shard_aliases():
+        connections[alias].settings_dict['TEST']['NAME'] = os.path.join(directory, f'test_{alias}.sqlite3')
+        connections[alias].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def post_transfers(alias, pairs):
+    from django.db import transaction as db_transaction
+    from accounts import sharding
+    from accounts.models import Transaction
+    from accounts.settlement import lock_accounts
+    with sharding.using_shard(alias):
+        for sender, recipient in pairs:
+            with db_transaction.atomic(using=alias):
+                accounts = lock_accounts({sender, recipient})
+                Transaction(
+                    account=accounts[sender], recipient_account=accounts[recipient], amount=100,
+                    description='Benchmark transfer', transaction_type='transfer', status='completed',
+                ).save()
+    return len(pairs)
+
+
+def bench_shards(shards):
+    import time
+    from accounts import sharding
+    from accounts.batching import run_parallel
+    from accounts.models import Account
+
+    users = [make_user(f'user{i}@example.com') for i in range(USERS)]
+    accounts = {}
+    for user in users:
+        account = user.accounts.get()
+        Account.objects.using(account._state.db).filter(pk=account.pk).update(balance=10 ** 9)
+        accounts.setdefault(account._state.db, []).append(account.pk)
+    everyone = [pk for pks in accounts.values() for pk in pks]
+    aliases = sharding.shard_aliases()
+
+    for mode in ('local', 'any'):
+        rng = random.Random(shards)
+        jobs = []
+        for worker in range(WORKERS):
+            alias = aliases[worker % len(aliases)]
+            # Workers sharing a shard take alternate senders
+            senders = accounts[alias][worker // len(aliases)::max(1, WORKERS // len(aliases))]
+            pool = accounts[alias] if mode == 'local' else everyone
+            pairs = []
+            while len(pairs) < TRANSFERS:
+                sender, recipient = rng.choice(senders), rng.choice(pool)
+                if sender != recipient:
+                    pairs.append((sender, recipient))
+            jobs.append((alias, pairs))
+        started = time.perf_counter()
+        posted = sum(run_parallel(post_transfers, jobs, WORKERS))
+        report(f'{shards} shard(s), {WORKERS} workers, {mode} recipients', posted, time.perf_counter() - started)
+
+
+def bench_sharding():
+    for shards in SHARD_COUNTS:
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, MANI_SHARDS=str(shards), MANI_SHARD_DIR=directory)
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_sharding', '--shards', directory], env=env, check=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--shards']:
+        setup_shards(sys.argv[2])
+        bench_shards(int(os.environ['MANI_SHARDS']))
+    else:
+        bench_sharding()
@@ -0,0 +1,37 @@
+"""Cold worker boot time: a fresh interpreter loading the WSGI application and URLconf.
+
+The second row also imports the dependencies that now load lazily (dnspython,
+simplejwt), which is what every worker paid before they were deferred.
+"""
+import os
+import subprocess
+import sys
+
+from benchmarks.utils import best_of, report
+
+BOOTS = 5
+
+BOOT = (
+    "from django.core.wsgi import get_wsgi_application\n"
+    "get_wsgi_application()\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+EAGER = "import dns.resolver, rest_framework_simplejwt.authentication\n"
+
+
+def boot(script):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='Mani_banking.settings')
+    subprocess.run([sys.executable, '-c', script], env=env, check=True)
+
+
+def bench_startup():
+    lazy = best_of(lambda: [boot(BOOT) for _ in range(BOOTS)], 3)
+    eager = best_of(lambda: [boot(BOOT + EAGER) for _ in range(BOOTS)], 3)
+    report('worker boot (lazy DNS/JWT)', BOOTS, lazy)
+    report('worker boot with DNS/JWT imported eagerly', BOOTS, eager)
+    print(f"per boot: {lazy / BOOTS * 1000:.0f} ms lazy, {eager / BOOTS * 1000:.0f} ms eager")
+
+
+if __name__ == '__main__':
+    bench_startup()
@@ -0,0 +1,59 @@
+"""Statement generation throughput and the cost of a repeat (304) download."""
+import tempfile
+from datetime import date
+
+from benchmarks.utils import best_of, make_user, report, setup_django
+
+ACCOUNTS = 500
+TRANSACTIONS_PER_ACCOUNT = 40
+PERIOD = date(2026, 9, 1)
+
+
+def bench_generate():
+    from accounts.models import Account, Transaction
+    from accounts.statements import generate_range
+
+    owner = make_user('owner@example.com', first_name='Bench', last_name='Owner')
+    Account.objects.bulk_create(Account(user=owner, account_number=f'{i:012d}') for i in range(ACCOUNTS - 1))
+    Account.objects.update(created_at='2026-08-01T00:00:00Z')
+    accounts = list(Account.objects.order_by('pk'))
+    Transaction.objects.bulk_create(
+        Transaction(account=account, amount=100 + i, description=f'Card payment {i}',
+                    transaction_type='deposit' if i % 4 == 0 else 'payment', status='completed')
+        for account in accounts for i in range(TRANSACTIONS_PER_ACCOUNT)
+    )
+    Transaction.objects.update(date='2026-09-15T12:00:00Z', completed_at='2026-09-15T12:00:00Z')
+    start, end = accounts[0].pk, accounts[-1].pk
+    report('statements rendered and stored (HTML + PDF)', ACCOUNTS, best_of(lambda: generate_range(PERIOD, start, end, 500), 3))
+    return accounts[0], owner
+
+
+def bench_download(account, owner):
+    from django.conf import settings
+    from rest_framework.test import APIClient
+
+    settings.ALLOWED_HOSTS = ['*']
+    client = APIClient()
+    client.force_authenticate(owner)
+    url = f'/api/accounts/{account.account_number}/statements/{PERIOD:%Y-%m}/'
+    etag = client.get(url)['ETag']
+    count = 500
+
+    def download():
+        for _ in range(count):
+            b''.join(client.get(url).streaming_content)
+
+    def revalidate():
+        for _ in range(count):
+            client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    report('statement download (200, PDF body)', count, best_of(download, 3))
+    report('statement revalidation (304)', count, best_of(revalidate, 3))
+
+
+if __name__ == '__main__':
+    setup_django()
+    from django.conf import settings
+    with tempfile.TemporaryDirectory() as root:
+        settings.STATEMENTS_ROOT = root
+        bench_download(*bench_generate())
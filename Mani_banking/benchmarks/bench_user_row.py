@@ -0,0 +1,46 @@
+"""Bytes and time per authenticated request for loading the user, with and without profile data.
+
+The pre-split User row carried the profile columns, so loading it with the
+profile joined in stands in for the old per-request fetch.
+"""
+from benchmarks.utils import best_of, make_user, report, setup_django
+
+USERS = 1000
+LOADS = 5000
+
+
+def row_bytes(queryset):
+    """Bytes the database returns for the query's single row (text encoding of each value)."""
+    from django.db import connection
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return sum(len(str(value).encode()) for value in row if value is not None)
+
+
+def bench_user_row():
+    from datetime import date
+    from accounts.models import User, UserProfile
+
+    users = [make_user(f'user{i}@example.com', first_name='Ada', last_name='Lovelace') for i in range(USERS)]
+    UserProfile.objects.bulk_create(
+        UserProfile(user=user, phone_number='+233201234567', date_of_birth=date(1990, 1, 1),
+                    address='123 Financial District, Suite 100, Accra, Greater Accra Region, Ghana')
+        for user in users
+    )
+    pks = [user.pk for user in users]
+    loads = [pks[i % USERS] for i in range(LOADS)]
+
+    # What JWTAuthentication/TokenAuthentication fetch per request, before and after the split
+    lean = User.objects.filter(pk=pks[0])
+    wide = User.objects.select_related('profile').filter(pk=pks[0])
+    print(f"user row bytes per request: {row_bytes(lean)} lean, {row_bytes(wide)} with profile columns")
+
+    report('User load (lean auth row)', LOADS, best_of(lambda: [User.objects.get(pk=pk) for pk in loads], 3))
+    report('User load with profile columns', LOADS, best_of(lambda: [User.objects.select_related('profile').get(pk=pk) for pk in loads], 3))
+
+
+if __name__ == '__main__':
+    setup_django()
+    bench_user_row()
@@ -0,0 +1,46 @@
+"""Shared setup for the benchmark scripts.
+
+Run a benchmark from the Mani_banking directory, e.g.::
+
+    python -m benchmarks.bench_money
+
+Each run builds a throwaway test database; db.sqlite3 is never touched.
+"""
+import os
+import time
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Mani_banking.settings')
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def make_user(email, **fields):
+    """Create a verified user (and, via the post_save signal, their account) without DNS checks."""
+    from accounts.models import User
+    user = User(email=email, username=email.split('@')[0], is_email_verified=True, **fields)
+    user.set_unusable_password()
+    user.save()
+    return user
+
+
+def best_of(func, repeat=5):
+    """Best wall-clock time of func() over repeat runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(name, operations, seconds):
+    print(f"{name:<48} {operations / seconds:>14,.0f} ops/s  ({seconds * 1000:,.1f} ms)")
@@ -0,0 +1,68 @@
+// Subscribes to the server-sent events stream at /api/events/.
+// EventSource cannot send the Authorization header, so the stream is read with fetch.
+// Every open stream holds a server worker, so all components share one connection
+// per token; it closes when the last listener unsubscribes.
+const connections = new Map()
+
+function openConnection(token, listeners) {
+  const controller = new AbortController()
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      let ended = false
+      try {
+        const response = await fetch('http://localhost:8000/api/events/', {
+          headers: { Authorization: `Token ${token}`, Accept: 'text/event-stream' },
+          signal: controller.signal,
+        })
+        if (!response.ok) return
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ''
+        for (;;) {
+          const { value, done } = await reader.read()
+          if (done) break
+          buffer += decoder.decode(value, { stream: true })
+          const messages = buffer.split('\n\n')
+          buffer = messages.pop()
+          for (const message of messages) {
+            const data = message.split('\n').find(line => line.startsWith('data: '))
+            if (data) {
+              const event = JSON.parse(data.slice(6))
+              listeners.forEach(listener => listener(event))
+            }
+          }
+        }
+        // The server ends streams after a while; reconnect right away
+        ended = true
+      } catch (err) {
+        if (controller.signal.aborted) return
+      }
+      if (!ended) {
+        // Connection dropped, back off before reconnecting
+        await new Promise(resolve => setTimeout(resolve, 5000))
+      }
+    }
+  }
+
+  connect()
+  return controller
+}
+
+export function subscribeToAccountEvents(token, onEvent) {
+  let connection = connections.get(token)
+  if (!connection) {
+    const listeners = new Set()
+    connection = { listeners, controller: openConnection(token, listeners) }
+    connections.set(token, connection)
+  }
+  connection.listeners.add(onEvent)
+
+  return () => {
+    connection.listeners.delete(onEvent)
+    if (connection.listeners.size === 0) {
+      connection.controller.abort()
+      connections.delete(token)
+    }
+  }
+}
@@ -2,6 +2,7 @@ import { useEffect, useState, useRef } from 'react'
 import { useNavigate } from 'react-router-dom'
 import axios from 'axios'
 import { Chart } from 'chart.js/auto'
+import { subscribeToAccountEvents } from '../accountEvents'
 import { 
   CreditCard, 
   TrendingUp, 
@@ -64,6 +65,20 @@ function Dashboard({ token, onLogout, isSidebarOpen, setIsSidebarOpen }) {
     fetchDashboard()
   }, [storedToken, navigate, onLogout])
 
+  // Live balance updates pushed by the server instead of re-fetching the dashboard
+  useEffect(() => {
+    if (!storedToken) return
+    return subscribeToAccountEvents(storedToken, (event) => {
+      if (event.type !== 'balance') return
+      setUserData(prev => prev && {
+        ...prev,
+        accounts: (prev.accounts || []).map(acc =>
+          acc.account_number === event.account_number ? { ...acc, balance: event.balance } : acc
+        ),
+      })
+    })
+  }, [storedToken])
+
   useEffect(() => {
     if (userData && chartRef.current && userData.transactions) {
       if (chartInstance.current) chartInstance.current.destroy()
@@ -8,7 +8,7 @@ function TransactionCreate({ token }) {
     amount: '',
     description: '',
     transaction_type: 'deposit',
-    recipient_account: '',
+    recipient_account_number: '',
   })
   const [error, setError] = useState('')
   const navigate = useNavigate()
@@ -17,7 +17,7 @@ function TransactionCreate({ token }) {
     e.preventDefault()
     try {
       const data = { ...formData }
-      if (data.transaction_type !== 'transfer') delete data.recipient_account
+      if (data.transaction_type !== 'transfer') delete data.recipient_account_number
       await axios.post('http://localhost:8000/api/transactions/create/', data, {
         headers: { Authorization: `Token ${token}` },
       })
@@ -97,14 +97,15 @@ function TransactionCreate({ token }) {
           </div>
           {formData.transaction_type === 'transfer' && (
             <div className="mb-4">
-              <label className="block text-sm font-medium text-gray-700" htmlFor="recipient_account">
-                Recipient Account ID
+              <label className="block text-sm font-medium text-gray-700" htmlFor="recipient_account_number">
+                Recipient Account Number
               </label>
               <input
-                type="number"
-                id="recipient_account"
-                name="recipient_account"
-                value={formData.recipient_account}
+                type="text"
+                inputMode="numeric"
+                id="recipient_account_number"
+                name="recipient_account_number"
+                value={formData.recipient_account_number}
                 onChange={handleChange}
                 className="mt-1 p-2 w-full border rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500"
                 required
@@ -1,11 +1,15 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import axios from 'axios'
+import { subscribeToAccountEvents } from '../accountEvents'
 
 function TransactionList({ token }) {
   const [transactions, setTransactions] = useState([])
   const [filters, setFilters] = useState({ type: '', status: '', date_from: '', date_to: '', search: '' })
   const [error, setError] = useState('')
+  const [reloads, setReloads] = useState(0)
+  const listed = useRef(new Set())
+  listed.current = new Set(transactions.map(tx => tx.id))
   const navigate = useNavigate()
 
   useEffect(() => {
@@ -24,7 +28,20 @@ function TransactionList({ token }) {
       }
     }
     fetchTransactions()
-  }, [filters, token, navigate])
+  }, [filters, reloads, token, navigate])
+
+  // Merge pushed status changes into the current page; a new transaction may not
+  // match the active filters, so reload the page and let the API decide
+  useEffect(() => {
+    return subscribeToAccountEvents(token, (event) => {
+      if (event.type !== 'transaction') return
+      if (!listed.current.has(event.id)) {
+        setReloads(n => n + 1)
+        return
+      }
+      setTransactions(prev => prev.map(tx => tx.id === event.id ? { ...tx, status: event.status } : tx))
+    })
+  }, [token])
 
   const handleFilterChange = (e) => {
     setFilters({ ...filters, [e.target.name]: e.target.value })